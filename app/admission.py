@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Hashable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted to run a scrape.
+
+    Attributes:
+        status_code (int): 429 when the wait queue is full, 503 when the wait for a slot timed out.
+        detail (str): Human-readable reason, suitable for an HTTPException detail.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class AdmissionController:
+    """
+    Global concurrency limit with a bounded wait queue.
+
+    At most `max_concurrency` holders run at once. Up to `max_queue` additional callers may wait
+    for a slot, each for at most `queue_timeout` seconds. Anything beyond that is rejected
+    immediately instead of piling up Chromium launches in memory.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._waiting = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Acquire a slot for the duration of the `async with` block.
+
+        Raises:
+            AdmissionRejected: 429 if the wait queue is full, 503 if no slot frees up within `queue_timeout`.
+        """
+        if self._active >= self.max_concurrency and self._waiting >= self.max_queue:
+            logger.warning(
+                f"Admission rejected: {self._active} active, {self._waiting} waiting"
+            )
+            raise AdmissionRejected(429, "Too many scrape requests queued")
+
+        self._waiting += 1
+        try:
+            if self._semaphore.locked():
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            else:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Admission timed out after {self.queue_timeout}s waiting for a scrape slot"
+            )
+            raise AdmissionRejected(503, "Timed out waiting for a scrape slot")
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight execution.
+
+    The first caller for a key starts the work as a task; later callers for the same key await that
+    task and receive the same result or exception. The task is shielded so one caller being
+    cancelled does not cancel the work for the others; it is only cancelled, freeing its browser,
+    once every caller waiting on it has been cancelled.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._waiters: dict[Hashable, int] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            logger.info(f"Joining in-flight scrape for {key}")
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                logger.info(f"Last caller for {key} cancelled; cancelling in-flight scrape")
+                task.cancel()
+            raise
+        finally:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieve the exception so an unawaited failure is not reported as never retrieved.
+            logger.debug(f"In-flight scrape for {key} failed: {task.exception()}")
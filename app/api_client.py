@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Any, Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ApiClient:
+    """
+    Dashboard client for the scraper API.
+
+    All calls share one keep-alive `requests.Session`. GET responses are cached for `ttl` seconds,
+    keyed by path and query parameters; writes invalidate the cached paths they affect. Per-URL
+    scrape fetches for several URLs run concurrently on a small thread pool.
+
+    Failed GETs are logged and return an empty list, as the dashboard always expected.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        ttl: float = 30,
+        max_workers: int = 8,
+        session: requests.Session = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.ttl = ttl
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="api-client")
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: dict[tuple, tuple[float, Any, Optional[str]]] = {}
+
+    @staticmethod
+    def _key(path: str, params: dict = None) -> tuple:
+        return path, tuple(sorted((params or {}).items()))
+
+    def get(self, path: str, params: dict = None, refresh: bool = False) -> Any:
+        """
+        GET `path` as JSON, served from the cache while it is younger than `ttl`. Older entries are
+        revalidated with their ETag, so an unchanged response is answered with an empty 304.
+
+        Parameters:
+            path (str): API path, e.g. "/urls/".
+            params (dict, optional): Query parameters.
+            refresh (bool): Skip the cache and refetch.
+        """
+        key = self._key(path, params)
+        now = self._clock()
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and not refresh and now - cached[0] < self.ttl:
+            return cached[1]
+        # Revalidate what we have; an unchanged response costs the API no work
+        headers = {"If-None-Match": cached[2]} if cached is not None and cached[2] else {}
+
+        try:
+            response = self.session.get(
+                f"{self.api_url}{path}", params=params, headers=headers, timeout=30
+            )
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {path}: {e}")
+            return []
+        if response.status_code == 304 and cached is not None:
+            data, etag = cached[1], cached[2]
+        elif response.status_code == 200:
+            data, etag = response.json(), response.headers.get("ETag")
+        else:
+            logger.error(f"Error fetching {path}: {response.status_code}")
+            return []
+        with self._lock:
+            self._cache[key] = (now, data, etag)
+        return data
+
+    def invalidate(self, *prefixes: str):
+        """
+        Drop cached responses whose path starts with any of `prefixes`, or everything if none given.
+        """
+        with self._lock:
+            for key in list(self._cache):
+                if not prefixes or key[0].startswith(prefixes):
+                    del self._cache[key]
+
+    def fetch_urls(self, refresh: bool = False) -> list[dict]:
+        return sorted(self.get("/urls/", refresh=refresh), key=itemgetter("url"))
+
+    def fetch_scrapes(self, url_id: int, limit: int = 3, refresh: bool = False) -> list[dict]:
+        return self.get(f"/scrapes/urlid/{url_id}", {"limit": limit}, refresh=refresh)[:limit]
+
+    def fetch_scrapes_many(
+        self, url_ids: list[int], limit: int = 3, refresh: bool = False
+    ) -> dict[int, list[dict]]:
+        """
+        Fetch the scrapes of several URLs concurrently.
+
+        Returns:
+            dict[int, list[dict]]: URL ID to its scrapes.
+        """
+        results = self._pool.map(
+            lambda url_id: self.fetch_scrapes(url_id, limit=limit, refresh=refresh), url_ids
+        )
+        return dict(zip(url_ids, results))
+
+    def fetch_all_flagged_scrapes(self, fields: list[str] = None) -> list[dict]:
+        params = {"fields": ",".join(fields)} if fields else None
+        return self.get("/flagged_scrapes/", params)
+
+    def fetch_issue_clusters(self, limit: int = 50) -> list[dict]:
+        return self.get("/clusters/", {"limit": limit})
+
+    def update_scrape(self, scrape_id: int, data: dict) -> dict:
+        response = self.session.put(f"{self.api_url}/scrapes/{scrape_id}", json=data, timeout=30)
+        self.invalidate("/scrapes/", "/flagged_scrapes/", "/clusters/")
+        return response.json() if response.status_code == 200 else None
+
+    def update_scrapes(self, scrape_ids: list[int], data: dict) -> dict:
+        """
+        Apply the same triage update to several scrapes in one request.
+
+        Returns:
+            dict: The API's per-ID results, or None if the request failed.
+        """
+        response = self.session.put(
+            f"{self.api_url}/scrapes/", json={"ids": scrape_ids, "update": data}, timeout=30
+        )
+        self.invalidate("/scrapes/", "/flagged_scrapes/", "/clusters/")
+        return response.json() if response.status_code == 200 else None
+
+    def add_url(self, url: str) -> bool:
+        response = self.session.post(f"{self.api_url}/urls/", json={"url": url}, timeout=30)
+        if response.status_code == 200:
+            self.invalidate("/urls/")
+            return True
+        return False
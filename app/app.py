@@ -1,14 +1,14 @@
 import streamlit as st
-import requests
 import pandas as pd
 from datetime import datetime
 import json
 import re
 from urllib.parse import urlparse
 import logging
-from operator import itemgetter
 import os
 from dotenv import load_dotenv
+from api_client import ApiClient
+from live_updates import DashboardEvents, PanelCache
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -16,20 +16,30 @@ logger = logging.getLogger(__name__)
 
 
 API_URL = os.getenv("API_URL", "http://localhost:8000")
+# How often each product panel checks for pushed updates
+LIVE_REFRESH_SECONDS = float(os.getenv("LIVE_REFRESH_SECONDS", "5"))
+# How long API responses are reused across reruns and sessions
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "30"))
 st.set_page_config(layout="wide")
 
 
-def fetch_urls():
-    response = requests.get(f"{API_URL}/urls/")
-    if response.status_code == 200:
-        urls = response.json()
-        # Sort the list of dictionaries based on the 'url' key
-        sorted_urls = sorted(urls, key=itemgetter("url"))
-        logger.info(f"\nfetch_urls finds (sorted): {sorted_urls}\n")
-        return sorted_urls
-    else:
-        logger.error(f"Error fetching URLs: {response.status_code}")
-        return []
+@st.cache_resource
+def api_client():
+    # One pooled client and response cache per server process, shared by every session
+    return ApiClient(API_URL, ttl=API_CACHE_TTL)
+
+
+@st.cache_resource
+def dashboard_events():
+    # One event stream per server process, shared by every session
+    events = DashboardEvents(API_URL)
+    events.start()
+    return events
+
+
+api = api_client()
+events = dashboard_events()
+panels = PanelCache(st.session_state)
 
 
 def parse_date(date_string):
@@ -42,30 +52,6 @@ def parse_date(date_string):
         return None
 
 
-def fetch_scrapes(url_id, flagged=None, limit=2):
-    params = {"limit": limit}
-    if flagged is not None:
-        params["flagged"] = str(flagged).lower()
-
-    full_url = f"{API_URL}/scrapes/urlid/{url_id}"
-    print(f"Fetching scrapes from: {full_url} with params: {params}")
-    response = requests.get(full_url, params=params)
-    print(f"Response status code: {response.status_code}")
-
-    if response.status_code == 200:
-        data = response.json()
-        print(f"Number of scrapes received: {len(data)}")
-        return data[:limit]  # Return only the top 'limit' number of scrapes
-    else:
-        print(f"Error fetching scrapes: {response.status_code}")
-        return []
-
-
-def fetch_all_flagged_scrapes():
-    response = requests.get(f"{API_URL}/flagged_scrapes/")
-    return response.json() if response.status_code == 200 else []
-
-
 def process_url_for_title(url):
     # Parse the URL
     parsed_url = urlparse(url)
@@ -97,8 +83,7 @@ def update_scrape(scrape_id, scrape_type, scrape_comment, create_alert):
         "scrape_comment": scrape_comment,
         "create_alert": create_alert,
     }
-    response = requests.put(f"{API_URL}/scrapes/{scrape_id}", json=data)
-    return response.json() if response.status_code == 200 else None
+    return api.update_scrape(scrape_id, data)
 
 
 def truncate_text(text, max_length=100):
@@ -119,101 +104,169 @@ def create_alert(scrape_id):
 
 
 st.sidebar.title("Web Scraping Monitor")
-page = st.sidebar.radio("Navigation", ["Dashboard", "Alerts"])
+page = st.sidebar.radio("Navigation", ["Dashboard", "Issues", "Alerts"])
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def product_panel(url):
+    # Refetched only when an event for this URL arrived since the last fetch
+    scrapes = panels.get(
+        ("scrapes", url["id"]),
+        events.version(url["id"]),
+        # The version moved, so whatever the API client cached is stale too
+        lambda: api.fetch_scrapes(url["id"], refresh=True)[:3],
+    )
+    processed_title = process_url_for_title(url["url"])
+    st.subheader(processed_title)
+    if not scrapes:
+        st.warning(f"No scrapes found for URL: {url['url']}")
+    else:
+        for scrape in scrapes:
+            content_json = json.loads(scrape["content"])
+            known_issues = content_json["known_issues"]
+            row = known_issues["row"]
+            if len(row["Summary"]) > 300:
+                summary = truncate_text(row["Summary"], 300)
+            else:
+                summary = pad_text(row["Summary"], 300)
+            # Closed state view
+            closed_state_view = f"{row['Last updated']} - {len(summary)} - {summary}"
+
+            with st.expander(closed_state_view, expanded=False):
+                # Open state view with formatted content
+                st.markdown(
+                    f"**Known Issue**\n"
+                    f"Last updated: {row['Last updated']}\n\n"
+                    f"{row['Summary']}"
+                )
+                detail_url = f"{url['url']}#issue-details"
+                st.markdown(f"[View Details]({detail_url})", unsafe_allow_html=True)
+                # Checkbox 1: Create Alert
+                create_alert_checked = st.checkbox(
+                    "Create alert", key=f"create_alert_{scrape['id']}"
+                )
+
+                # Checkbox 2: Add Feedback
+                add_feedback_checked = st.checkbox(
+                    "Add Feedback", key=f"add_feedback_{scrape['id']}"
+                )
+
+                if add_feedback_checked:
+                    # Dropdown for Scrape Type
+                    scrape_type = st.selectbox(
+                        "Scrape Type",
+                        ["Critical", "Active", "Resolved", "Unknown"],
+                        key=f"scrape_type_{scrape['id']}",
+                    )
+
+                    # Textarea for Comment
+                    scrape_comment = st.text_area(
+                        "Comment", key=f"scrape_comment_{scrape['id']}"
+                    )
+
+                    # Update button
+                    if st.button("Update", key=f"update_{scrape['id']}"):
+                        update_scrape(
+                            scrape["id"],
+                            scrape_type,
+                            scrape_comment,
+                            create_alert_checked,
+                        )
+                        st.success("Scrape updated successfully!")
+
+    if st.button("Export JSON", key=f"export_{url['id']}"):
+        json_data = json.dumps(scrapes, indent=2)
+        st.download_button(
+            label="Download JSON",
+            data=json_data,
+            file_name=f"scrapes_{url['id']}.json",
+            mime="application/json",
+        )
+
 
 if page == "Dashboard":
     st.title("Scraping Dashboard")
 
-    urls = fetch_urls()
+    urls = api.fetch_urls()
+    # Fetch the panels that are stale concurrently instead of one by one
+    stale = {
+        url["id"]: events.version(url["id"])
+        for url in urls
+        if not panels.is_fresh(("scrapes", url["id"]), events.version(url["id"]))
+    }
+    for url_id, scrapes in api.fetch_scrapes_many(list(stale), refresh=True).items():
+        panels.put(("scrapes", url_id), stale[url_id], scrapes[:3])
     col1, col2, col3 = st.columns(3)
     columns = [col1, col2, col3]
 
     for i, url in enumerate(urls):
         with columns[i % 3]:
-            processed_title = process_url_for_title(url["url"])
-            st.subheader(processed_title)
-            scrapes = fetch_scrapes(url["id"])[:3]  # Limit to 3 most recent scrapes
-            if not scrapes:
-                st.warning(f"No scrapes found for URL: {url['url']}")
+            product_panel(url)
+
+    with st.expander("Bulk triage", expanded=False):
+        # Every panel was refreshed above, so its cached scrapes are current
+        options = {}
+        for url in urls:
+            title = process_url_for_title(url["url"])
+            for scrape in panels.get(("scrapes", url["id"]), events.version(url["id"]), list):
+                summary = json.loads(scrape["content"])["known_issues"]["row"]["Summary"]
+                options[scrape["id"]] = f"{title} - {truncate_text(summary, 80)}"
+        selected = st.multiselect(
+            "Issues", list(options), format_func=options.get, key="bulk_ids"
+        )
+        bulk_type = st.selectbox(
+            "Scrape Type", ["Critical", "Active", "Resolved", "Unknown"], key="bulk_type"
+        )
+        bulk_comment = st.text_area("Comment", key="bulk_comment")
+        bulk_alert = st.checkbox("Create alert", key="bulk_alert")
+        if st.button("Update selected", disabled=not selected, key="bulk_update"):
+            result = api.update_scrapes(
+                selected,
+                {
+                    "scrape_type": bulk_type,
+                    "scrape_comment": bulk_comment,
+                    "create_alert": bulk_alert,
+                },
+            )
+            if result is None:
+                st.error("Bulk update failed.")
             else:
-                for scrape in scrapes:
-                    content_json = json.loads(scrape["content"])
-                    known_issues = content_json["known_issues"]
-                    row = known_issues["row"]
-                    if len(row["Summary"]) > 300:
-                        summary = truncate_text(row["Summary"], 300)
-                    else:
-                        summary = pad_text(row["Summary"], 300)
-                    # Closed state view
-                    closed_state_view = (
-                        f"{row['Last updated']} - {len(summary)} - {summary}"
-                    )
-
-                    with st.expander(closed_state_view, expanded=False):
-                        # Open state view with formatted content
-                        st.markdown(
-                            f"**Known Issue**\n"
-                            f"Last updated: {row['Last updated']}\n\n"
-                            f"{row['Summary']}"
-                        )
-                        detail_url = f"{url['url']}#issue-details"
-                        st.markdown(
-                            f"[View Details]({detail_url})", unsafe_allow_html=True
-                        )
-                        # Checkbox 1: Create Alert
-                        create_alert_checked = st.checkbox(
-                            "Create alert", key=f"create_alert_{scrape['id']}"
-                        )
-
-                        # Checkbox 2: Add Feedback
-                        add_feedback_checked = st.checkbox(
-                            "Add Feedback", key=f"add_feedback_{scrape['id']}"
-                        )
-
-                        if add_feedback_checked:
-                            # Dropdown for Scrape Type
-                            scrape_type = st.selectbox(
-                                "Scrape Type",
-                                ["Critical", "Active", "Resolved", "Unknown"],
-                                key=f"scrape_type_{scrape['id']}",
-                            )
-
-                            # Textarea for Comment
-                            scrape_comment = st.text_area(
-                                "Comment", key=f"scrape_comment_{scrape['id']}"
-                            )
-
-                            # Update button
-                            if st.button("Update", key=f"update_{scrape['id']}"):
-                                update_scrape(
-                                    scrape["id"],
-                                    scrape_type,
-                                    scrape_comment,
-                                    create_alert_checked,
-                                )
-                                st.success("Scrape updated successfully!")
-
-            if st.button("Export JSON", key=f"export_{url['id']}"):
-                json_data = json.dumps(scrapes, indent=2)
-                st.download_button(
-                    label="Download JSON",
-                    data=json_data,
-                    file_name=f"scrapes_{url['id']}.json",
-                    mime="application/json",
+                missing = [item["id"] for item in result["results"] if not item["updated"]]
+                st.success(f"Updated {result['updated']} scrapes.")
+                if missing:
+                    st.warning(f"Not found: {', '.join(map(str, missing))}")
+
+elif page == "Issues":
+    st.title("Known Issues")
+    clusters = api.fetch_issue_clusters()
+
+    if not clusters:
+        st.info("No known issues found.")
+    for cluster in clusters:
+        summary = truncate_text(cluster["summary"], 200)
+        with st.expander(
+            f"{cluster['last_seen'][:10]} - {summary} ({len(cluster['products'])} products)",
+            expanded=False,
+        ):
+            st.markdown(f"**Known Issue**\n\n{cluster['summary']}")
+            if cluster["status"]:
+                st.markdown(f"**Status:** {cluster['status']}")
+            st.markdown("**Affected products:**")
+            for product in cluster["products"]:
+                st.markdown(
+                    f"- [{process_url_for_title(product['url'])}]({product['url']}#issue-details)"
                 )
 
 elif page == "Alerts":
     st.title("Alerts")
-    all_alerts = fetch_all_flagged_scrapes()
+    alert_columns = ["id", "url_id", "timestamp", "scrape_type", "scrape_comment"]
+    all_alerts = api.fetch_all_flagged_scrapes(fields=alert_columns)
 
     if all_alerts:
         alert_df = pd.DataFrame(all_alerts)
-        alert_df = alert_df[
-            ["id", "url_id", "timestamp", "scrape_type", "scrape_comment"]
-        ]
+        alert_df = alert_df[alert_columns]
 
         # Fetch URL information to display URL instead of url_id
-        urls = fetch_urls()
+        urls = api.fetch_urls()
         url_dict = {url["id"]: url["url"] for url in urls}
         alert_df["url"] = alert_df["url_id"].map(url_dict)
         alert_df = alert_df.drop("url_id", axis=1)
@@ -226,8 +279,7 @@ elif page == "Alerts":
 st.sidebar.header("Add New URL")
 new_url = st.sidebar.text_input("Enter new URL")
 if st.sidebar.button("Add URL"):
-    response = requests.post(f"{API_URL}/urls/", json={"url": new_url})
-    if response.status_code == 200:
+    if api.add_url(new_url):
         st.sidebar.success("URL added successfully!")
     else:
         st.sidebar.error("Failed to add URL.")
@@ -0,0 +1,149 @@
+"""
+Re-extract scrapes from archived pages, without fetching anything.
+
+    python -m app.backfill [--deep-scrape] [--url-id 3 --url-id 7] [--since 2024-01-01] [--workers 8]
+
+Every page the scraper fetches is kept in the HTML archive (see app.html_archive). After the
+extraction logic changes, this parses each archived snapshot again on a process pool and stores the
+result like a fresh scrape taken at the snapshot's fetch time: rows whose fingerprint is already
+stored are skipped, new ones are inserted, linked to their known issue and diffed against its
+previous version. Running it twice inserts nothing the second time.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.future import select
+
+from app.database import SessionLocal
+from app.html_archive import HTMLArchive
+from app.main import ingest_scraped_data, issue_clusterer
+from app.models import URL as URLModel, PageSnapshot
+from app.scraper import parse_scraped_content
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", str(os.cpu_count() or 1)))
+
+
+def reparse(task: tuple[str, str, bool]) -> tuple[dict | None, str | None]:
+    """
+    Process pool worker: parse one archived page.
+
+    Parameters:
+        task (tuple[str, str, bool]): Archive root, page hash and whether to extract every row.
+
+    Returns:
+        tuple[dict | None, str | None]: The scraped data, or None and the error.
+    """
+    root, digest, enable_deep_scrape = task
+    try:
+        html = HTMLArchive(root).get(digest)
+        return parse_scraped_content(html, enable_deep_scrape), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def backfill(
+    session_factory=SessionLocal,
+    archive: HTMLArchive = None,
+    url_ids: list[int] = None,
+    since: datetime = None,
+    enable_deep_scrape: bool = False,
+    workers: int = BACKFILL_WORKERS,
+    executor: Executor = None,
+) -> dict:
+    """
+    Parse archived snapshots again and store the new scrapes they yield, oldest snapshot first.
+
+    Parsing runs on `executor`, a process pool of `workers` by default; results are stored in
+    snapshot order from this process, one commit per snapshot.
+
+    Parameters:
+        session_factory: Creates database sessions.
+        archive (HTMLArchive, optional): Where the pages are. Defaults to HTML_ARCHIVE_DIR.
+        url_ids (list[int], optional): Only re-extract these URLs.
+        since (datetime, optional): Only re-extract snapshots first fetched at or after this time.
+        enable_deep_scrape (bool): Whether to extract every known-issue row.
+        workers (int): Size of the process pool.
+        executor (Executor, optional): Runs the parsing instead of a new process pool.
+
+    Returns:
+        dict: Counts of `snapshots` examined, `failed` parses and `created` scrapes.
+    """
+    archive = archive or HTMLArchive()
+    query = select(
+        PageSnapshot.url_id, PageSnapshot.html_hash, PageSnapshot.first_fetched_at
+    ).order_by(PageSnapshot.first_fetched_at, PageSnapshot.id)
+    if url_ids:
+        query = query.filter(PageSnapshot.url_id.in_(url_ids))
+    if since is not None:
+        query = query.filter(PageSnapshot.first_fetched_at >= since)
+
+    with session_factory() as db:
+        snapshots = db.execute(query).all()
+        issue_clusterer.load(db)
+    logger.info(f"Re-extracting {len(snapshots)} archived snapshots")
+    result = {"snapshots": len(snapshots), "failed": 0, "created": 0}
+    if not snapshots:
+        return result
+
+    tasks = [(str(archive.root), snapshot.html_hash, enable_deep_scrape) for snapshot in snapshots]
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    try:
+        parsed = pool.map(reparse, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+        with session_factory() as db:
+            for snapshot, (scraped_data, error) in zip(snapshots, parsed):
+                if error is not None:
+                    logger.error(f"Could not re-extract snapshot {snapshot.html_hash}: {error}")
+                    result["failed"] += 1
+                    continue
+                db_url = db.get(URLModel, snapshot.url_id)
+                if db_url is None:
+                    continue
+                new_scrapes = ingest_scraped_data(
+                    db, db_url, scraped_data, fetched_at=snapshot.first_fetched_at
+                )
+                db.commit()
+                result["created"] += len(new_scrapes)
+    finally:
+        if executor is None:
+            pool.shutdown()
+    logger.info(
+        f"Backfill done: {result['created']} new scrapes from {result['snapshots']} snapshots, "
+        f"{result['failed']} failed"
+    )
+    return result
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-extract scrapes from archived pages.")
+    parser.add_argument(
+        "--deep-scrape", action="store_true", help="Extract every known-issue row, not only the first"
+    )
+    parser.add_argument("--url-id", type=int, action="append", help="Only this URL; repeatable")
+    parser.add_argument(
+        "--since", type=datetime.fromisoformat, help="Only snapshots fetched since, e.g. 2024-01-01"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=BACKFILL_WORKERS, help=f"Parser processes (default {BACKFILL_WORKERS})"
+    )
+    args = parser.parse_args(argv)
+
+    result = backfill(
+        url_ids=args.url_id,
+        since=args.since,
+        enable_deep_scrape=args.deep_scrape,
+        workers=args.workers,
+    )
+    print(f"{result['created']} scrapes created from {result['snapshots']} snapshots, {result['failed']} failed")
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
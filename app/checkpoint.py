@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import (
+    URL as URLModel,
+    Scrape as ScrapeModel,
+    ScrapeRun,
+    ScrapeRunItem,
+)
+from app.notifications import release_batch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A run left "running" longer than this is not resumed; its notification is still delivered.
+RESUME_WINDOW = timedelta(hours=float(os.getenv("SCRAPE_RESUME_WINDOW_HOURS", "12")))
+# A running run whose worker has not renewed its lease for this long is treated as crashed.
+RUN_LEASE = timedelta(seconds=float(os.getenv("SCRAPE_RUN_LEASE_SECONDS", "120")))
+
+
+def new_owner() -> str:
+    """
+    A unique name for the worker taking a run's lease: host, process and a random suffix.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def start_or_resume_run(db: Session, enable_deep_scrape: bool, owner: str) -> ScrapeRun | None:
+    """
+    Resume the most recent unfinished scrape run, or start a new one with every URL pending, and
+    take its lease for `owner`.
+
+    Only a run whose lease has lapsed is resumed: one still renewed by another worker (a concurrent
+    `/scrape_all`, another replica) is live, and None is returned so the caller does not scrape its
+    URLs a second time. A lapsed run that started outside the resume window is marked abandoned,
+    its held notifications are released to the outbox, and a new run is started. At most one run
+    is running at a time; a concurrent start loses on the uq_scrape_runs_running index.
+
+    Parameters:
+        db (Session): The database session.
+        enable_deep_scrape (bool): Deep-scrape setting for a new run.
+        owner (str): The worker taking the lease, see `new_owner`.
+
+    Returns:
+        ScrapeRun | None: The run to work on, committed, or None if another worker holds it.
+    """
+    now = datetime.now(timezone.utc)
+    run = db.execute(
+        select(ScrapeRun)
+        .filter(ScrapeRun.status == "running")
+        .order_by(ScrapeRun.started_at.desc())
+    ).scalars().first()
+
+    if run is not None:
+        lapsed = or_(ScrapeRun.heartbeat_at.is_(None), ScrapeRun.heartbeat_at <= now - RUN_LEASE)
+        if now.replace(tzinfo=None) - run.started_at <= RESUME_WINDOW:
+            claimed = db.execute(
+                update(ScrapeRun)
+                .where(ScrapeRun.id == run.id, ScrapeRun.status == "running", lapsed)
+                .values(owner=owner, heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if not claimed:
+                logger.info(f"Scrape run {run.id} is still running under another worker; not resuming it")
+                return None
+            db.refresh(run)
+            logger.info(f"Resuming scrape run {run.id}")
+            return run
+        abandoned = db.execute(
+            update(ScrapeRun)
+            .where(ScrapeRun.id == run.id, ScrapeRun.status == "running", lapsed)
+            .values(status="abandoned", finished_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not abandoned:
+            db.commit()
+            logger.info(f"Scrape run {run.id} is still running under another worker; not starting another")
+            return None
+        logger.warning(f"Scrape run {run.id} is too old to resume; marked abandoned")
+        release_run_notifications(db, run.id)
+
+    run = ScrapeRun(
+        started_at=now,
+        status="running",
+        enable_deep_scrape=enable_deep_scrape,
+        owner=owner,
+        heartbeat_at=now,
+    )
+    db.add(run)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        logger.info("Another worker started a scrape run first; not starting another")
+        return None
+    url_ids = db.execute(select(URLModel.id)).scalars().all()
+    db.add_all(ScrapeRunItem(run_id=run.id, url_id=url_id) for url_id in url_ids)
+    db.commit()
+    logger.info(f"Started scrape run {run.id} with {len(url_ids)} URLs")
+    return run
+
+
+def renew_lease(db: Session, run_id: int, owner: str) -> bool:
+    """
+    Renew the lease on a running run. Commits.
+
+    Returns:
+        bool: False if the run is no longer running under `owner`, e.g. another worker took it
+            over after this one stalled for longer than the lease.
+    """
+    renewed = db.execute(
+        update(ScrapeRun)
+        .where(ScrapeRun.id == run_id, ScrapeRun.owner == owner, ScrapeRun.status == "running")
+        .values(heartbeat_at=datetime.now(timezone.utc))
+    ).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+async def keep_lease(session_factory: sessionmaker, run_id: int, owner: str, interval: float = None):
+    """
+    Renew the run's lease every `interval` seconds (a third of SCRAPE_RUN_LEASE_SECONDS by default)
+    until cancelled. Returns if the lease is lost, so the caller can watch the task to stop work.
+    """
+    interval = interval or RUN_LEASE.total_seconds() / 3
+
+    def renew() -> bool:
+        with session_factory() as db:
+            return renew_lease(db, run_id, owner)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await asyncio.to_thread(renew):
+                logger.warning(f"Lost the lease on scrape run {run_id}")
+                return
+        except Exception as e:
+            # A failed renewal is retried; the lease only lapses if they keep failing.
+            logger.error(f"Could not renew the lease on scrape run {run_id}: {e}")
+
+
+def pending_urls(db: Session, run_id: int) -> list[tuple[int, str]]:
+    """
+    Return (url_id, url) for every URL of the run that has not finished yet.
+    """
+    result = db.execute(
+        select(URLModel.id, URLModel.url)
+        .join(ScrapeRunItem, ScrapeRunItem.url_id == URLModel.id)
+        .filter(ScrapeRunItem.run_id == run_id, ScrapeRunItem.state == "pending")
+        .order_by(URLModel.id)
+    )
+    return [(row.id, row.url) for row in result]
+
+
+def record_url_result(
+    db: Session,
+    run_id: int,
+    url_id: int,
+    state: str,
+    new_scrapes: list[ScrapeModel] = (),
+    detail: str = None,
+):
+    """
+    Mark a URL of the run as finished. Does not commit, so the caller can commit it in the same
+    transaction as the scrapes it produced.
+    """
+    db.execute(
+        update(ScrapeRunItem)
+        .where(ScrapeRunItem.run_id == run_id, ScrapeRunItem.url_id == url_id)
+        .values(
+            state=state,
+            detail=detail,
+            finished_at=datetime.now(timezone.utc),
+            new_scrape_ids=(
+                json.dumps([scrape.id for scrape in new_scrapes])
+                if new_scrapes
+                else None
+            ),
+        )
+    )
+
+
+def run_batch_key(run_id: int) -> str:
+    return f"run:{run_id}"
+
+
+def release_run_notifications(db: Session, run_id: int):
+    """
+    Release the run's held outbox rows to the dispatcher and record when. Idempotent. Does not commit.
+    """
+    released = release_batch(db, run_batch_key(run_id))
+    db.execute(
+        update(ScrapeRun)
+        .where(ScrapeRun.id == run_id, ScrapeRun.notified_at.is_(None))
+        .values(notified_at=datetime.now(timezone.utc))
+    )
+    logger.info(f"Released {released} notifications for scrape run {run_id}")
+
+
+def finish_run(db: Session, run_id: int, owner: str = None) -> bool:
+    """
+    Mark the run completed and release its notifications in one transaction. Commits.
+
+    Only the first call for a running run, by the lease owner if given, completes it, so the
+    notifications are released once even if two workers race to finish it.
+
+    Returns:
+        bool: Whether this call completed the run.
+    """
+    statement = update(ScrapeRun).where(ScrapeRun.id == run_id, ScrapeRun.status == "running")
+    if owner is not None:
+        statement = statement.where(ScrapeRun.owner == owner)
+    finished = db.execute(
+        statement.values(status="completed", finished_at=datetime.now(timezone.utc))
+    ).rowcount
+    if not finished:
+        db.rollback()
+        return False
+    release_run_notifications(db, run_id)
+    db.commit()
+    return True
+
+
+def enforce_single_running_run(db: Session):
+    """
+    Data migration: abandon every running run but the newest, releasing their notifications, and
+    add the uq_scrape_runs_running index to an existing scrape_runs table.
+    """
+    running = db.execute(
+        select(ScrapeRun.id).filter(ScrapeRun.status == "running").order_by(ScrapeRun.started_at.desc())
+    ).scalars().all()
+    for run_id in running[1:]:
+        db.execute(
+            update(ScrapeRun)
+            .where(ScrapeRun.id == run_id)
+            .values(status="abandoned", finished_at=datetime.now(timezone.utc))
+        )
+        release_run_notifications(db, run_id)
+    db.commit()
+    for index in ScrapeRun.__table__.indexes:
+        if index.name == "uq_scrape_runs_running":
+            index.create(db.get_bind(), checkfirst=True)
@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import re
+import zlib
+from collections import defaultdict
+
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.events import CLUSTER_CHANNEL, notify
+from app.models import Scrape as ScrapeModel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Summaries whose estimated Jaccard similarity reaches this are treated as the same issue.
+CLUSTER_THRESHOLD = float(os.getenv("CLUSTER_THRESHOLD", "0.8"))
+
+# Keeps CLUSTER_CHANNEL payloads under PostgreSQL's 8000-byte NOTIFY limit
+NOTIFY_PAYLOAD_LIMIT = 7500
+
+# Smallest prime above 2**32, so (a * x + b) fits in uint64 for 32-bit a, b and x.
+_PRIME = np.uint64(4294967311)
+
+
+def issue_text(content: str) -> str:
+    """
+    The part of a scrape that identifies the issue: its summary. The originating update and status
+    differ between products and over time, so they are left out.
+    """
+    try:
+        row = json.loads(content)["known_issues"]["row"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return ""
+    return row.get("Summary", "") if isinstance(row, dict) else ""
+
+
+class MinHasher:
+    """
+    MinHash signatures over character shingles of whitespace- and case-normalized text.
+
+    Each of the `num_perm` hash functions is a universal hash (a * x + b) mod p applied to the
+    CRC32 of every shingle; the signature keeps the minimum per function. The fraction of equal
+    positions in two signatures estimates the Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        text = re.sub(r"\s+", " ", text.lower()).strip()
+        k = self.shingle_size
+        grams = {text[i : i + k] for i in range(max(1, len(text) - k + 1))}
+        return np.fromiter(
+            (zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams)
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingles(text)
+        permuted = (np.outer(hashes, self._a) + self._b) % _PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.count_nonzero(a == b)) / len(a)
+
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing over MinHash signatures.
+
+    Signatures are cut into `bands` bands of `rows` values; two signatures become candidates when
+    any band matches exactly. With 16 bands of 8 rows, pairs above roughly 0.7 similarity are very
+    likely to collide and pairs below 0.5 rarely do, so a lookup only touches a handful of
+    candidates however much history is indexed.
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 8):
+        self.bands = bands
+        self.rows = rows
+        self._buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+
+    def _keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows : (band + 1) * self.rows].tobytes()
+
+    def insert(self, key: int, signature: np.ndarray):
+        for bucket in self._keys(signature):
+            self._buckets[bucket].append(key)
+
+    def query(self, signature: np.ndarray) -> set[int]:
+        candidates = set()
+        for bucket in self._keys(signature):
+            candidates.update(self._buckets.get(bucket, ()))
+        return candidates
+
+
+class IssueClusterer:
+    """
+    Assign each scrape to a cluster of near-identical known issues, across URLs.
+
+    A new scrape joins the cluster of its most similar LSH candidate whose estimated similarity
+    reaches `threshold`, or starts a cluster of its own. The cluster ID is the ID of the cluster's
+    first scrape. Signatures are stored on the scrape rows, so the index is rebuilt at startup
+    without re-hashing history.
+
+    New signatures only enter the index once the scrapes holding them are committed: they are
+    published on CLUSTER_CHANNEL, and `apply_notification`, registered with `add_listener`, adds
+    them in every replica. A rolled-back ingest therefore leaves nothing behind to cluster onto.
+    """
+
+    def __init__(
+        self,
+        threshold: float = CLUSTER_THRESHOLD,
+        hasher: MinHasher = None,
+        bands: int = 16,
+        rows: int = 8,
+        session_factory: sessionmaker = None,
+    ):
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher(num_perm=bands * rows)
+        self._bands = bands
+        self._rows = rows
+        self.session_factory = session_factory
+        self.index = LSHIndex(bands, rows)
+        self._signatures: dict[int, np.ndarray] = {}
+        self._clusters: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: int, signature: np.ndarray, cluster_id: int):
+        if key in self._signatures:
+            return
+        self._signatures[key] = signature
+        self._clusters[key] = cluster_id
+        self.index.insert(key, signature)
+
+    def assign(
+        self, key: int, text: str, pending: dict[int, tuple[np.ndarray, int]] = None
+    ) -> tuple[int, np.ndarray]:
+        """
+        Cluster one issue. It is not added to the index.
+
+        Parameters:
+            key (int): The scrape ID.
+            text (str): The issue summary.
+            pending (dict, optional): Signatures and cluster IDs of not yet indexed scrapes, such as
+                earlier ones of the same batch, to compare against as well.
+
+        Returns:
+            tuple[int, np.ndarray]: The cluster ID and the issue's MinHash signature.
+        """
+        if not text.strip():
+            # Nothing to compare; an empty summary is its own issue.
+            return key, None
+        signature = self.hasher.signature(text)
+        candidates = {
+            candidate: (self._signatures[candidate], self._clusters[candidate])
+            for candidate in self.index.query(signature)
+        }
+        candidates.update(pending or {})
+        cluster_id, best_similarity = key, self.threshold
+        for candidate_signature, candidate_cluster in candidates.values():
+            similarity = MinHasher.similarity(signature, candidate_signature)
+            if similarity >= best_similarity:
+                cluster_id, best_similarity = candidate_cluster, similarity
+        return cluster_id, signature
+
+    def _cluster(self, scrapes: list[ScrapeModel]) -> dict[int, tuple[np.ndarray, int]]:
+        clustered = {}
+        for scrape in scrapes:
+            cluster_id, signature = self.assign(scrape.id, issue_text(scrape.content), clustered)
+            scrape.cluster_id = cluster_id
+            scrape.minhash = signature.tobytes() if signature is not None else None
+            if signature is not None:
+                clustered[scrape.id] = (signature, cluster_id)
+        return clustered
+
+    def cluster_scrapes(self, scrapes: list[ScrapeModel], db: Session = None):
+        """
+        Set `cluster_id` and `minhash` on flushed scrapes. Does not commit.
+
+        Parameters:
+            scrapes (list[ScrapeModel]): The scrapes, clustered against each other too.
+            db (Session, optional): The session the scrapes are committed in; their signatures are
+                published on CLUSTER_CHANNEL when it commits. Without one they are indexed at once.
+        """
+        clustered = self._cluster(scrapes)
+        if db is None:
+            for key, (signature, cluster_id) in clustered.items():
+                self.add(key, signature, cluster_id)
+            return
+        batch, size = [], 2
+        for key, (signature, cluster_id) in clustered.items():
+            entry = [key, cluster_id, signature.tobytes().hex()]
+            entry_size = len(json.dumps(entry, separators=(",", ":"))) + 1
+            if batch and size + entry_size > NOTIFY_PAYLOAD_LIMIT:
+                notify(db, CLUSTER_CHANNEL, json.dumps(batch, separators=(",", ":")))
+                batch, size = [], 2
+            batch.append(entry)
+            size += entry_size
+        if batch:
+            notify(db, CLUSTER_CHANNEL, json.dumps(batch, separators=(",", ":")))
+
+    def apply_notification(self, payload: Optional[str]):
+        """
+        Handle a CLUSTER_CHANNEL event: index the committed signatures it lists, or reload the index
+        from the database after the PostgreSQL listener reconnected, as events may have been missed.
+        """
+        if payload is None:
+            if self.session_factory is not None:
+                with self.session_factory() as db:
+                    self._load_index(db)
+            return
+        for key, cluster_id, signature in json.loads(payload):
+            self.add(key, np.frombuffer(bytes.fromhex(signature), dtype=np.uint32), cluster_id)
+
+    def _load_index(self, db: Session):
+        index, signatures, clusters = LSHIndex(self._bands, self._rows), {}, {}
+        for scrape_id, cluster_id, minhash in db.execute(
+            select(ScrapeModel.id, ScrapeModel.cluster_id, ScrapeModel.minhash)
+            .filter(ScrapeModel.minhash.isnot(None))
+            .order_by(ScrapeModel.id)
+        ):
+            signature = np.frombuffer(minhash, dtype=np.uint32)
+            signatures[scrape_id], clusters[scrape_id] = signature, cluster_id
+            index.insert(scrape_id, signature)
+        self.index, self._signatures, self._clusters = index, signatures, clusters
+
+    def load(self, db: Session, batch_size: int = 1000):
+        """
+        Rebuild the index from stored signatures, then cluster any scrapes that have none yet
+        (e.g. history from before clustering existed), oldest first. Commits the backfill, and
+        indexes each batch once it is committed.
+        """
+        self._load_index(db)
+
+        backfilled = 0
+        while True:
+            scrapes = (
+                db.execute(
+                    select(ScrapeModel)
+                    .filter(ScrapeModel.cluster_id.is_(None))
+                    .order_by(ScrapeModel.id)
+                    .limit(batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            if not scrapes:
+                break
+            clustered = self._cluster(scrapes)
+            db.commit()
+            for key, (signature, cluster_id) in clustered.items():
+                self.add(key, signature, cluster_id)
+            backfilled += len(scrapes)
+        logger.info(
+            f"Issue clusters loaded: {len(self)} signatures, {backfilled} scrapes backfilled"
+        )
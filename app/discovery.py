@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Awaitable, Callable, Iterable
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app.url_repository import URLRepository, normalize_url
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DISCOVERY_INDEX_URLS = [
+    url.strip()
+    for url in os.getenv(
+        "DISCOVERY_INDEX_URLS", "https://learn.microsoft.com/en-us/windows/release-health/"
+    ).split(",")
+    if url.strip()
+]
+DISCOVERY_MAX_CONCURRENCY = int(os.getenv("DISCOVERY_MAX_CONCURRENCY", "4"))
+DISCOVERY_MAX_DEPTH = int(os.getenv("DISCOVERY_MAX_DEPTH", "1"))
+DISCOVERY_TIMEOUT = float(os.getenv("DISCOVERY_TIMEOUT", "30"))
+
+# Release-health status pages, e.g. /en-us/windows/release-health/status-windows-11-24h2
+STATUS_PAGE_PATTERN = re.compile(r"/release-health/status-windows-[\w.-]+/?$", re.IGNORECASE)
+
+Fetch = Callable[[str], Awaitable[str]]
+
+
+def page_key(url: str) -> str | None:
+    """
+    Identity of the page a URL points at, for comparing discovered links with monitored URLs.
+
+    Query and fragment are dropped and the path is lowercased, since learn.microsoft.com paths are
+    case-insensitive and monitored URLs often carry a `#known-issues` fragment.
+    """
+    normalized = normalize_url(url)
+    if normalized is None:
+        return None
+    parts = urlsplit(normalized)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.lower().rstrip("/"), "", ""))
+
+
+def is_status_page(url: str) -> bool:
+    return bool(STATUS_PAGE_PATTERN.search(urlsplit(url).path))
+
+
+def extract_links(html: str, base_url: str) -> set[str]:
+    """
+    Absolute http(s) links of a page, without fragments.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    links = set()
+    for anchor in soup.select("a[href]"):
+        link = normalize_url(urljoin(base_url, anchor["href"]))
+        if link is not None:
+            links.add(urlunsplit(urlsplit(link)._replace(fragment="")))
+    return links
+
+
+class ReleaseHealthDiscovery:
+    """
+    Crawl release-health index and navigation pages for links to status pages.
+
+    Starting from `index_urls`, pages are fetched level by level up to `max_depth` links away,
+    at most `max_concurrency` at a time. Only pages on the same host and under the same directory as
+    an index page are followed; status pages themselves are collected but not crawled.
+
+    Parameters:
+        index_urls (list[str]): Pages to start from.
+        fetch (Fetch, optional): Coroutine returning a page's HTML; pass saved pages to crawl
+            offline. Defaults to plain HTTP GETs, as these pages are served pre-rendered.
+        max_concurrency (int): Pages fetched at once.
+        max_depth (int): How many links away from an index page to follow navigation pages.
+        max_pages (int): Upper bound on pages fetched per crawl.
+    """
+
+    def __init__(
+        self,
+        index_urls: list[str] = None,
+        fetch: Fetch = None,
+        max_concurrency: int = DISCOVERY_MAX_CONCURRENCY,
+        max_depth: int = DISCOVERY_MAX_DEPTH,
+        max_pages: int = 200,
+    ):
+        self.index_urls = index_urls or DISCOVERY_INDEX_URLS
+        self.fetch = fetch
+        self.max_concurrency = max_concurrency
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+
+    def _in_scope(self, url: str) -> bool:
+        parts = urlsplit(url)
+        for index_url in self.index_urls:
+            index = urlsplit(index_url)
+            directory = index.path.rsplit("/", 1)[0].lower() + "/"
+            if parts.netloc == index.netloc and parts.path.lower().startswith(directory):
+                return True
+        return False
+
+    async def _http_fetch(self, client: httpx.AsyncClient, url: str) -> str:
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.text
+
+    async def crawl(self) -> set[str]:
+        """
+        Returns:
+            set[str]: Status page URLs linked from the crawled pages, normalized and without fragments.
+        """
+        client = None
+        fetch = self.fetch
+        if fetch is None:
+            client = httpx.AsyncClient(follow_redirects=True, timeout=DISCOVERY_TIMEOUT)
+            fetch = lambda url: self._http_fetch(client, url)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def visit(url: str) -> set[str]:
+            async with semaphore:
+                try:
+                    html = await fetch(url)
+                except Exception as e:
+                    logger.warning(f"Discovery could not fetch {url}: {e}")
+                    return set()
+            return await asyncio.to_thread(extract_links, html, url)
+
+        found, seen = set(), set()
+        level = [url for url in map(normalize_url, self.index_urls) if url]
+        try:
+            for depth in range(self.max_depth + 1):
+                level = [url for url in dict.fromkeys(level) if url not in seen]
+                level = level[: max(self.max_pages - len(seen), 0)]
+                if not level:
+                    break
+                seen.update(level)
+                results = await asyncio.gather(*(visit(url) for url in level))
+
+                next_level = []
+                for links in results:
+                    for link in links:
+                        if is_status_page(link):
+                            found.add(link)
+                        elif self._in_scope(link):
+                            next_level.append(link)
+                level = next_level
+        finally:
+            if client is not None:
+                await client.aclose()
+        logger.info(f"Discovery crawled {len(seen)} pages and found {len(found)} status pages")
+        return found
+
+
+def new_status_pages(found: Iterable[str], known: Iterable[str]) -> list[str]:
+    """
+    Status pages in `found` that are not already monitored, compared by `page_key`.
+    """
+    known_keys = {page_key(url) for url in known}
+    new = {}
+    for url in found:
+        key = page_key(url)
+        if key is not None and key not in known_keys:
+            new.setdefault(key, url)
+    return sorted(new.values())
+
+
+async def discover_status_pages(
+    discovery: ReleaseHealthDiscovery, url_repo: URLRepository, session_factory
+) -> list[str]:
+    """
+    Crawl for status pages and register the ones not monitored yet.
+
+    Returns:
+        list[str]: The newly registered URLs.
+    """
+    found = await discovery.crawl()
+
+    def register():
+        with session_factory() as db:
+            # Compared with every monitored URL, not just the cached ones
+            new_urls = new_status_pages(found, url_repo.all_urls(db))
+            return new_urls, url_repo.bulk_create(db, new_urls) if new_urls else None
+
+    new_urls, result = await asyncio.to_thread(register)
+    if not new_urls:
+        return []
+    logger.info(f"Discovery registered {result['created']} new status pages: {new_urls}")
+    return new_urls
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Published after new scrapes or changes are committed.
+FEED_CHANNEL = "scrape_feed"
+# JSON events for the dashboard: new scrapes and triage updates, with the URL they belong to.
+DASHBOARD_CHANNEL = "dashboard_events"
+# JSON lists of [id, url] pairs of newly created URLs, for the URL cache.
+URL_CHANNEL = "url_changes"
+# JSON lists of [scrape id, cluster id, hex MinHash signature] of newly clustered scrapes.
+CLUSTER_CHANNEL = "issue_clusters"
+# Published after subscriptions are created or deleted, so every replica rebuilds its routing index.
+SUBSCRIPTION_CHANNEL = "subscription_changes"
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for "something changed" signals, used to wake long-polling and
+    streaming clients.
+
+    A waiter takes the channel's current event *before* reading the data it is waiting on and then
+    awaits it; `publish` sets that event and installs a fresh one. A publish that lands between the
+    read and the wait is therefore never missed. `publish` is safe to call from any thread.
+
+    Subscribers that need every payload, such as event streams, get a queue of their own instead.
+    """
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._events: dict[str, asyncio.Event] = {}
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._loop: asyncio.AbstractEventLoop = None
+
+    def current(self, channel: str) -> asyncio.Event:
+        """
+        The event that the next publish on `channel` will set. Must be called on the event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        if channel not in self._events:
+            self._events[channel] = asyncio.Event()
+        return self._events[channel]
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        """
+        Receive every payload published on `channel` from now on. Must be called on the event loop.
+
+        A subscriber that falls `queue_size` payloads behind loses the oldest ones and receives
+        None in their place, telling it to resynchronize.
+        """
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        self._subscribers.get(channel, set()).discard(queue)
+
+    def publish(self, channel: str, payload: str = ""):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fire(channel, payload)
+        else:
+            loop.call_soon_threadsafe(self._fire, channel, payload)
+
+    def _fire(self, channel: str, payload: str):
+        fired = self._events.pop(channel, None)
+        if fired is not None:
+            fired.set()
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                queue.get_nowait()
+                queue.get_nowait()
+                queue.put_nowait(None)
+            queue.put_nowait(payload)
+
+    async def wait(self, channel: str, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for the next publish on `channel`.
+
+        Returns:
+            bool: True if something was published.
+        """
+        try:
+            await asyncio.wait_for(self.current(channel).wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+bus = EventBus()
+
+
+def notify(db: Session, channel: str, payload: str = ""):
+    """
+    Publish on `channel` once the session's transaction commits, so woken clients see the new rows.
+    Nothing is published if the transaction rolls back.
+
+    On PostgreSQL a NOTIFY is also issued in the transaction, which PostgreSQL delivers on commit to
+    every replica running a `PostgresListener`. When this process's own listener is listening on
+    `channel`, it is left to deliver the event here too, so that it is handled only once.
+    """
+    # Begin the transaction if needed, so a rollback discards the pending events. A NOTIFY is part of
+    # a write, so a session routing reads to a replica sends it to the primary.
+    connection = db.connection(bind_arguments={"for_write": True})
+    if connection.dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": channel, "payload": payload},
+            bind_arguments={"for_write": True},
+        )
+        if channel in _listening:
+            return
+    db.info.setdefault("pending_events", []).append((channel, payload))
+
+
+def notify_dashboard(db: Session, event_type: str, url_id: int, scrape_ids: list[int]):
+    """
+    Queue a dashboard event (`scrape.new`, `scrape.triage` or `scrape.archived`) for publishing on
+    commit.
+    """
+    notify(
+        db,
+        DASHBOARD_CHANNEL,
+        json.dumps({"type": event_type, "url_id": url_id, "scrape_ids": scrape_ids}),
+    )
+
+
+_listeners: dict[str, list[Callable[[Optional[str]], None]]] = {}
+# Channels a `PostgresListener` in this process is currently listening on.
+_listening: set[str] = set()
+
+
+def add_listener(channel: str, callback: Callable[[Optional[str]], None]):
+    """
+    Call `callback(payload)` once for every event on `channel`: right after the commit that queued it
+    in this process, or as `PostgresListener` receives it when listening on the channel. It is called
+    with None when the listener (re)connects, since events may have been missed meanwhile.
+
+    Callbacks run synchronously on the committing or listening thread, for process-wide state such
+    as caches, so they must be quick and thread-safe.
+    """
+    _listeners.setdefault(channel, []).append(callback)
+
+
+def remove_listener(channel: str, callback: Callable[[Optional[str]], None]):
+    if callback in _listeners.get(channel, []):
+        _listeners[channel].remove(callback)
+
+
+def run_listeners(channel: str, payload: Optional[str]):
+    for callback in list(_listeners.get(channel, ())):
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.error(f"Handling an event on {channel} failed: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session):
+    for channel, payload in session.info.pop("pending_events", []):
+        run_listeners(channel, payload)
+        bus.publish(channel, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop("pending_events", None)
+
+
+class PostgresListener:
+    """
+    LISTEN on PostgreSQL channels in a background thread and republish notifications on the local
+    bus, so writes committed by other replicas wake this replica's clients too. Channels with
+    callbacks registered through `add_listener` are listened on as well, and their callbacks run.
+    """
+
+    def __init__(self, engine, channels: list[str], target: EventBus = bus):
+        self.engine = engine
+        self.target = target
+        self._channels = channels
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def channels(self) -> list[str]:
+        return list(dict.fromkeys([*self._channels, *_listeners]))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pg-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def dispatch(self, channel: str, payload: str):
+        run_listeners(channel, payload)
+        self.target.publish(channel, payload)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"PostgreSQL listener failed ({e}); reconnecting")
+                self._stop.wait(5)
+
+    def _listen(self):
+        connection = self.engine.raw_connection()
+        # Kept out of the pool: it is switched to autocommit and holds the LISTENs.
+        connection.detach()
+        channels = self.channels
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                for channel in channels:
+                    cursor.execute(f"LISTEN {channel}")
+            logger.info(f"Listening for PostgreSQL notifications on {channels}")
+            _listening.update(channels)
+            for channel in channels:
+                run_listeners(channel, None)
+            while not self._stop.is_set():
+                if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notification = dbapi_connection.notifies.pop(0)
+                    self.dispatch(notification.channel, notification.payload)
+        finally:
+            _listening.difference_update(channels)
+            connection.close()
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import json
+import logging
+
+from sqlalchemy import event, func, text, update
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.models import Scrape as ScrapeModel, Change
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Serializes `sequence_feed` across connections on PostgreSQL
+FEED_SEQUENCE_LOCK = 0x6665656473657131
+SEQUENCE_BATCH_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(scrape_seq: int, change_seq: int) -> str:
+    raw = json.dumps({"s": scrape_seq, "c": change_seq}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    """
+    Raises:
+        InvalidCursor: If the cursor was not produced by `encode_cursor`.
+    """
+    if not cursor:
+        return 0, 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        return int(position["s"]), int(position["c"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor(f"Invalid feed cursor: {cursor}")
+
+
+def sequence_feed(db: Session) -> int:
+    """
+    Give every scrape and change that has no feed position yet the next positions, in ID order.
+    Does not commit.
+
+    IDs are handed out when rows are inserted, not when they commit, so a row can become visible
+    after one with a higher ID; a cursor on IDs would step over it for good. Positions are instead
+    assigned by the writing transaction right before it commits (see `_sequence_before_commit`),
+    one transaction at a time: on PostgreSQL under an advisory lock held until the commit, while
+    SQLite serializes writers anyway. The next writer only reads the highest position once this
+    one has committed, so positions follow commit order and a reader never sees a position while
+    a lower one is still to become visible.
+
+    Returns:
+        int: The number of rows given a position.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": FEED_SEQUENCE_LOCK})
+    sequenced = 0
+    for model in (ScrapeModel, Change):
+        last = db.execute(select(func.max(model.feed_seq))).scalar() or 0
+        while True:
+            ids = (
+                db.execute(
+                    select(model.id)
+                    .filter(model.feed_seq.is_(None))
+                    .order_by(model.id)
+                    .limit(SEQUENCE_BATCH_SIZE)
+                )
+                .scalars()
+                .all()
+            )
+            if not ids:
+                break
+            db.execute(
+                update(model),
+                [{"id": row_id, "feed_seq": last + n} for n, row_id in enumerate(ids, 1)],
+            )
+            last += len(ids)
+            sequenced += len(ids)
+    if sequenced:
+        logger.info(f"Assigned feed positions to {sequenced} rows")
+    return sequenced
+
+
+@event.listens_for(Session, "after_flush")
+def _track_feed_rows(session: Session, flush_context):
+    if any(isinstance(instance, (ScrapeModel, Change)) for instance in session.new):
+        session.info["feed_rows"] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _sequence_before_commit(session: Session):
+    """
+    Position the scrapes and changes a transaction inserted as it commits, so the feed's readers
+    never write.
+    """
+    session.flush()
+    if session.info.pop("feed_rows", False):
+        sequence_feed(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_feed_rows(session: Session):
+    session.info.pop("feed_rows", None)
+
+
+def number_existing_rows(db: Session):
+    """
+    Data migration: position the rows stored before feed positions existed at their IDs, so
+    cursors handed out before keep their meaning.
+    """
+    for model in (ScrapeModel, Change):
+        db.execute(update(model).where(model.feed_seq.is_(None)).values(feed_seq=model.id))
+    db.commit()
+
+
+def read_feed(db: Session, cursor: str, limit: int) -> dict:
+    """
+    Read the scrapes and changes committed after a cursor.
+
+    The cursor records the last scrape and change feed positions returned. Positions are assigned
+    in commit order by the writers (see `sequence_feed`), so following the returned cursor never
+    repeats or skips an item, even with several writers, and reading writes nothing. Up to `limit`
+    of each are returned; `has_more` says whether either was cut short.
+
+    Returns:
+        dict: `scrapes`, `changes`, the next `cursor` and `has_more`.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    after_scrape, after_change = decode_cursor(cursor)
+    scrapes = (
+        db.execute(
+            select(ScrapeModel)
+            .filter(ScrapeModel.feed_seq > after_scrape)
+            .order_by(ScrapeModel.feed_seq)
+            .limit(limit + 1)
+        )
+        .scalars()
+        .all()
+    )
+    changes = (
+        db.execute(
+            select(Change)
+            .filter(Change.feed_seq > after_change)
+            .order_by(Change.feed_seq)
+            .limit(limit + 1)
+        )
+        .scalars()
+        .all()
+    )
+    has_more = len(scrapes) > limit or len(changes) > limit
+    scrapes, changes = scrapes[:limit], changes[:limit]
+    return {
+        "scrapes": scrapes,
+        "changes": changes,
+        "cursor": encode_cursor(
+            scrapes[-1].feed_seq if scrapes else after_scrape,
+            changes[-1].feed_seq if changes else after_change,
+        ),
+        "has_more": has_more,
+    }
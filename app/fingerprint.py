@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import re
+from collections import defaultdict
+from typing import Any
+
+from sqlalchemy import delete, update
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.models import Scrape as ScrapeModel, Change, KnownIssue, OutboxMessage, ScrapeRunItem
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "2024-06-28 13:33 PT", "2024-06-28T13:33:00Z", "2024-06-28 13:33:00+00:00", "2024-06-28"
+_DATE_PATTERN = re.compile(
+    r"^(\d{4})-(\d{1,2})-(\d{1,2})"
+    r"(?:[ T](\d{1,2}):(\d{2})(?::\d{2}(?:\.\d+)?)?)?"
+    r"\s*(?:PT|PST|PDT|UTC|GMT|Z|[+-]\d{2}:?\d{2})?$",
+    re.IGNORECASE,
+)
+
+
+def normalize_text(value: str) -> str:
+    """
+    Collapse runs of whitespace (including non-breaking spaces) and strip the ends, and rewrite a
+    value that is entirely a date or timestamp as `YYYY-MM-DD` or `YYYY-MM-DDTHH:MM`, dropping
+    seconds and any timezone suffix.
+    """
+    value = " ".join(value.split())
+    match = _DATE_PATTERN.match(value)
+    if match:
+        year, month, day, hour, minute = match.groups()
+        value = f"{year}-{int(month):02d}-{int(day):02d}"
+        if hour is not None:
+            value += f"T{int(hour):02d}:{minute}"
+    return value
+
+
+def canonicalize(data: Any) -> Any:
+    """
+    Normalize every string in a JSON-like structure with `normalize_text`. Key order is handled
+    when serializing.
+    """
+    if isinstance(data, dict):
+        return {normalize_text(str(key)): canonicalize(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [canonicalize(value) for value in data]
+    if isinstance(data, str):
+        return normalize_text(data)
+    return data
+
+
+def canonical_json(data: Any) -> str:
+    return json.dumps(
+        canonicalize(data), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+
+
+def digest(text: str) -> str:
+    """
+    BLAKE2b with a 16-byte digest: 32 hex characters, the width of `scrapes.hash`.
+    """
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def fingerprint(data: Any) -> str:
+    """
+    Fingerprint scraped data so that whitespace, key order, separators and date formatting do not
+    make identical content look new.
+    """
+    return digest(canonical_json(data))
+
+
+def content_fingerprint(content: str) -> str:
+    """
+    Fingerprint a stored `content` string: JSON content is fingerprinted canonically, anything
+    else after whitespace normalization.
+    """
+    try:
+        return fingerprint(json.loads(content))
+    except (json.JSONDecodeError, TypeError):
+        return digest(normalize_text(content or ""))
+
+
+def _kept_ids(scrape_ids: list[int], duplicates: dict[int, int]) -> list[int]:
+    return list(dict.fromkeys(duplicates.get(scrape_id, scrape_id) for scrape_id in scrape_ids))
+
+
+def repoint_pending_scrape_ids(db: Session, duplicates: dict[int, int]):
+    """
+    Replace deleted duplicates by their kept scrape in the scrape IDs of run items and of outbox
+    rows not delivered yet, so digests still find every scrape. Sent and dead outbox rows are
+    history that is never read again and are left alone. Does not commit.
+
+    Parameters:
+        duplicates (dict[int, int]): Duplicate scrape ID to the ID of the scrape kept instead.
+    """
+    for item in db.execute(
+        select(ScrapeRunItem).filter(ScrapeRunItem.new_scrape_ids.isnot(None))
+    ).scalars():
+        scrape_ids = json.loads(item.new_scrape_ids)
+        kept = _kept_ids(scrape_ids, duplicates)
+        if kept != scrape_ids:
+            item.new_scrape_ids = json.dumps(kept)
+    for message in db.execute(
+        select(OutboxMessage).filter(OutboxMessage.status.in_(("held", "pending", "sending")))
+    ).scalars():
+        payload = json.loads(message.payload)
+        kept = _kept_ids(payload["scrape_ids"], duplicates)
+        if kept != payload["scrape_ids"]:
+            message.payload = json.dumps({**payload, "scrape_ids": kept})
+
+
+def rehash_and_dedupe_scrapes(db: Session, batch_size: int = 1000) -> tuple[int, int]:
+    """
+    Recompute every scrape's hash with `content_fingerprint` and delete scrapes that are duplicates
+    of an earlier scrape of the same URL under the new fingerprint. Commits.
+
+    The earliest scrape of each (url_id, fingerprint) is kept and takes over the duplicates' triage
+    fields where its own are unset. Changes recorded against a duplicate were caused by
+    formatting noise and are deleted. Every other reference to a duplicate is pointed at the kept
+    scrape: as a previous version, an issue's latest scrape, a cluster (whose ID is its first
+    scrape's), and in run items and undelivered outbox rows (see `repoint_pending_scrape_ids`).
+
+    Returns:
+        tuple[int, int]: The number of scrapes rehashed and the number deleted.
+    """
+    keepers: dict[tuple[int, str], int] = {}
+    duplicates: dict[int, int] = {}
+    last_id, rehashed = 0, 0
+    while True:
+        rows = db.execute(
+            select(ScrapeModel.id, ScrapeModel.url_id, ScrapeModel.content)
+            .filter(ScrapeModel.id > last_id)
+            .order_by(ScrapeModel.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        hashes = []
+        for scrape_id, url_id, content in rows:
+            new_hash = content_fingerprint(content)
+            keeper = keepers.setdefault((url_id, new_hash), scrape_id)
+            if keeper != scrape_id:
+                duplicates[scrape_id] = keeper
+            hashes.append({"id": scrape_id, "hash": new_hash})
+        db.execute(update(ScrapeModel), hashes)
+        db.commit()
+        last_id = rows[-1][0]
+        rehashed += len(rows)
+
+    if duplicates:
+        repoint_pending_scrape_ids(db, duplicates)
+        db.commit()
+
+    by_keeper = defaultdict(list)
+    for duplicate, keeper in duplicates.items():
+        by_keeper[keeper].append(duplicate)
+    for keeper_id, duplicate_ids in by_keeper.items():
+        keeper = db.get(ScrapeModel, keeper_id)
+        for duplicate in db.execute(
+            select(ScrapeModel)
+            .filter(ScrapeModel.id.in_(duplicate_ids))
+            .order_by(ScrapeModel.id)
+        ).scalars():
+            keeper.scrape_type = keeper.scrape_type or duplicate.scrape_type
+            keeper.scrape_comment = keeper.scrape_comment or duplicate.scrape_comment
+            keeper.create_alert = keeper.create_alert or duplicate.create_alert
+        db.execute(delete(Change).where(Change.scrape_id.in_(duplicate_ids)))
+        db.execute(
+            update(Change)
+            .where(Change.previous_scrape_id.in_(duplicate_ids))
+            .values(previous_scrape_id=keeper_id)
+        )
+        db.execute(
+            update(KnownIssue)
+            .where(KnownIssue.latest_scrape_id.in_(duplicate_ids))
+            .values(latest_scrape_id=keeper_id)
+        )
+        db.execute(
+            update(ScrapeModel)
+            .where(ScrapeModel.cluster_id.in_(duplicate_ids))
+            .values(cluster_id=keeper.cluster_id or keeper_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(delete(ScrapeModel).where(ScrapeModel.id.in_(duplicate_ids)))
+        db.commit()
+
+    logger.info(
+        f"Rehashed {rehashed} scrapes; deleted {len(duplicates)} duplicates"
+    )
+    return rehashed, len(duplicates)
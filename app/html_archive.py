@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy.orm import Session
+
+from app.database import insert_for
+from app.models import PageSnapshot
+
+try:
+    import zstandard
+except ImportError:  # optional: without it pages are stored gzip-compressed
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HTML_ARCHIVE_DIR = os.getenv("HTML_ARCHIVE_DIR", "archive/html")
+HTML_ARCHIVE_ZSTD_LEVEL = int(os.getenv("HTML_ARCHIVE_ZSTD_LEVEL", "10"))
+
+# Key of the archived page's hash in `scrape_url` results
+HTML_HASH_KEY = "html_sha256"
+
+
+def html_hash(html: str) -> str:
+    return hashlib.sha256(html.encode()).hexdigest()
+
+
+class HTMLArchive:
+    """
+    Content-addressed store of fetched pages on disk.
+
+    Each distinct page is stored once, compressed, under the SHA-256 of its HTML:
+    `root/ab/abcdef....html.zst`, or `.html.gz` where zstandard is not installed. Files are written
+    to a temporary name and renamed, so a reader never sees a partial page, and several processes
+    can share one archive.
+
+    Parameters:
+        root (str): Directory of the archive.
+        level (int): zstd compression level.
+    """
+
+    SUFFIXES = (".html.zst", ".html.gz")
+
+    def __init__(self, root: str = HTML_ARCHIVE_DIR, level: int = HTML_ARCHIVE_ZSTD_LEVEL):
+        self.root = Path(root)
+        self.level = level
+
+    def _path(self, digest: str, suffix: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{suffix}"
+
+    def find(self, digest: str) -> Path | None:
+        for suffix in self.SUFFIXES:
+            path = self._path(digest, suffix)
+            if path.exists():
+                return path
+        return None
+
+    def __contains__(self, digest: str) -> bool:
+        return self.find(digest) is not None
+
+    def put(self, html: str) -> str:
+        """
+        Store a page unless an identical one is already stored.
+
+        Returns:
+            str: The page's hash, its address in the archive.
+        """
+        digest = html_hash(html)
+        if digest in self:
+            return digest
+        if zstandard is not None:
+            path = self._path(digest, ".html.zst")
+            data = zstandard.ZstdCompressor(level=self.level).compress(html.encode())
+        else:
+            path = self._path(digest, ".html.gz")
+            data = gzip.compress(html.encode(), mtime=0)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, partial = tempfile.mkstemp(dir=path.parent, suffix=".partial")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(partial, path)
+        except BaseException:
+            os.unlink(partial)
+            raise
+        return digest
+
+    def get(self, digest: str) -> str:
+        """
+        Raises:
+            KeyError: If no page with this hash is stored.
+        """
+        path = self.find(digest)
+        if path is None:
+            raise KeyError(digest)
+        data = path.read_bytes()
+        if path.name.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is needed to read {path}")
+            return zstandard.ZstdDecompressor().decompress(data).decode()
+        return gzip.decompress(data).decode()
+
+    def digests(self) -> Iterator[str]:
+        for suffix in self.SUFFIXES:
+            for path in self.root.glob(f"*/*{suffix}"):
+                yield path.name[: -len(suffix)]
+
+
+def record_snapshot(db: Session, url_id: int, digest: str, fetched_at: datetime):
+    """
+    Record that `url_id` served the archived page `digest` at `fetched_at`. A page fetched again
+    only moves its `last_fetched_at`. Does not commit.
+    """
+    insert = insert_for(db)
+    statement = insert(PageSnapshot).values(
+        url_id=url_id, html_hash=digest, first_fetched_at=fetched_at, last_fetched_at=fetched_at
+    )
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[PageSnapshot.url_id, PageSnapshot.html_hash],
+            set_={"last_fetched_at": statement.excluded.last_fetched_at},
+        )
+    )
@@ -0,0 +1,87 @@
+"""
+Import monitored URLs in bulk through the API.
+
+    python -m app.import_urls urls.txt [more.txt ...]
+    cat urls.txt | python -m app.import_urls -
+
+Input files hold one URL per line; blank lines and lines starting with "#" are ignored. URLs are
+sent to `POST /urls/bulk` in batches, so the running API's URL cache stays in sync.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import Iterable, Iterator
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+BATCH_SIZE = 5000
+
+
+def read_urls(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def import_urls(urls: list[str], api_url: str = API_URL, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Post `urls` to the bulk import endpoint in batches and add up the results.
+
+    Raises:
+        requests.HTTPError: If the API rejects a batch.
+    """
+    totals = {"created": 0, "skipped": 0, "invalid": []}
+    with requests.Session() as session:
+        for start in range(0, len(urls), batch_size):
+            response = session.post(
+                f"{api_url.rstrip('/')}/urls/bulk",
+                json={"urls": urls[start : start + batch_size]},
+                timeout=120,
+            )
+            response.raise_for_status()
+            result = response.json()
+            totals["created"] += result["created"]
+            totals["skipped"] += result["skipped"]
+            totals["invalid"] += result["invalid"]
+    return totals
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import monitored URLs in bulk.")
+    parser.add_argument("files", nargs="+", help="Files with one URL per line, or - for stdin")
+    parser.add_argument("--api-url", default=API_URL, help=f"API base URL (default {API_URL})")
+    args = parser.parse_args(argv)
+
+    urls = []
+    for name in args.files:
+        if name == "-":
+            urls.extend(read_urls(sys.stdin))
+        else:
+            with open(name, encoding="utf-8") as f:
+                urls.extend(read_urls(f))
+    if not urls:
+        logger.warning("No URLs to import")
+        return 0
+
+    try:
+        result = import_urls(urls, args.api_url)
+    except requests.RequestException as e:
+        logger.error(f"Import failed: {e}")
+        return 1
+    for url in result["invalid"]:
+        logger.warning(f"Invalid URL skipped: {url}")
+    print(f"{result['created']} created, {result['skipped']} skipped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
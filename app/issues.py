@@ -0,0 +1,286 @@
+import json
+import logging
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, case, or_, update
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.database import insert_for
+from app.fingerprint import digest
+from app.models import Scrape as ScrapeModel, KnownIssue, Change
+from app.scraper import ISSUE_DETAILS_KEY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Change.change_type -> known-issue row field compared between versions. The summary is not
+# compared: versions of an issue share its normalized summary (see issue_fingerprint), so only
+# case, punctuation and whitespace could differ, and a reworded summary starts a new issue.
+DIFF_FIELDS = {
+    "status": "Status",
+    "last_updated": "Last updated",
+}
+
+
+def normalize_title(text: str) -> str:
+    """
+    Lowercase, drop punctuation and collapse whitespace, so cosmetic edits to a summary keep its identity.
+    """
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def issue_row(scrape: ScrapeModel) -> dict:
+    try:
+        row = json.loads(scrape.content)["known_issues"]["row"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return {}
+    return row if isinstance(row, dict) else {}
+
+
+def issue_fingerprint(row: dict) -> str:
+    """
+    Identity of a known issue within one product: a hash of its normalized summary. Status,
+    originating update and "Last updated" change over the issue's life and are left out.
+
+    Returns:
+        str: 32 hex characters, or None if the row has no summary.
+    """
+    title = normalize_title(row.get("Summary", ""))
+    if not title:
+        return None
+    return digest(title)
+
+
+def link_known_issues(db: Session, scrapes: list[ScrapeModel]):
+    """
+    Upsert the known issue of each flushed scrape and link the scrape to it. Does not commit.
+
+    The upsert is keyed by the (url_id, fingerprint) unique index, so the first version of an
+    issue creates its entity and later versions move its `last_seen`, status and latest scrape.
+    A version older than the latest, re-extracted from archived pages, only moves `first_seen`.
+
+    Parameters:
+        db (Session): The database session.
+        scrapes (list[ScrapeModel]): New scrapes, oldest first.
+    """
+    insert = insert_for(db)
+    for scrape in scrapes:
+        row = issue_row(scrape)
+        fingerprint = issue_fingerprint(row)
+        if fingerprint is None:
+            continue
+        statement = insert(KnownIssue).values(
+            url_id=scrape.url_id,
+            fingerprint=fingerprint,
+            title=row.get("Summary"),
+            status=row.get("Status"),
+            first_seen=scrape.timestamp,
+            last_seen=scrape.timestamp,
+            latest_scrape_id=scrape.id,
+        )
+        excluded = statement.excluded
+        newer = or_(KnownIssue.last_seen.is_(None), excluded.last_seen >= KnownIssue.last_seen)
+        statement = statement.on_conflict_do_update(
+            index_elements=["url_id", "fingerprint"],
+            set_={
+                "title": case((newer, excluded.title), else_=KnownIssue.title),
+                "status": case((newer, excluded.status), else_=KnownIssue.status),
+                "first_seen": case(
+                    (excluded.first_seen < KnownIssue.first_seen, excluded.first_seen),
+                    else_=KnownIssue.first_seen,
+                ),
+                "last_seen": case((newer, excluded.last_seen), else_=KnownIssue.last_seen),
+                "latest_scrape_id": case(
+                    (newer, excluded.latest_scrape_id), else_=KnownIssue.latest_scrape_id
+                ),
+            },
+        ).returning(KnownIssue.id)
+        scrape.known_issue_id = db.execute(statement).scalar_one()
+
+
+def record_issue_details(db: Session, url_id: int, rows: list[dict], overwrite: bool = True) -> int:
+    """
+    Store the "Issue details" section parsed with each known-issue row on the row's known issue.
+    Does not commit.
+
+    Details are not part of a scrape's content, so a details-only edit (a new workaround, say)
+    updates the known issue without creating a version or an alert. Rows whose issue has not been
+    stored yet are skipped.
+
+    Parameters:
+        db (Session): The database session.
+        url_id (int): The URL the rows were scraped from.
+        rows (list[dict]): Parsed known-issue rows, as in `scrape_url` results.
+        overwrite (bool): Whether to replace stored details, or only fill in missing ones, as for
+            pages parsed again from the archive.
+
+    Returns:
+        int: The number of known issues updated.
+    """
+    updated = 0
+    for row in rows:
+        details = row.get(ISSUE_DETAILS_KEY)
+        fingerprint = issue_fingerprint(row)
+        if not details or fingerprint is None:
+            continue
+        value = json.dumps(details, sort_keys=True)
+        statement = update(KnownIssue).where(
+            KnownIssue.url_id == url_id, KnownIssue.fingerprint == fingerprint
+        )
+        if overwrite:
+            statement = statement.where(or_(KnownIssue.details.is_(None), KnownIssue.details != value))
+        else:
+            statement = statement.where(KnownIssue.details.is_(None))
+        updated += db.execute(statement.values(details=value)).rowcount
+    return updated
+
+
+def backfill_known_issues(db: Session, batch_size: int = 1000) -> int:
+    """
+    Link scrapes stored before known issues existed, oldest first. Commits per batch.
+
+    Returns:
+        int: The number of scrapes examined.
+    """
+    last_id, examined = 0, 0
+    while True:
+        scrapes = (
+            db.execute(
+                select(ScrapeModel)
+                .filter(ScrapeModel.known_issue_id.is_(None), ScrapeModel.id > last_id)
+                .order_by(ScrapeModel.id)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not scrapes:
+            break
+        link_known_issues(db, scrapes)
+        record_changes(db, scrapes)
+        db.commit()
+        last_id = scrapes[-1].id
+        examined += len(scrapes)
+    if examined:
+        logger.info(f"Linked {examined} existing scrapes to known issues")
+    return examined
+
+
+def diff_rows(previous: dict, current: dict) -> list[tuple[str, str, str]]:
+    """
+    Compare two versions of a known-issue row.
+
+    Returns:
+        list[tuple[str, str, str]]: (change_type, old value, new value) for each field in DIFF_FIELDS that differs.
+    """
+    return [
+        (change_type, previous.get(field), current.get(field))
+        for change_type, field in DIFF_FIELDS.items()
+        if previous.get(field) != current.get(field)
+    ]
+
+
+def _scraped_before(scrape: ScrapeModel):
+    # Versions are ordered by when they were scraped; backfilled history gets higher IDs than the
+    # live versions it predates, so the ID only breaks ties.
+    if scrape.timestamp is None:
+        return ScrapeModel.id < scrape.id
+    return or_(
+        ScrapeModel.timestamp < scrape.timestamp,
+        and_(ScrapeModel.timestamp == scrape.timestamp, ScrapeModel.id < scrape.id),
+    )
+
+
+def _scraped_after(scrape: ScrapeModel):
+    if scrape.timestamp is None:
+        return ScrapeModel.id > scrape.id
+    return or_(
+        ScrapeModel.timestamp > scrape.timestamp,
+        and_(ScrapeModel.timestamp == scrape.timestamp, ScrapeModel.id > scrape.id),
+    )
+
+
+def record_changes(db: Session, scrapes: list[ScrapeModel]) -> list[Change]:
+    """
+    Write a Change row for every field that differs between each linked scrape and the previous
+    version of its known issue. Does not commit.
+
+    The previous version is the issue's latest scrape taken before this one, found through the
+    scrapes.known_issue_id index. The first version of an issue has nothing to diff against.
+    A version older than one already stored, re-extracted from archived pages, only fills in the
+    history: no change is recorded for it, so nothing stale is published as new.
+
+    Parameters:
+        db (Session): The database session.
+        scrapes (list[ScrapeModel]): New scrapes already linked by `link_known_issues`, oldest first.
+
+    Returns:
+        list[Change]: The changes written.
+    """
+    now = datetime.now(timezone.utc)
+    batch_ids = [scrape.id for scrape in scrapes]
+    changes = []
+    for scrape in scrapes:
+        if scrape.known_issue_id is None:
+            continue
+        of_issue = ScrapeModel.known_issue_id == scrape.known_issue_id
+        newer = db.execute(
+            select(ScrapeModel.id)
+            .filter(of_issue, _scraped_after(scrape), ScrapeModel.id.not_in(batch_ids))
+            .limit(1)
+        ).first()
+        if newer is not None:
+            logger.info(
+                f"Scrape {scrape.id} predates the latest version of known issue "
+                f"{scrape.known_issue_id}; not recording changes"
+            )
+            continue
+        previous = (
+            db.execute(
+                select(ScrapeModel)
+                .filter(of_issue, _scraped_before(scrape))
+                .order_by(
+                    *(() if scrape.timestamp is None else (ScrapeModel.timestamp.desc(),)),
+                    ScrapeModel.id.desc(),
+                )
+                .limit(1)
+            )
+            .scalars()
+            .first()
+        )
+        if previous is None:
+            continue
+        for change_type, old_value, new_value in diff_rows(
+            issue_row(previous), issue_row(scrape)
+        ):
+            changes.append(
+                Change(
+                    scrape_id=scrape.id,
+                    known_issue_id=scrape.known_issue_id,
+                    previous_scrape_id=previous.id,
+                    change_type=change_type,
+                    old_value=old_value,
+                    new_value=new_value,
+                    details=f"{DIFF_FIELDS[change_type]}: {old_value!r} -> {new_value!r}",
+                    created_at=now,
+                )
+            )
+    db.add_all(changes)
+    return changes
+
+
+def issue_timeline(db: Session, known_issue_id: int) -> list[ScrapeModel]:
+    """
+    Every scraped version of a known issue, oldest first, via the scrapes.known_issue_id index.
+    """
+    return (
+        db.execute(
+            select(ScrapeModel)
+            .filter(ScrapeModel.known_issue_id == known_issue_id)
+            .order_by(ScrapeModel.timestamp, ScrapeModel.id)
+        )
+        .scalars()
+        .all()
+    )
@@ -0,0 +1,121 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Hashable, Iterable, Iterator, MutableMapping
+
+import requests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_sse(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Parse a server-sent events stream into (event name, data) pairs. Comments and `retry:` lines
+    are skipped; an event without a name is a "message".
+    """
+    name, data = "message", []
+    for line in lines:
+        if line == "":
+            if data:
+                yield name, "\n".join(data)
+            name, data = "message", []
+        elif line.startswith(":"):
+            continue
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                name = value
+            elif field == "data":
+                data.append(value)
+
+
+class DashboardEvents:
+    """
+    Follow the API's /events stream in a background thread and keep a version number per URL.
+
+    A `scrape.new`, `scrape.triage` or `scrape.archived` event bumps the version of its URL. Every
+    (re)connection and every `resync` event bumps the epoch instead, since events may have been
+    missed, which makes every panel stale. A panel is fresh as long as `version(url_id)` is unchanged.
+    """
+
+    def __init__(self, api_url: str, read_timeout: float = 60, session: requests.Session = None):
+        self.api_url = api_url
+        self.read_timeout = read_timeout
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+        self._versions = defaultdict(int)
+        self._epoch = 0
+        self._thread = None
+
+    def version(self, url_id: int = None) -> tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._versions[url_id] if url_id is not None else 0
+
+    def apply(self, name: str, data: str):
+        with self._lock:
+            if name == "resync":
+                self._epoch += 1
+                return
+            try:
+                url_id = json.loads(data)["url_id"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                return
+            self._versions[url_id] += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="dashboard-events", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        delay = 1
+        while True:
+            try:
+                with self.session.get(
+                    f"{self.api_url}/events", stream=True, timeout=(5, self.read_timeout)
+                ) as response:
+                    response.raise_for_status()
+                    self.apply("resync", "")
+                    delay = 1
+                    for name, data in parse_sse(response.iter_lines(decode_unicode=True)):
+                        self.apply(name, data)
+            except requests.RequestException as e:
+                logger.warning(f"Dashboard event stream interrupted ({e}); reconnecting in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+class PanelCache:
+    """
+    Per-session cache of panel data, refetched only when the panel's event version moves.
+
+    Parameters:
+        state: Where to keep the cache, e.g. `st.session_state`, so it survives reruns.
+    """
+
+    def __init__(self, state: MutableMapping, key: str = "panel_cache"):
+        if key not in state:
+            state[key] = {}
+        self._entries: dict = state[key]
+
+    def is_fresh(self, name: Hashable, version: Any) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry[0] == version
+
+    def put(self, name: Hashable, version: Any, data: Any):
+        self._entries[name] = (version, data)
+
+    def get(self, name: Hashable, version: Any, fetch: Callable[[], Any]) -> Any:
+        if not self.is_fresh(name, version):
+            self.put(name, version, fetch())
+        return self._entries[name][1]
+
+    def invalidate(self, name: Hashable = None):
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
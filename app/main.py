@@ -6,8 +6,9 @@ if sys.platform == "win32":
 import logging
 import traceback
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Query
-from sqlalchemy import and_, desc
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, desc, func, update
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
@@ -16,8 +17,27 @@ from urllib.parse import urlparse
 from collections import defaultdict
 
 from app import schemas
-from app.database import get_db, engine, SessionLocal, Base
-from app.scraper import scrape_url, get_latest_scrape, periodic_scrape
+from app.database import (
+    get_db,
+    engine,
+    SessionLocal,
+    Base,
+    RequestRouting,
+    read_router,
+    request_routing,
+    use_primary,
+)
+from app.scraper import (
+    scrape_url,
+    get_latest_scrape,
+    periodic_scrape,
+    ScrapeRunReport,
+    ScrapeTimeoutError,
+    RUN_DEADLINE,
+    is_transient_scrape_error,
+    retry_after_of,
+    ISSUE_DETAILS_KEY,
+)
 from app.schemas import (
     URLBase as URLSchema,
     Scrape as ScrapeSchema,
@@ -26,22 +46,73 @@ from app.schemas import (
 from app.models import (
     URL as URLModel,
     Scrape as ScrapeModel,
+    Subscription as SubscriptionModel,
+    Webhook as WebhookModel,
+    KnownIssue as KnownIssueModel,
+    Change as ChangeModel,
 )
 from app.url_repository import URLRepository
+from app.discovery import ReleaseHealthDiscovery, discover_status_pages
+from app.clustering import IssueClusterer
+from app import issues
+from app.migrations import add_missing_columns, run_data_migrations
+from app.partitioning import archive_old_scrapes, ensure_partitions, partition_scrapes_table
+from app.html_archive import HTML_HASH_KEY, HTMLArchive, record_snapshot
+from app.fingerprint import content_fingerprint, fingerprint
+from app import checkpoint
+from app.events import (
+    CLUSTER_CHANNEL,
+    DASHBOARD_CHANNEL,
+    FEED_CHANNEL,
+    PostgresListener,
+    SUBSCRIPTION_CHANNEL,
+    URL_CHANNEL,
+    add_listener,
+    bus,
+    notify,
+    notify_dashboard,
+)
+from app.feed import InvalidCursor, read_feed
+from app.response_cache import FLAGGED_TAG, URLS_TAG, ResponseCache, url_tag
+from app.serialization import columns_for, dump_many, list_response, sparse_schema
+from app.routing import SubscriptionRouter
+from app.notifications import (
+    OutboxDispatcher,
+    enqueue_new_scrapes,
+    format_scrape_content,
+    process_url_for_title,
+    send_email,
+    transport_from_env,
+)
+from app.webhooks import (
+    WEBHOOK_CHANNEL,
+    UnsafeWebhookURL,
+    WebhookTransport,
+    check_receiver_host,
+    enqueue_webhooks,
+)
+from app.admission import AdmissionController, AdmissionRejected, SingleFlight
+from app.resilience import (
+    CircuitOpenError,
+    HostCircuitBreakers,
+    HostRateLimiter,
+    RetryPolicy,
+    host_of,
+)
 
-import hashlib
+import secrets
 
 # import threading
 import json
-from datetime import datetime, timedelta
+import math
+from datetime import datetime, timedelta, timezone
 import os
 import re
 from dotenv import load_dotenv
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Content
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from pytz import timezone
+from apscheduler.triggers.interval import IntervalTrigger
+import pytz
 
 load_dotenv()
 # Set up basic logging
@@ -49,120 +120,127 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 url_repo = URLRepository()
+issue_clusterer = IssueClusterer(session_factory=SessionLocal)
+add_listener(CLUSTER_CHANNEL, issue_clusterer.apply_notification)
+# Finds status pages for new Windows releases and registers them for scraping
+release_health_discovery = ReleaseHealthDiscovery()
+# Every fetched page, so history can be re-extracted with `python -m app.backfill`
+html_archive = HTMLArchive()
+
+# Each scrape launches its own Chromium, so bound how many run at once and how many may wait.
+scrape_admission = AdmissionController(
+    max_concurrency=int(os.getenv("SCRAPE_MAX_CONCURRENCY", "2")),
+    max_queue=int(os.getenv("SCRAPE_MAX_QUEUE", "8")),
+    queue_timeout=float(os.getenv("SCRAPE_QUEUE_TIMEOUT", "60")),
+)
+scrape_flight = SingleFlight()
+# Retry transient failures, space out requests per host and stop calling a host that keeps failing.
+scrape_retry_policy = RetryPolicy(
+    max_attempts=int(os.getenv("SCRAPE_RETRY_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("SCRAPE_RETRY_BASE_DELAY", "2")),
+    max_delay=float(os.getenv("SCRAPE_RETRY_MAX_DELAY", "60")),
+)
+host_rate_limiter = HostRateLimiter(
+    min_interval=float(os.getenv("SCRAPE_HOST_MIN_INTERVAL", "1"))
+)
+host_breakers = HostCircuitBreakers(
+    failure_threshold=int(os.getenv("SCRAPE_BREAKER_THRESHOLD", "3")),
+    reset_timeout=float(os.getenv("SCRAPE_BREAKER_RESET", "300")),
+)
+latest_run_report: ScrapeRunReport | None = None
+# New-issue notifications are written to the outbox with the scrapes and sent from here.
+outbox_dispatcher = OutboxDispatcher(
+    SessionLocal,
+    {"email": transport_from_env()},
+    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "200")),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")),
+)
+# Webhooks get their own dispatcher so a slow receiver never holds up email.
+webhook_dispatcher = OutboxDispatcher(
+    SessionLocal,
+    {WEBHOOK_CHANNEL: WebhookTransport(SessionLocal)},
+    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "200")),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")),
+)
 
+subscription_router = SubscriptionRouter(SessionLocal)
+add_listener(SUBSCRIPTION_CHANNEL, subscription_router.on_subscription_event)
+# Relays NOTIFYs from other replicas to this one's long-polling clients.
+pg_listener = PostgresListener(engine, [FEED_CHANNEL, DASHBOARD_CHANNEL])
+add_listener(URL_CHANNEL, url_repo.cache.apply_notification)
+# Serialized read responses with ETags, dropped when the data behind them is written
+response_cache = ResponseCache()
+add_listener(DASHBOARD_CHANNEL, response_cache.on_dashboard_event)
+add_listener(URL_CHANNEL, response_cache.on_url_event)
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+_dispatch_tasks = set()
 
-async def send_email(subject: str, body: dict, recipients: list[str]):
-    """
-    Sends an email using SendGrid API with the specified subject, body, and recipients.
-
-    Parameters:
-        subject (str): The subject of the email.
-        body (dict): A dictionary containing URLs as keys and a list of scrapes as values.
-        recipients (list[str]): A list of email addresses to send the email to.
-
-    Returns:
-        Response: The response object from SendGrid API after sending the email.
-
-    Raises:
-        Exception: If an error occurs during the email sending process.
 
-    Note:
-        The body dictionary should have URLs as keys and a list of scrape objects as values.
-        Each scrape object should have attributes 'scrape_type', 'scrape_comment', and 'content'.
+def kick_outbox_dispatcher():
     """
-    message = Mail(
-        from_email=os.getenv("SENDGRID_FROM_EMAIL"),
-        to_emails=recipients,
-        subject=subject,
-    )
-    email_content = ["New scrapes found:<br><br>"]
-    for url, scrapes in body.items():
-
-        link_text = process_url_for_title(url)
-        email_content.append(f'Product: <a href="{url}">{link_text}</a>')
-
-        for scrape in scrapes:
-            email_content.append("Known Issues:")
-            email_content.append(format_scrape_content(scrape))
-            email_content.append(f"Scrape Type: {scrape.scrape_type}")
-            email_content.append(f"Scrape Comment: {scrape.scrape_comment}")
-            email_content.append("---")
-
-    email_body = "<br>".join(email_content)
-    message.add_content(Content("text/html", email_body))
-    try:
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-        response = sg.send(message)
-        logger.info(f"Email sent. Status Code: {response.status_code}")
-        return response
-    except Exception as e:
-        logger.info(f"Error sending email: {e}")
-        return response
-
-
-def format_scrape_content(scrape: ScrapeModel) -> str:
+    Drain the outbox in the background now instead of waiting for the next scheduled poll.
     """
-    Format the scrape content from a ScrapeModel object into a human-readable string.
+    for dispatcher in (outbox_dispatcher, webhook_dispatcher):
+        task = asyncio.create_task(dispatcher.drain())
+        _dispatch_tasks.add(task)
+        task.add_done_callback(_dispatch_tasks.discard)
 
-    Parameters:
-        scrape (ScrapeModel): The ScrapeModel object containing the content to be formatted.
 
-    Returns:
-        str: A formatted string representing the content of the scrape, including last updated time, summary, status, and originating update.
-
-    If the content of the scrape cannot be parsed as JSON, an error message is returned.
+async def run_scrape(url_data: URLSchema, enable_deep_scrape: bool = False) -> dict:
     """
-    try:
-        content_dict = json.loads(scrape.content)
-        known_issues = content_dict.get("known_issues", {}).get("row", {})
-
-        formatted_content = (
-            f"Last updated: {known_issues.get('Last updated', 'N/A')}\n"
-            f"Summary:\n{known_issues.get('Summary', 'N/A')}\n"
-            f"Status: {known_issues.get('Status', 'N/A')}\n"
-            f"Originating update: {known_issues.get('Originating update', 'N/A')}\n"
-        )
-        return formatted_content
-    except json.JSONDecodeError:
-        return "Error: Unable to parse scrape content"
-
+    Scrape a URL under the global admission limit, sharing the result with concurrent callers.
 
-def process_url_for_title(url):
-    """
-    Process the URL to extract a title.
+    Concurrent requests for the same URL and deep-scrape setting join the scrape already in flight
+    instead of launching another browser. Transient failures are retried with backoff, each attempt
+    waits its turn under the per-host rate limit, and a host whose circuit breaker is open fails fast.
 
     Parameters:
-        url (str): The URL from which to extract the title.
+        url_data (URLSchema): The URL to scrape.
+        enable_deep_scrape (bool): Whether to extract every known-issue row.
 
     Returns:
-        str: The processed title extracted from the URL.
-    """
-    # Parse the URL
-    parsed_url = urlparse(url)
-
-    # Get the path
-    path = parsed_url.path
-
-    # Remove 'status' from the path
-    path = path.replace("status-", "").replace("/status/", "")
+        dict: The scraped data, as returned by `scrape_url`.
 
-    # Split the path and get the last part
-    parts = path.split("/")
-    last_part = (
-        parts[-1] if parts[-1] else parts[-2]
-    )  # Use second to last if last is empty
-
-    # Remove file extension if present
-    last_part = re.sub(r"\.[^.]+$", "", last_part)
+    Raises:
+        AdmissionRejected: 429 if the wait queue is full, 503 if no scrape slot freed up in time.
+        CircuitOpenError: If the URL's host is failing and its breaker is open.
+    """
+    host = host_of(url_data.url)
+    breaker = host_breakers.for_host(host)
 
-    # Replace hyphens with spaces and capitalize each word
-    title = " ".join(word.capitalize() for word in last_part.split("-"))
+    async def attempt():
+        breaker.before_call()
+        recorded = False
+        try:
+            await host_rate_limiter.acquire(host)
+            async with scrape_admission.slot():
+                try:
+                    result = await scrape_url(
+                        url_data, enable_deep_scrape=enable_deep_scrape, archive=html_archive
+                    )
+                except Exception as e:
+                    if is_transient_scrape_error(e):
+                        breaker.record_failure()
+                        recorded = True
+                    raise
+            breaker.record_success()
+            recorded = True
+            return result
+        finally:
+            if not recorded:
+                # Rejected, cancelled or a non-host error: say nothing about the host's health.
+                breaker.release_trial()
+
+    async def resilient():
+        return await scrape_retry_policy.run(
+            attempt, is_transient_scrape_error, retry_after_of
+        )
 
-    return title
+    return await scrape_flight.do((url_data.url, enable_deep_scrape), resilient)
 
 
 def process_scraped_data(
-    db: Session, db_url: URLModel, scraped_data: dict
+    db: Session, db_url: URLModel, scraped_data: dict, timestamp: datetime = None
 ) -> list[ScrapeModel]:
     """
     Process the scraped data and create new ScrapeModel instances for each row of known issues.
@@ -171,6 +249,7 @@ def process_scraped_data(
         db (Session): The database session to perform database operations.
         db_url (URLModel): The URLModel object representing the URL being scraped.
         scraped_data (dict): The scraped data containing information about known issues.
+        timestamp (datetime, optional): When the page was fetched. Defaults to now.
 
     Returns:
         list[ScrapeModel]: A list of newly created ScrapeModel instances for the scraped data rows.
@@ -178,50 +257,100 @@ def process_scraped_data(
     new_scrapes = []
     if "known_issues" in scraped_data and "row" in scraped_data["known_issues"]:
         for known_issue_row in scraped_data["known_issues"]["row"]:
+            # Details are kept on the known issue (see issues.record_issue_details), not in the
+            # scrape, so they neither change its fingerprint nor create versions
+            known_issue_row = {
+                key: value for key, value in known_issue_row.items() if key != ISSUE_DETAILS_KEY
+            }
             row_data = {
                 "known_issues": {
                     "header": scraped_data["known_issues"]["header"],
                     "row": known_issue_row,
                 },
             }
-        logger.info(f"Row data to be stored: {json.dumps(row_data, indent=2)}")
-
-        content_hash = hashlib.md5(json.dumps(row_data).encode()).hexdigest()
-        existing_scrape = (
-            db.query(ScrapeModel)
-            .filter(
-                and_(
-                    ScrapeModel.url_id == db_url.id,
-                    ScrapeModel.hash == content_hash,
+            logger.info(f"Row data to be stored: {json.dumps(row_data, indent=2)}")
+
+            content_hash = fingerprint(row_data)
+            existing_scrape = (
+                db.query(ScrapeModel)
+                .filter(
+                    and_(
+                        ScrapeModel.url_id == db_url.id,
+                        ScrapeModel.hash == content_hash,
+                    )
                 )
+                .order_by(desc(ScrapeModel.timestamp))
+                .first()
             )
-            .order_by(desc(ScrapeModel.timestamp))
-            .first()
-        )
 
-        if existing_scrape:
-            logger.info(
-                f"Duplicate scrape found for row. Skipping creation for hash {content_hash}"
-            )
-            # new_scrapes.append(existing_scrape)
-        else:
-            # logger.info(f"Creating new scrape for row with hash {content_hash}")
-            new_scrape = ScrapeModel(
-                url_id=db_url.id,
-                content=json.dumps(row_data),
-                timestamp=datetime.now(timezone.utc),
-                scrape_type=None,
-                scrape_comment=None,
-                create_alert=False,
-                hash=content_hash,
-            )
-            db.add(new_scrape)
-            db.flush()
-            new_scrapes.append(new_scrape)
+            if existing_scrape:
+                logger.info(
+                    f"Duplicate scrape found for row. Skipping creation for hash {content_hash}"
+                )
+                # new_scrapes.append(existing_scrape)
+            else:
+                # logger.info(f"Creating new scrape for row with hash {content_hash}")
+                new_scrape = ScrapeModel(
+                    url_id=db_url.id,
+                    content=json.dumps(row_data),
+                    timestamp=timestamp or datetime.now(timezone.utc),
+                    scrape_type=None,
+                    scrape_comment=None,
+                    create_alert=False,
+                    hash=content_hash,
+                )
+                db.add(new_scrape)
+                db.flush()
+                new_scrapes.append(new_scrape)
 
     return new_scrapes
 
 
+def ingest_scraped_data(
+    db: Session, db_url: URLModel, scraped_data: dict, fetched_at: datetime = None
+) -> list[ScrapeModel]:
+    """
+    Store the new scrapes in a page's scraped data, assign them to issue clusters, link them to their
+    known issue, record what changed since the issue's previous version, store each issue's details
+    section and bump the URL's last_scraped timestamp. The archived page the data was parsed from,
+    if any, is recorded as a snapshot of the URL.
+
+    Does not commit, so callers can commit the scrapes together with their own bookkeeping.
+
+    Parameters:
+        db (Session): The database session.
+        db_url (URLModel): The URL the data was scraped from.
+        scraped_data (dict): The output of `scrape_url`.
+        fetched_at (datetime, optional): When the page was fetched, for data parsed again from the
+            archive; last_scraped is then left alone. Defaults to now.
+
+    Returns:
+        list[ScrapeModel]: The newly created scrapes, flushed so they have IDs.
+    """
+    if scraped_data.get(HTML_HASH_KEY):
+        record_snapshot(
+            db, db_url.id, scraped_data[HTML_HASH_KEY], fetched_at or datetime.now(timezone.utc)
+        )
+    new_scrapes = process_scraped_data(db, db_url, scraped_data, fetched_at)
+    issue_clusterer.cluster_scrapes(new_scrapes, db)
+    issues.link_known_issues(db, new_scrapes)
+    issues.record_changes(db, new_scrapes)
+    issues.record_issue_details(
+        db,
+        db_url.id,
+        scraped_data.get("known_issues", {}).get("row", []),
+        overwrite=fetched_at is None,
+    )
+    if new_scrapes:
+        if fetched_at is None:
+            db_url.last_scraped = new_scrapes[-1].timestamp
+        notify(db, FEED_CHANNEL)
+        notify_dashboard(
+            db, "scrape.new", db_url.id, [scrape.id for scrape in new_scrapes]
+        )
+    return new_scrapes
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -248,11 +377,19 @@ async def lifespan(app: FastAPI):
         # Startup
         # logger.info("Creating all database tables if they do not exist.")
         Base.metadata.create_all(bind=engine)
+        add_missing_columns(engine)
+        partition_scrapes_table(engine)
+        if engine.dialect.name == "postgresql":
+            pg_listener.start()
 
         def sync_load_cache():
             with SessionLocal() as session:
                 # logger.info("Loading URL repository cache.")
+                run_data_migrations(session)
                 url_repo.load_cache(session)
+                issue_clusterer.load(session)
+                issues.backfill_known_issues(session)
+                subscription_router.rebuild(session)
 
         # Run the synchronous function in a thread pool
         await asyncio.to_thread(sync_load_cache)
@@ -272,10 +409,28 @@ async def lifespan(app: FastAPI):
             CronTrigger(
                 hour=6,
                 minute=0,
-                timezone=timezone(os.getenv("TIMEZONE", "America/Edmonton")),
+                timezone=pytz.timezone(os.getenv("TIMEZONE", "America/Edmonton")),
             ),
             args=[enable_deep_scrape],
         )
+        scheduler.add_job(
+            discover_status_pages_task,
+            IntervalTrigger(hours=float(os.getenv("DISCOVERY_INTERVAL_HOURS", "24"))),
+            max_instances=1,
+        )
+        scheduler.add_job(
+            maintain_scrape_partitions_task,
+            IntervalTrigger(hours=24),
+            next_run_time=datetime.now(),
+            max_instances=1,
+        )
+        # Drain the notification outbox, retrying failed sends
+        for dispatcher in (outbox_dispatcher, webhook_dispatcher):
+            scheduler.add_job(
+                dispatcher.drain,
+                IntervalTrigger(seconds=int(os.getenv("OUTBOX_POLL_SECONDS", "30"))),
+                max_instances=1,
+            )
         # Start the scheduler
         scheduler.start()
 
@@ -288,12 +443,74 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Cleanup
+        pg_listener.stop()
+        for transport in webhook_dispatcher.transports.values():
+            await transport.aclose()
         logger.info("Application shutdown.")
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+# Holds the end of a client's read-your-writes window, as a Unix timestamp
+READ_YOUR_WRITES_COOKIE = "rw_until"
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """
+    GET and HEAD requests read from the replica, and all other requests use the primary. A response
+    to a request that committed a write sets a cookie holding the end of the client's read-your-writes
+    window; until then its reads go to the primary too, so it never sees a replica that has not
+    caught up with its own write yet. The window is carried by the client, so it holds whichever
+    API process serves the next request.
+    """
+    try:
+        written_until = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+    except ValueError:
+        written_until = 0
+    routing = RequestRouting(
+        replica_reads=request.method in ("GET", "HEAD") and written_until <= read_router.clock()
+    )
+    token = request_routing.set(routing)
+    try:
+        response = await call_next(request)
+    finally:
+        request_routing.reset(token)
+    if routing.committed_write and read_router.window > 0:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            f"{read_router.clock() + read_router.window:.3f}",
+            max_age=math.ceil(read_router.window),
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_in) + 1)},
+    )
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+
+@app.exception_handler(ScrapeTimeoutError)
+async def scrape_timeout_handler(request: Request, exc: ScrapeTimeoutError):
+    logger.warning(f"Scrape timed out during {exc.phase} for {exc.url}")
+    return JSONResponse(
+        status_code=504,
+        content={"detail": str(exc), "url": exc.url, "phase": exc.phase},
+    )
+
+
 @app.post("/urls/", response_model=schemas.URL)
 def create_url(url: schemas.URLCreate, db: Session = Depends(get_db)):
     """
@@ -314,12 +531,36 @@ def create_url(url: schemas.URLCreate, db: Session = Depends(get_db)):
     return db_url
 
 
+@app.post("/urls/bulk", response_model=schemas.URLImportResult)
+def import_urls(urls: schemas.URLImport, db: Session = Depends(get_db)):
+    """
+    Import many URLs in one request.
+
+    URLs are normalized and deduplicated against the URL repository cache, then inserted in a
+    single conflict-ignoring batch.
+
+    Args:
+        urls (schemas.URLImport): The URLs to import.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        schemas.URLImportResult: How many URLs were created and skipped, and which were invalid.
+    """
+    result = url_repo.bulk_create(db, urls.urls)
+    logger.info(
+        f"Imported URLs: {result['created']} created, {result['skipped']} skipped "
+        f"({len(result['invalid'])} invalid)"
+    )
+    return result
+
+
 @app.get("/urls/", response_model=list[schemas.URL])
-def read_urls(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_urls(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Retrieve a list of URLs.
 
     This endpoint allows you to retrieve a list of URL entries from the database with pagination support.
+    Responses are cached until a URL is created and carry an ETag for conditional requests.
 
     Args:
         skip (int, optional): The number of records to skip for pagination. Defaults to 0.
@@ -330,10 +571,15 @@ def read_urls(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
         List[schemas.URL]: A list of URL entries, defined by the URL schema.
     """
     # logger.info(f"Reading URLs with skip={skip} and limit={limit}")
-    result = db.execute(select(URLModel).offset(skip).limit(limit))
-    urls = result.scalars().all()
-    logger.info(f"Retrieved {len(urls)} URLs")
-    return urls
+    def build():
+        # Cached until the next write, so built from the primary rather than a lagging replica
+        use_primary(db)
+        result = db.execute(select(*columns_for(URLModel, schemas.URL)).offset(skip).limit(limit))
+        urls = result.mappings().all()
+        logger.info(f"Retrieved {len(urls)} URLs")
+        return dump_many(schemas.URL, urls)
+
+    return response_cache.respond(request, [URLS_TAG], build)
 
 
 @app.get("/url/{url_id}", response_model=schemas.URL)
@@ -354,15 +600,14 @@ def read_url_by_id(url_id: int, db: Session = Depends(get_db)):
         HTTPException: 404 error if the URL with the given ID is not found.
     """
     # logger.info(f"Fetching URL with id={url_id}")
-    result = db.execute(select(URLModel).filter(URLModel.id == url_id))
-    url = result.scalar_one_or_none()
+    url = url_repo.get_url(db, url_id)
 
     if url is None:
         logger.warning(f"URL with id={url_id} not found")
         raise HTTPException(status_code=404, detail="URL not found")
 
-    # logger.info(f"Retrieved URL: {url.url}")
-    return url
+    # logger.info(f"Retrieved URL: {url}")
+    return {"id": url_id, "url": url}
 
 
 @app.post("/scrapes/", response_model=ScrapeSchema)
@@ -370,7 +615,7 @@ def create_scrape(scrape: ScrapeCreate, db: Session = Depends(get_db)):
     """
     Create a new scrape entry.
 
-    This endpoint allows you to create a new scrape entry in the database. It checks if the content has changed by comparing the hash of the content.
+    This endpoint allows you to create a new scrape entry in the database. It checks if the content has changed by comparing the canonical fingerprint of the content.
 
     Args:
         scrape (schemas.ScrapeCreate): The scrape data to be created, defined by the ScrapeCreate schema.
@@ -380,11 +625,10 @@ def create_scrape(scrape: ScrapeCreate, db: Session = Depends(get_db)):
         schemas.Scrape: The created scrape entry, defined by the Scrape schema.
         dict: A message indicating no changes detected if the content hash already exists for the given URL.
     """
-    db_url = db.query(URLModel).filter(URLModel.id == scrape.url_id).first()
-    if not db_url:
+    if url_repo.get_url(db, scrape.url_id) is None:
         raise HTTPException(status_code=404, detail="URL not found")
     logger.info(f"Creating scrape for URL ID: {scrape.url_id}")
-    content_hash = hashlib.md5(scrape.content.encode()).hexdigest()
+    content_hash = content_fingerprint(scrape.content)
 
     # Check if this hash already exists for the given URL
     existing_scrape = db.execute(
@@ -407,6 +651,12 @@ def create_scrape(scrape: ScrapeCreate, db: Session = Depends(get_db)):
         hash=content_hash,
     )
     db.add(new_scrape)
+    db.flush()
+    issue_clusterer.cluster_scrapes([new_scrape], db)
+    issues.link_known_issues(db, [new_scrape])
+    issues.record_changes(db, [new_scrape])
+    notify(db, FEED_CHANNEL)
+    notify_dashboard(db, "scrape.new", new_scrape.url_id, [new_scrape.id])
     db.commit()
     db.refresh(new_scrape)
     return ScrapeSchema.model_validate(new_scrape)
@@ -414,32 +664,36 @@ def create_scrape(scrape: ScrapeCreate, db: Session = Depends(get_db)):
 
 @app.post("/scrape_and_create", response_model=list[ScrapeSchema])
 async def scrape_and_create(
+    request: Request,
     url_data: URLSchema,
     db: Session = Depends(get_db),
     enable_deep_scrape: bool = False,
 ):
     try:
         # Step 1: Scrape the data
-        scraped_data = await scrape_url(url_data, enable_deep_scrape=enable_deep_scrape)
+        scraped_data = await run_scrape(url_data, enable_deep_scrape=enable_deep_scrape)
         # logger.info(f"Scraped data structure: {json.dumps(scraped_data, indent=2)}")
 
         # Step 2: Check if the URL exists in the database
-        db_url = db.query(URLModel).filter(URLModel.url == url_data.url).first()
-        if not db_url:
+        url_id = url_repo.get_id(db, url_data.url)
+        if url_id is None:
             raise HTTPException(
                 status_code=404, detail=f"URL with URL {url_data.url} not found"
             )
+        db_url = db.get(URLModel, url_id)
 
-        # Step 3: Process scraped data and create new scrapes
-        new_scrapes = process_scraped_data(db, db_url, scraped_data)
+        # Step 3: Process scraped data, create new scrapes and update last_scraped
+        new_scrapes = ingest_scraped_data(db, db_url, scraped_data)
 
-        # Step 4: Update last_scraped timestamp and commit changes
-        if new_scrapes:
-            db_url.last_scraped = new_scrapes[-1].timestamp
-            db.commit()
+        # Step 4: Serialize the new scrapes in one pass while they are loaded; after the commit
+        # each row would be reloaded on access
+        response = list_response(request, ScrapeSchema, new_scrapes)
+
+        # Step 5: Commit changes, including the page snapshot when nothing changed
+        db.commit()
 
-        # Step 5: Return the new scrapes
-        return [ScrapeSchema.model_validate(scrape) for scrape in new_scrapes]
+        # Step 6: Return the new scrapes
+        return response
 
     except SQLAlchemyError as e:
         db.rollback()
@@ -450,8 +704,28 @@ async def scrape_and_create(
         db.close()
 
 
+def scrape_fields(
+    fields: str = Query(
+        None,
+        description="Comma-separated scrape fields to return, e.g. `timestamp,scrape_type,create_alert`. "
+        "`id` is always included; unrequested columns are not read from the database.",
+    )
+):
+    """
+    Dependency resolving the `fields` query parameter of scrape endpoints to the schema to select
+    and serialize.
+
+    Raises:
+        HTTPException: 400 if a requested field does not exist.
+    """
+    try:
+        return sparse_schema(ScrapeSchema, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/scrapes/{scrape_id}", response_model=ScrapeSchema)
-def read_scrape(scrape_id: int, db: Session = Depends(get_db)):
+def read_scrape(scrape_id: int, schema=Depends(scrape_fields), db: Session = Depends(get_db)):
     """
     Retrieve a specific scrape entry by ID.
 
@@ -459,6 +733,7 @@ def read_scrape(scrape_id: int, db: Session = Depends(get_db)):
 
     Args:
         scrape_id (int): The unique identifier of the scrape entry to retrieve.
+        schema: The fields to return, from the `fields` query parameter.
         db (Session): The database session, provided by dependency injection.
 
     Returns:
@@ -469,17 +744,24 @@ def read_scrape(scrape_id: int, db: Session = Depends(get_db)):
     """
     # logger.info(f"Reading scrape with ID: {scrape_id}")
     scrape = db.execute(
-        select(ScrapeModel).filter(ScrapeModel.id == scrape_id)
-    ).scalar_one_or_none()
+        select(*columns_for(ScrapeModel, schema)).filter(ScrapeModel.id == scrape_id)
+    ).mappings().one_or_none()
 
     if scrape is None:
         logger.error(f"Scrape not found for ID: {scrape_id}")
         raise HTTPException(status_code=404, detail="Scrape not found")
-    return scrape
+    return Response(content=schema.model_validate(scrape).model_dump_json(), media_type="application/json")
 
 
 @app.get("/scrapes/", response_model=list[ScrapeSchema])
-def read_all_scrapes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_all_scrapes(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    since: datetime = None,
+    schema=Depends(scrape_fields),
+    db: Session = Depends(get_db),
+):
     """
     Retrieve all scrape entries with pagination.
 
@@ -488,54 +770,132 @@ def read_all_scrapes(skip: int = 0, limit: int = 100, db: Session = Depends(get_
     Args:
         skip (int): The number of entries to skip (default: 0).
         limit (int): The maximum number of entries to return (default: 100).
+        since (datetime, optional): Only return scrapes taken at or after this time; on PostgreSQL
+            only the monthly partitions from then on are scanned.
+        schema: The fields to return, from the `fields` query parameter.
         db (Session): The database session, provided by dependency injection.
 
     Returns:
         List[schemas.Scrape]: A list of scrape entries, defined by the Scrape schema.
     """
-    result = db.execute(select(ScrapeModel).offset(skip).limit(limit))
-    return result.scalars().all()
+    query = select(*columns_for(ScrapeModel, schema))
+    if since is not None:
+        query = query.filter(ScrapeModel.timestamp >= since)
+    result = db.execute(query.offset(skip).limit(limit))
+    return list_response(request, schema, result.mappings().all())
 
 
 @app.get("/scrapes/urlid/{url_id}", response_model=list[ScrapeSchema])
 def read_scrapes_by_urlid(
-    url_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    request: Request,
+    url_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    since: datetime = None,
+    schema=Depends(scrape_fields),
+    db: Session = Depends(get_db),
 ):
     """
     Retrieve scrape entries for a specific URL ID with pagination and sorting.
 
     This endpoint allows you to retrieve scrape entries from the database for a given URL ID with optional pagination,
-    sorted by timestamp in descending order.
+    sorted by timestamp in descending order. Responses are cached until the URL's scrapes change
+    and carry an ETag for conditional requests.
 
     Args:
         url_id (int): The unique identifier of the URL to filter scrapes by.
         skip (int): The number of entries to skip (default: 0).
         limit (int): The maximum number of entries to return (default: 100).
+        since (datetime, optional): Only return scrapes taken at or after this time.
+        schema: The fields to return, from the `fields` query parameter. The content is still read
+            to sort by "Last updated", but only returned if requested.
         db (Session): The database session, provided by dependency injection.
 
     Returns:
         List[schemas.Scrape]: A list of scrape entries for the specified URL ID, defined by the Scrape schema.
     """
-    result = db.execute(select(ScrapeModel).filter(ScrapeModel.url_id == url_id))
-    scrapes = result.scalars().all()
-
     # Parse "Last updated" from content and sort
     def parse_last_updated(scrape):
         try:
-            content = json.loads(scrape.content)
+            content = json.loads(scrape["content"])
             last_updated_str = content["known_issues"]["row"]["Last updated"]
             # Remove timezone abbreviation
             last_updated_str = " ".join(last_updated_str.split()[:-1])
             last_updated = datetime.strptime(last_updated_str, "%Y-%m-%d %H:%M")
             return last_updated
         except Exception as e:
-            logger.exception(f"Error parsing date for scrape {scrape.id}: {str(e)}")
+            logger.exception(f"Error parsing date for scrape {scrape['id']}: {str(e)}")
             return datetime.min
 
-    sorted_scrapes = sorted(scrapes, key=parse_last_updated, reverse=True)
+    def build():
+        use_primary(db)
+        columns = columns_for(ScrapeModel, schema)
+        if "content" not in schema.model_fields:
+            columns.append(ScrapeModel.content)
+        query = select(*columns).filter(ScrapeModel.url_id == url_id)
+        if since is not None:
+            query = query.filter(ScrapeModel.timestamp >= since)
+        result = db.execute(query)
+        scrapes = result.mappings().all()
+        sorted_scrapes = sorted(scrapes, key=parse_last_updated, reverse=True)
+
+        # Return the top 'limit' scrapes
+        return dump_many(schema, sorted_scrapes[:limit])
+
+    return response_cache.respond(request, [url_tag(url_id)], build)
+
+
+@app.put("/scrapes/", response_model=schemas.BulkScrapeUpdateResult)
+def bulk_update_scrapes(bulk: schemas.BulkScrapeUpdate, db: Session = Depends(get_db)):
+    """
+    Apply the same partial update to many scrape entries at once.
+
+    The update is issued as a single UPDATE ... WHERE id IN (...) statement in one transaction,
+    so flagging dozens of issues costs one round trip instead of a SELECT, commit and refresh each.
+
+    Args:
+        bulk (schemas.BulkScrapeUpdate): The scrape IDs and the fields to set on all of them.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        schemas.BulkScrapeUpdateResult: The number of updated scrapes and a result per requested ID,
+        in request order; unknown IDs are reported as not found rather than failing the batch.
 
-    # Return the top 'limit' scrapes
-    return sorted_scrapes[:limit]
+    Raises:
+        HTTPException: 400 if the update sets no fields.
+    """
+    update_data = bulk.update.model_dump(exclude_unset=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    if "content" in update_data and "hash" not in update_data:
+        update_data["hash"] = content_fingerprint(update_data["content"])
+
+    ids = list(dict.fromkeys(bulk.ids))
+    rows = db.execute(
+        update(ScrapeModel)
+        .where(ScrapeModel.id.in_(ids))
+        .values(**update_data)
+        .returning(ScrapeModel.id, ScrapeModel.url_id)
+    ).all()
+
+    by_url = defaultdict(list)
+    for scrape_id, url_id in rows:
+        by_url[url_id].append(scrape_id)
+    for url_id, scrape_ids in by_url.items():
+        notify_dashboard(db, "scrape.triage", url_id, sorted(scrape_ids))
+    db.commit()
+
+    updated = {scrape_id for scrape_id, _ in rows}
+    logger.info(f"Bulk updated {len(updated)} of {len(ids)} scrapes: {update_data}")
+    return {
+        "updated": len(updated),
+        "results": [
+            {"id": scrape_id, "updated": True}
+            if scrape_id in updated
+            else {"id": scrape_id, "updated": False, "detail": "Scrape not found"}
+            for scrape_id in ids
+        ],
+    }
 
 
 @app.put("/scrapes/{scrape_id}", response_model=ScrapeSchema)
@@ -570,8 +930,11 @@ def update_scrape(
 
     update_data = scrape_update.model_dump(exclude_unset=True)
     logger.info(f"Update data: {update_data}")
+    if "content" in update_data and "hash" not in update_data:
+        update_data["hash"] = content_fingerprint(update_data["content"])
     for key, value in update_data.items():
         setattr(db_scrape, key, value)
+    notify_dashboard(db, "scrape.triage", db_scrape.url_id, [db_scrape.id])
 
     db.commit()
     db.refresh(db_scrape)
@@ -580,22 +943,267 @@ def update_scrape(
 
 
 @app.get("/flagged_scrapes/", response_model=list[ScrapeSchema])
-def get_flagged_scrapes(db: Session = Depends(get_db)):
+def get_flagged_scrapes(
+    request: Request, schema=Depends(scrape_fields), db: Session = Depends(get_db)
+):
     """
     Retrieve all flagged scrape entries.
 
     This endpoint allows you to retrieve all scrape entries from the database where the 'create_alert' flag is set to True.
+    Responses are cached until a scrape is created or triaged and carry an ETag for conditional requests.
 
     Args:
+        schema: The fields to return, from the `fields` query parameter.
         db (Session): The database session, provided by dependency injection.
 
     Returns:
         List[schemas.Scrape]: A list of flagged scrape entries, defined by the Scrape schema.
     """
-    result = db.execute(select(ScrapeModel).filter(ScrapeModel.create_alert.is_(True)))
+    def build():
+        use_primary(db)
+        result = db.execute(
+            select(*columns_for(ScrapeModel, schema)).filter(ScrapeModel.create_alert.is_(True))
+        )
+        return dump_many(schema, result.mappings().all())
+
+    return response_cache.respond(request, [FLAGGED_TAG], build)
+
+
+@app.get("/clusters/", response_model=list[schemas.IssueCluster])
+def read_issue_clusters(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+    """
+    Retrieve known issues with the products they affect, most recently seen first.
+
+    Scrapes of the same issue published on several status pages share a cluster ID; each cluster
+    is returned once, described by its most recent scrape, with the latest scrape per affected URL.
+
+    Args:
+        skip (int): Number of clusters to skip. Defaults to 0.
+        limit (int): Maximum number of clusters to return. Defaults to 50.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        List[schemas.IssueCluster]: The issue clusters.
+    """
+    last_seen = func.max(ScrapeModel.timestamp)
+    clusters = db.execute(
+        select(ScrapeModel.cluster_id, last_seen)
+        .filter(ScrapeModel.cluster_id.isnot(None))
+        .group_by(ScrapeModel.cluster_id)
+        .order_by(last_seen.desc())
+        .offset(skip)
+        .limit(limit)
+    ).all()
+    members = db.execute(
+        select(ScrapeModel, URLModel.url)
+        .join(URLModel, URLModel.id == ScrapeModel.url_id)
+        .filter(ScrapeModel.cluster_id.in_([row.cluster_id for row in clusters]))
+        .order_by(ScrapeModel.timestamp.desc())
+    ).all()
+
+    by_cluster = defaultdict(list)
+    for scrape, url in members:
+        by_cluster[scrape.cluster_id].append((scrape, url))
+
+    response = []
+    for cluster_id, seen in clusters:
+        latest, _ = by_cluster[cluster_id][0]
+        products = {}
+        for scrape, url in by_cluster[cluster_id]:
+            products.setdefault(
+                scrape.url_id,
+                schemas.ClusterProduct(url_id=scrape.url_id, url=url, scrape_id=scrape.id),
+            )
+        try:
+            row = json.loads(latest.content)["known_issues"]["row"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            row = {}
+        response.append(
+            schemas.IssueCluster(
+                cluster_id=cluster_id,
+                summary=row.get("Summary", ""),
+                status=row.get("Status"),
+                last_seen=seen,
+                products=list(products.values()),
+            )
+        )
+    return response
+
+
+@app.get("/known_issues/", response_model=list[schemas.KnownIssue])
+def read_known_issues(
+    url_id: int = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+):
+    """
+    Retrieve known issues, most recently seen first.
+
+    Args:
+        url_id (int, optional): Only return the known issues of this URL.
+        skip (int): Number of known issues to skip. Defaults to 0.
+        limit (int): Maximum number of known issues to return. Defaults to 100.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        List[schemas.KnownIssue]: The known issues.
+    """
+    query = select(KnownIssueModel)
+    if url_id is not None:
+        query = query.filter(KnownIssueModel.url_id == url_id)
+    result = db.execute(
+        query.order_by(KnownIssueModel.last_seen.desc()).offset(skip).limit(limit)
+    )
     return result.scalars().all()
 
 
+@app.get("/known_issues/{known_issue_id}/timeline", response_model=list[ScrapeSchema])
+def read_known_issue_timeline(
+    request: Request, known_issue_id: int, db: Session = Depends(get_db)
+):
+    """
+    Retrieve every scraped version of a known issue, oldest first.
+
+    Args:
+        known_issue_id (int): The ID of the known issue.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        List[schemas.Scrape]: The issue's scrapes.
+
+    Raises:
+        HTTPException: 404 error if the known issue is not found.
+    """
+    if db.get(KnownIssueModel, known_issue_id) is None:
+        raise HTTPException(status_code=404, detail="Known issue not found")
+    return list_response(request, ScrapeSchema, issues.issue_timeline(db, known_issue_id))
+
+
+@app.get("/changes", response_model=list[schemas.Change])
+def read_changes(
+    request: Request,
+    after_id: int = 0,
+    known_issue_id: int = None,
+    change_type: str = None,
+    limit: int = Query(100, le=1000),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve field-level changes to known issues, oldest first.
+
+    Each change records one field (`status` or `last_updated`) that differs between a
+    scrape and the previous version of the same known issue. Pass the last `id` received as
+    `after_id` to page through new changes.
+
+    Args:
+        after_id (int): Only return changes with a greater ID. Defaults to 0.
+        known_issue_id (int, optional): Only return changes to this known issue.
+        change_type (str, optional): Only return changes to this field.
+        limit (int): Maximum number of changes to return. Defaults to 100.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        List[schemas.Change]: The changes.
+    """
+    query = select(*columns_for(ChangeModel, schemas.Change)).filter(ChangeModel.id > after_id)
+    if known_issue_id is not None:
+        query = query.filter(ChangeModel.known_issue_id == known_issue_id)
+    if change_type is not None:
+        query = query.filter(ChangeModel.change_type == change_type)
+    result = db.execute(query.order_by(ChangeModel.id).limit(limit))
+    return list_response(request, schemas.Change, result.mappings().all())
+
+
+@app.get("/feed", response_model=schemas.Feed)
+async def read_feed_endpoint(
+    cursor: str = None,
+    wait: float = Query(0, ge=0, le=60),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve the scrapes and field-level changes committed after a cursor.
+
+    Start without a cursor to read from the beginning, then pass the returned `cursor` to get only
+    newer items. With `wait`, a request that finds nothing new is held open for up to that many
+    seconds and answered as soon as new data is committed, instead of the client polling.
+
+    Args:
+        cursor (str, optional): Opaque cursor from a previous response.
+        wait (float): Seconds to wait for new items when there are none. Defaults to 0.
+        limit (int): Maximum number of scrapes and of changes to return. Defaults to 100.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        schemas.Feed: The new scrapes and changes, the cursor to continue from, and whether more are waiting.
+
+    Raises:
+        HTTPException: 400 error if the cursor is invalid.
+    """
+    # Woken by commits on the primary, which a replica may not have replayed yet
+    use_primary(db)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        # Taken before reading, so a commit between the read and the wait still wakes us.
+        published = bus.current(FEED_CHANNEL)
+        try:
+            page = await asyncio.to_thread(read_feed, db, cursor, limit)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        remaining = deadline - loop.time()
+        if page["scrapes"] or page["changes"] or remaining <= 0:
+            return page
+        # End the read transaction so the connection is not held while waiting.
+        db.rollback()
+        try:
+            await asyncio.wait_for(published.wait(), remaining)
+        except asyncio.TimeoutError:
+            return page
+
+
+@app.get("/events")
+async def stream_events(request: Request):
+    """
+    Stream dashboard events as server-sent events.
+
+    Each event is named after its type, `scrape.new`, `scrape.triage` or `scrape.archived`, and
+    carries JSON data with the `url_id` and `scrape_ids` it concerns, so a client can refresh only
+    the affected product.
+    A `resync` event means events were dropped for a slow client, which should then refresh
+    everything. A comment line is sent every SSE_KEEPALIVE_SECONDS to keep proxies from closing an
+    idle stream.
+
+    Args:
+        request (Request): The incoming request, used to stop streaming when the client disconnects.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` response.
+    """
+    queue = bus.subscribe(DASHBOARD_CHANNEL)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload is None:
+                    yield "event: resync\ndata: {}\n\n"
+                    continue
+                event_type = json.loads(payload)["type"]
+                yield f"event: {event_type}\ndata: {payload}\n\n"
+        finally:
+            bus.unsubscribe(DASHBOARD_CHANNEL, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/scrape", response_model=dict)
 async def scrape_endpoint(url_data: URLSchema, db: Session = Depends(get_db)):
     """
@@ -610,74 +1218,159 @@ async def scrape_endpoint(url_data: URLSchema, db: Session = Depends(get_db)):
 
     Returns:
         schemas.Scrape: The result of the scraping operation, as returned by the `scrape_url` function.
+
+    Raises:
+        HTTPException: 429 or 503 if the scrape could not be admitted under the concurrency limit.
     """
 
-    result = await scrape_url(url_data, db)
+    result = await run_scrape(url_data)
     return result
 
 
-@app.get("/latest", response_model=ScrapeSchema)
-def get_latest_endpoint(url: str, db: Session = Depends(get_db)):
+@app.get("/latest", response_model=dict)
+def get_latest_endpoint(request: Request, url: str, db: Session = Depends(get_db)):
     """
     Retrieve the latest scrape data for a given URL.
 
     This endpoint allows you to fetch the most recent scrape data for a specified URL from the database.
+    Responses are cached until the URL's scrapes change and carry an ETag for conditional requests.
 
     Args:
         url (str): The URL to retrieve the latest scrape data for.
         db (Session): The database session, provided by dependency injection.
 
     Returns:
-        schemas.Scrape: The latest scrape data for the specified URL.
+        dict: The scraped content of the latest scrape for the specified URL.
 
     Raises:
         HTTPException: If no scrape data is found for the given URL.
     """
-    result = get_latest_scrape(url, db)
-    if result is None:
+    url_id = url_repo.get_id(db, url)
+    if url_id is None:
         raise HTTPException(status_code=404, detail="No scrape data found for this URL")
-    return result
 
+    def build():
+        use_primary(db)
+        result = get_latest_scrape(url, db, url_repo)
+        if result is None:
+            raise HTTPException(status_code=404, detail="No scrape data found for this URL")
+        return json.dumps(result).encode()
+
+    return response_cache.respond(request, [url_tag(url_id)], build)
+
+
+async def scrape_all_urls_task(enable_deep_scrape: bool) -> ScrapeRunReport:
+    """
+    Scrape every monitored URL in turn, store new scrapes and queue a notification about them.
 
-async def scrape_all_urls_task(enable_deep_scrape: bool):
+    Progress is checkpointed in `scrape_runs`/`scrape_run_items`: each URL's new scrapes, its
+    completion state and its outbox notifications are committed in one transaction, so a restarted
+    worker resumes the same run and scrapes only the URLs that had not finished. The run is held
+    under a lease renewed in the background: while it is held, another call (a concurrent
+    `/scrape_all`, another replica) returns without scraping, and a worker whose lease was taken
+    over stops. The notifications
+    are held until the run completes and are then delivered by the outbox dispatcher as one digest
+    per recipient, covering scrapes found before and after any restart.
+
+    Each URL gets whatever is left of the run deadline (`SCRAPE_RUN_DEADLINE`); once it is spent the
+    remaining URLs are recorded as timed out instead of being attempted.
+
+    Parameters:
+        enable_deep_scrape (bool): Whether to extract every known-issue row for a new run.
+
+    Returns:
+        ScrapeRunReport: Which URLs succeeded, failed or timed out, and in which phase.
+    """
+    global latest_run_report
     logger.info(f"Starting scrape_all_urls_task with deep_scrape: {enable_deep_scrape}")
-    db = SessionLocal()
-    new_scrapes_dict = defaultdict(list)
+    report = ScrapeRunReport()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + RUN_DEADLINE
 
+    owner = checkpoint.new_owner()
+    lease = None
     try:
         with SessionLocal() as db:
-            url_models = db.query(URLModel).all()
-            logger.info(f"Found {len(url_models)} URLs to scrape.")
-            if not url_models:
-                logger.warning("No URLs found in the database. No URLs to scrape.")
-                return
-        urls = [url_model.url for url_model in url_models]
-        for url in urls:
+            run = checkpoint.start_or_resume_run(db, enable_deep_scrape, owner)
+            if run is None:
+                return report
+            run_id = run.id
+            enable_deep_scrape = run.enable_deep_scrape
+            pending = checkpoint.pending_urls(db, run_id)
+        report.run_id = run_id
+        logger.info(f"Run {run_id}: {len(pending)} URLs left to scrape.")
+        lease = asyncio.create_task(checkpoint.keep_lease(SessionLocal, run_id, owner))
+
+        for url_id, url in pending:
+            if lease.done():
+                # Another worker took the run over; it scrapes what is left.
+                logger.warning(f"Stopping run {run_id}: its lease was lost")
+                return report
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                report.record_timeout(url, "run_deadline")
+                continue
             try:
+                logger.info(f"Scraping [<-] {url}")
+                scraped_data = await asyncio.wait_for(
+                    run_scrape(URLSchema(url=url), enable_deep_scrape), remaining
+                )
                 with SessionLocal() as url_session:
-                    logger.info(f"Scraping [<-] {url}")
-                    scrape_results = await scrape_and_create(
-                        URLSchema(url=url), url_session, enable_deep_scrape
+                    db_url = url_session.get(URLModel, url_id)
+                    new_scrapes = ingest_scraped_data(url_session, db_url, scraped_data)
+                    checkpoint.record_url_result(
+                        url_session, run_id, url_id, "done", new_scrapes
+                    )
+                    routed = subscription_router.route(db_url, new_scrapes)
+                    for recipient, recipient_scrapes in routed.items():
+                        enqueue_new_scrapes(
+                            url_session,
+                            checkpoint.run_batch_key(run_id),
+                            db_url,
+                            recipient_scrapes,
+                            [recipient],
+                        )
+                    enqueue_webhooks(
+                        url_session,
+                        checkpoint.run_batch_key(run_id),
+                        db_url,
+                        new_scrapes,
                     )
-                    if scrape_results:
-                        new_scrapes_dict[url].extend(scrape_results)
                     url_session.commit()
-            except Exception as e:
-                logger.error(f"Error scraping {url.url}: {str(e)}")
+                report.record_success(url)
                 continue
-
-        # After all URLs are scraped, send email if there are new scrapes
-        if new_scrapes_dict:
-            subject = "New Known Issues Published!"
-            recipients = ["emilio.gagliardi@gmail.com"]
-            try:
-                await send_email(subject, new_scrapes_dict, recipients)
-                logger.info("Email sent successfully.")
+            except ScrapeTimeoutError as e:
+                logger.error(f"Timed out during {e.phase} scraping {url}")
+                report.record_timeout(url, e.phase)
+                state, detail = "timed_out", e.phase
+            except asyncio.TimeoutError:
+                # Left pending, like URLs the deadline stopped us from reaching, so a resumed run retries it.
+                logger.error(f"Run deadline reached while scraping {url}")
+                report.record_timeout(url, "run_deadline")
+                continue
+            except AdmissionRejected as e:
+                # Busy with on-demand scrapes: left pending, like the deadline above, for a resumed run.
+                logger.warning(f"Skipping {url} for now: {e}")
+                report.record_failure(url, e)
+                continue
+            except CircuitOpenError as e:
+                logger.warning(f"Skipping {url}: {e}")
+                report.record_failure(url, e)
+                state, detail = "failed", str(e)
             except Exception as e:
-                logger.error(f"Error sending email: {str(e)}")
-                logger.error(traceback.format_exc())
-        else:
-            logger.info("No new scrapes found. No email sent.")
+                logger.error(f"Error scraping {url}: {str(e)}")
+                report.record_failure(url, e)
+                state, detail = "failed", str(e)
+            with SessionLocal() as url_session:
+                checkpoint.record_url_result(
+                    url_session, run_id, url_id, state, detail=detail
+                )
+                url_session.commit()
+
+        # URLs skipped by the run deadline stay pending, so the run is only complete when none are left.
+        with SessionLocal() as db:
+            if not checkpoint.pending_urls(db, run_id) and checkpoint.finish_run(db, run_id, owner):
+                kick_outbox_dispatcher()
 
     except SQLAlchemyError as e:
         logger.error(f"Database error: {str(e)}")
@@ -686,7 +1379,13 @@ async def scrape_all_urls_task(enable_deep_scrape: bool):
         logger.error(f"Unexpected error: {str(e)}")
         logger.error(traceback.format_exc())
     finally:
-        db.close()
+        if lease is not None:
+            lease.cancel()
+        report.finish()
+        logger.info(report.summary())
+        latest_run_report = report
+
+    return report
 
 
 @app.post("/scrape_all", status_code=202)
@@ -696,3 +1395,212 @@ async def trigger_scrape_all(
     logger.info(f"Received request with enable_deep_scrape: {enable_deep_scrape}")
     background_tasks.add_task(scrape_all_urls_task, enable_deep_scrape)
     return {"message": "Scraping process started", "deep_scrape": enable_deep_scrape}
+
+
+async def discover_status_pages_task() -> list[str]:
+    """
+    Crawl the release-health pages and register status pages that are not monitored yet.
+
+    Returns:
+        list[str]: The newly registered URLs; empty if the crawl failed.
+    """
+    try:
+        return await discover_status_pages(release_health_discovery, url_repo, SessionLocal)
+    except Exception as e:
+        logger.error(f"Status page discovery failed: {e}")
+        return []
+
+
+async def maintain_scrape_partitions_task() -> list[str]:
+    """
+    Create the upcoming monthly scrape partitions, and archive months past the retention period to
+    Parquet.
+
+    Returns:
+        list[str]: The archive files written; empty if archiving failed.
+    """
+
+    def maintain():
+        ensure_partitions(engine)
+        return archive_old_scrapes(engine)
+
+    try:
+        archived = await asyncio.to_thread(maintain)
+    except Exception as e:
+        logger.error(f"Scrape partition maintenance failed: {e}")
+        return []
+    return [str(path) for path in archived]
+
+
+@app.post("/discover", response_model=dict)
+async def trigger_discovery():
+    """
+    Run status page discovery now instead of waiting for the scheduled run.
+
+    Returns:
+        dict: The newly registered URLs.
+    """
+    return {"created": await discover_status_pages_task()}
+
+
+@app.get("/scrape_all/report", response_model=dict)
+def read_latest_run_report():
+    """
+    Retrieve the report of the most recent scrape run.
+
+    Returns:
+        dict: The URLs that succeeded, failed or timed out (with the phase that timed out).
+
+    Raises:
+        HTTPException: 404 if no scrape run has completed since startup.
+    """
+    if latest_run_report is None:
+        raise HTTPException(status_code=404, detail="No scrape run has completed yet")
+    return latest_run_report.to_dict()
+
+
+@app.post("/subscriptions/", response_model=schemas.Subscription)
+def create_subscription(
+    subscription: schemas.SubscriptionCreate, db: Session = Depends(get_db)
+):
+    """
+    Subscribe an email address to new known issues.
+
+    Empty `products`, `status_keywords` or `kb_numbers` mean "any" for that filter.
+
+    Args:
+        subscription (schemas.SubscriptionCreate): The subscriber and its filters.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        schemas.Subscription: The created subscription.
+    """
+    db_subscription = SubscriptionModel(
+        email=subscription.email,
+        team=subscription.team,
+        products=json.dumps(subscription.products),
+        status_keywords=json.dumps(subscription.status_keywords),
+        kb_numbers=json.dumps(subscription.kb_numbers),
+        active=subscription.active,
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(db_subscription)
+    notify(db, SUBSCRIPTION_CHANNEL)
+    db.commit()
+    db.refresh(db_subscription)
+    return db_subscription
+
+
+@app.get("/subscriptions/", response_model=list[schemas.Subscription])
+def read_subscriptions(db: Session = Depends(get_db)):
+    """
+    Retrieve all subscriptions.
+
+    Args:
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        List[schemas.Subscription]: All subscriptions, active or not.
+    """
+    result = db.execute(select(SubscriptionModel).order_by(SubscriptionModel.id))
+    return result.scalars().all()
+
+
+@app.delete("/subscriptions/{subscription_id}", response_model=schemas.Subscription)
+def delete_subscription(subscription_id: int, db: Session = Depends(get_db)):
+    """
+    Delete a subscription.
+
+    Args:
+        subscription_id (int): The ID of the subscription to delete.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        schemas.Subscription: The deleted subscription.
+
+    Raises:
+        HTTPException: 404 error if the subscription is not found.
+    """
+    db_subscription = db.get(SubscriptionModel, subscription_id)
+    if db_subscription is None:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    response = schemas.Subscription.model_validate(db_subscription)
+    db.delete(db_subscription)
+    notify(db, SUBSCRIPTION_CHANNEL)
+    db.commit()
+    return response
+
+
+@app.post("/webhooks/", response_model=schemas.WebhookCreated)
+def create_webhook(webhook: schemas.WebhookCreate, db: Session = Depends(get_db)):
+    """
+    Register a webhook receiver for new known issues.
+
+    Each delivery is a JSON POST signed with HMAC-SHA256 in the `X-Webhook-Signature` header
+    (`t=<unix time>,v1=<hex digest of "<t>.<body>">`) and carries an `X-Idempotency-Key` that is
+    repeated on retries.
+
+    Args:
+        webhook (schemas.WebhookCreate): The receiver URL, optional secret and concurrency limit.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        schemas.WebhookCreated: The created webhook, including its signing secret.
+
+    Raises:
+        HTTPException: 400 if the URL's host is loopback, private, link-local or doesn't resolve.
+    """
+    try:
+        check_receiver_host(webhook.url.host)
+    except UnsafeWebhookURL as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db_webhook = WebhookModel(
+        url=str(webhook.url),
+        secret=webhook.secret or secrets.token_hex(32),
+        max_concurrency=webhook.max_concurrency,
+        active=webhook.active,
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(db_webhook)
+    db.commit()
+    db.refresh(db_webhook)
+    return db_webhook
+
+
+@app.get("/webhooks/", response_model=list[schemas.Webhook])
+def read_webhooks(db: Session = Depends(get_db)):
+    """
+    Retrieve all webhooks. Secrets are not returned.
+
+    Args:
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        List[schemas.Webhook]: All webhooks, active or not.
+    """
+    result = db.execute(select(WebhookModel).order_by(WebhookModel.id))
+    return result.scalars().all()
+
+
+@app.delete("/webhooks/{webhook_id}", response_model=schemas.Webhook)
+def delete_webhook(webhook_id: int, db: Session = Depends(get_db)):
+    """
+    Delete a webhook. Deliveries already queued for it are dropped.
+
+    Args:
+        webhook_id (int): The ID of the webhook to delete.
+        db (Session): The database session, provided by dependency injection.
+
+    Returns:
+        schemas.Webhook: The deleted webhook.
+
+    Raises:
+        HTTPException: 404 error if the webhook is not found.
+    """
+    db_webhook = db.get(WebhookModel, webhook_id)
+    if db_webhook is None:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    response = schemas.Webhook.model_validate(db_webhook)
+    db.delete(db_webhook)
+    db.commit()
+    return response
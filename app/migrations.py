@@ -0,0 +1,72 @@
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.checkpoint import enforce_single_running_run
+from app.database import Base
+from app.feed import number_existing_rows
+from app.fingerprint import rehash_and_dedupe_scrapes
+from app.models import SchemaMigration
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(engine: Engine):
+    """
+    Add columns that exist on the models but not yet in the database.
+
+    `Base.metadata.create_all` creates missing tables but never alters existing ones, so columns
+    added to an existing model are added here, as nullable columns, together with their index.
+    Safe to run on every startup.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                logger.info(f"Adding column {table.name}.{column.name} {column_type}")
+                connection.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                )
+                if column.index:
+                    connection.execute(
+                        text(
+                            f"CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} "
+                            f"ON {table.name} ({column.name})"
+                        )
+                    )
+
+
+# Data migrations run once each, in order, recorded in schema_migrations.
+DATA_MIGRATIONS = [
+    ("0001_canonical_scrape_fingerprints", rehash_and_dedupe_scrapes),
+    ("0002_single_running_scrape_run", enforce_single_running_run),
+    ("0003_feed_positions", number_existing_rows),
+]
+
+
+def run_data_migrations(db: Session):
+    """
+    Apply the data migrations that have not been applied yet. Each migration commits its own
+    work; it is recorded as applied only once it has finished, so an interrupted migration is
+    re-run from the start on the next startup and must be idempotent.
+    """
+    applied = set(db.execute(select(SchemaMigration.name)).scalars())
+    for name, migrate in DATA_MIGRATIONS:
+        if name in applied:
+            continue
+        logger.info(f"Applying data migration {name}")
+        migrate(db)
+        db.add(SchemaMigration(name=name, applied_at=datetime.now(timezone.utc)))
+        db.commit()
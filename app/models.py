@@ -1,4 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    Index,
+    LargeBinary,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -12,8 +24,12 @@ class URL(Base):
     scrapes = relationship("Scrape", back_populates="url")
 
 
+# On PostgreSQL this table is range-partitioned by month on `timestamp` (see app.partitioning), so
+# nothing may reference it with a foreign key, and `timestamp`, part of the primary key there, must
+# be set on every row.
 class Scrape(Base):
     __tablename__ = "scrapes"
+    __table_args__ = (Index("ix_scrapes_url_id_timestamp", "url_id", "timestamp"),)
 
     id = Column(Integer, primary_key=True, index=True)
     url_id = Column(Integer, ForeignKey("urls.id"))
@@ -23,15 +39,166 @@ class Scrape(Base):
     scrape_comment = Column(String)
     create_alert = Column(Boolean, default=False)
     url = relationship("URL", back_populates="scrapes")
-    changes = relationship("Change", back_populates="scrape")
+    changes = relationship(
+        "Change", back_populates="scrape", primaryjoin="Scrape.id == foreign(Change.scrape_id)"
+    )
     hash = Column(String(32), index=True)
+    # ID of the first scrape of the same known issue, across URLs (see app.clustering)
+    cluster_id = Column(Integer, index=True, nullable=True)
+    minhash = Column(LargeBinary, nullable=True)
+    known_issue = relationship("KnownIssue", back_populates="scrapes")
+    known_issue_id = Column(
+        Integer, ForeignKey("known_issues.id"), index=True, nullable=True
+    )
+    # Position in /feed, assigned in commit order after the row is committed (see app.feed)
+    feed_seq = Column(BigInteger, index=True, nullable=True)
+
+
+# One known issue on one product's status page, across every version scraped for it
+class KnownIssue(Base):
+    __tablename__ = "known_issues"
+    __table_args__ = (UniqueConstraint("url_id", "fingerprint"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    url_id = Column(Integer, ForeignKey("urls.id"), index=True)
+    # Hash of the normalized summary (see app.issues.issue_fingerprint)
+    fingerprint = Column(String(32))
+    title = Column(String)
+    status = Column(String, nullable=True)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    latest_scrape_id = Column(Integer, nullable=True)
+    # JSON of the issue's "Issue details" section (see app.scraper.extract_issue_details)
+    details = Column(String, nullable=True)
+    scrapes = relationship("Scrape", back_populates="known_issue")
 
 
 class Change(Base):
     __tablename__ = "changes"
 
     id = Column(Integer, primary_key=True, index=True)
-    scrape_id = Column(Integer, ForeignKey("scrapes.id"))
+    # The scrape may have been archived (see app.partitioning), so this is not a foreign key
+    scrape_id = Column(Integer)
+    # The field that changed: status or last_updated
     change_type = Column(String)
     details = Column(String)
-    scrape = relationship("Scrape", back_populates="changes")
+    scrape = relationship(
+        "Scrape", back_populates="changes", primaryjoin="foreign(Change.scrape_id) == Scrape.id"
+    )
+    known_issue_id = Column(Integer, ForeignKey("known_issues.id"), index=True, nullable=True)
+    previous_scrape_id = Column(Integer, nullable=True)
+    old_value = Column(String, nullable=True)
+    new_value = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    # Position in /feed, assigned in commit order after the row is committed (see app.feed)
+    feed_seq = Column(BigInteger, index=True, nullable=True)
+
+
+class ScrapeRun(Base):
+    __tablename__ = "scrape_runs"
+    # At most one run is running at a time (see app.checkpoint.start_or_resume_run)
+    __table_args__ = (
+        Index(
+            "uq_scrape_runs_running",
+            "status",
+            unique=True,
+            postgresql_where=text("status = 'running'"),
+            sqlite_where=text("status = 'running'"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime, nullable=True)
+    # running -> completed, or abandoned when a stale run is not resumed
+    status = Column(String, default="running", index=True)
+    enable_deep_scrape = Column(Boolean, default=False)
+    notified_at = Column(DateTime, nullable=True)
+    # The worker holding the run's lease, and when it last renewed it
+    owner = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    items = relationship("ScrapeRunItem", back_populates="run")
+
+
+class ScrapeRunItem(Base):
+    __tablename__ = "scrape_run_items"
+    __table_args__ = (UniqueConstraint("run_id", "url_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("scrape_runs.id"), index=True)
+    url_id = Column(Integer, ForeignKey("urls.id"))
+    # pending -> done | failed | timed_out
+    state = Column(String, default="pending")
+    detail = Column(String, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # JSON list of the scrape IDs this URL produced, kept until the run's notification is sent
+    new_scrape_ids = Column(String, nullable=True)
+    run = relationship("ScrapeRun", back_populates="items")
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String, unique=True, index=True)
+    channel = Column(String, default="email")
+    recipient = Column(String)
+    # Rows sharing a batch_key and recipient are delivered as one digest, e.g. "run:42"
+    batch_key = Column(String, index=True)
+    payload = Column(String)
+    # held -> pending -> sending -> sent, or back to pending on failure until dead
+    status = Column(String, default="pending", index=True)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, index=True)
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class Subscription(Base):
+    __tablename__ = "subscriptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, index=True)
+    team = Column(String, nullable=True)
+    # JSON lists; an empty list means "any"
+    products = Column(String, default="[]")
+    status_keywords = Column(String, default="[]")
+    kb_numbers = Column(String, default="[]")
+    active = Column(Boolean, default=True)
+    created_at = Column(DateTime)
+
+
+class Webhook(Base):
+    __tablename__ = "webhooks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String)
+    # Shared secret for the HMAC-SHA256 signature on every delivery
+    secret = Column(String)
+    # Deliveries in flight to this receiver at once
+    max_concurrency = Column(Integer, default=4)
+    active = Column(Boolean, default=True)
+    created_at = Column(DateTime)
+
+
+# One-time data migrations that have been applied (see app.migrations)
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime)
+
+
+# A distinct page fetched from a URL; the HTML itself is in the archive (see app.html_archive)
+class PageSnapshot(Base):
+    __tablename__ = "page_snapshots"
+    __table_args__ = (UniqueConstraint("url_id", "html_hash"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    url_id = Column(Integer, ForeignKey("urls.id"), index=True)
+    # SHA-256 of the HTML, its address in the archive
+    html_hash = Column(String(64), index=True)
+    first_fetched_at = Column(DateTime)
+    last_fetched_at = Column(DateTime)
@@ -0,0 +1,655 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import smtplib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail, Content, Header, CustomArg
+from sqlalchemy import update, or_, and_, func, tuple_
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import insert_for
+from app.models import (
+    URL as URLModel,
+    Scrape as ScrapeModel,
+    OutboxMessage,
+)
+from app.resilience import RetryPolicy
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NEW_SCRAPES_SUBJECT = "New Known Issues Published!"
+DEFAULT_RECIPIENTS = [
+    address.strip()
+    for address in os.getenv("NOTIFY_DEFAULT_RECIPIENTS", "").split(",")
+    if address.strip()
+]
+if not DEFAULT_RECIPIENTS:
+    logger.warning(
+        "NOTIFY_DEFAULT_RECIPIENTS is not set; new issues are only sent to subscribers and webhooks"
+    )
+
+
+class OutgoingEmail:
+    """
+    An email ready to hand to a transport.
+
+    Attributes:
+        subject (str): The subject line.
+        recipients (list[str]): The addresses to send to.
+        html (str): The HTML body.
+        idempotency_key (str): Stable key for this message, passed to the transport so a resend
+            after a crash can be recognised downstream.
+    """
+
+    def __init__(
+        self, subject: str, recipients: list[str], html: str, idempotency_key: str
+    ):
+        self.subject = subject
+        self.recipients = recipients
+        self.html = html
+        self.idempotency_key = idempotency_key
+
+
+class Transport(ABC):
+    """
+    Base class for outbox transports, one per channel. `deliver` raises on failure.
+    """
+
+    @abstractmethod
+    async def deliver(self, recipient: str, body: dict, idempotency_key: str):
+        """
+        Deliver one digest.
+
+        Parameters:
+            recipient (str): The channel-specific recipient, e.g. an email address or webhook ID.
+            body (dict): URLs as keys and lists of new scrapes as values.
+            idempotency_key (str): Stable key for this digest.
+        """
+
+    async def aclose(self):
+        pass
+
+
+class EmailTransport(Transport):
+    """
+    Base class for email transports: renders the digest and hands it to `send`.
+    """
+
+    async def deliver(self, recipient: str, body: dict, idempotency_key: str):
+        await self.send(
+            OutgoingEmail(
+                subject=NEW_SCRAPES_SUBJECT,
+                recipients=[recipient],
+                html=render_new_scrapes_email(body),
+                idempotency_key=idempotency_key,
+            )
+        )
+
+    @abstractmethod
+    async def send(self, message: OutgoingEmail):
+        """
+        Send one rendered email.
+        """
+
+
+class SendGridTransport(EmailTransport):
+    """
+    Send through the SendGrid API. The client is synchronous, so calls run in a worker thread.
+    """
+
+    def __init__(self, api_key: str, from_email: str):
+        self.client = SendGridAPIClient(api_key)
+        self.from_email = from_email
+
+    async def send(self, message: OutgoingEmail):
+        mail = Mail(
+            from_email=self.from_email,
+            to_emails=message.recipients,
+            subject=message.subject,
+        )
+        mail.add_content(Content("text/html", message.html))
+        mail.add_header(Header("X-Idempotency-Key", message.idempotency_key))
+        mail.add_custom_arg(CustomArg("idempotency_key", message.idempotency_key))
+        response = await asyncio.to_thread(self.client.send, mail)
+        logger.info(f"Email sent. Status Code: {response.status_code}")
+        if response.status_code >= 400:
+            raise RuntimeError(f"SendGrid returned {response.status_code}")
+
+
+class SMTPTransport(EmailTransport):
+    """
+    Send through an SMTP server, e.g. a local stand-in such as MailHog or
+    `python -m aiosmtpd -n -l localhost:1025` during development and tests.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        from_email: str,
+        username: str = None,
+        password: str = None,
+        starttls: bool = False,
+    ):
+        self.host = host
+        self.port = port
+        self.from_email = from_email
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+
+    def _send_sync(self, message: OutgoingEmail):
+        email = EmailMessage()
+        email["Subject"] = message.subject
+        email["From"] = self.from_email
+        email["To"] = ", ".join(message.recipients)
+        email["Message-ID"] = f"<{message.idempotency_key}@known-issues-monitor>"
+        email["X-Idempotency-Key"] = message.idempotency_key
+        email.set_content(message.html, subtype="html")
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(email)
+
+    async def send(self, message: OutgoingEmail):
+        await asyncio.to_thread(self._send_sync, message)
+        logger.info(f"Email sent via SMTP {self.host}:{self.port}")
+
+
+class MemoryTransport(EmailTransport):
+    """
+    Keep sent messages in memory. Useful in tests.
+    """
+
+    def __init__(self):
+        self.sent: list[OutgoingEmail] = []
+
+    async def send(self, message: OutgoingEmail):
+        self.sent.append(message)
+
+
+def transport_from_env() -> EmailTransport:
+    """
+    Build the email transport selected by NOTIFY_TRANSPORT: "sendgrid" (default), "smtp" or "memory".
+    """
+    kind = os.getenv("NOTIFY_TRANSPORT", "sendgrid").lower()
+    from_email = os.getenv("SENDGRID_FROM_EMAIL", "known-issues@localhost")
+    if kind == "smtp":
+        return SMTPTransport(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "1025")),
+            from_email=os.getenv("SMTP_FROM_EMAIL", from_email),
+            username=os.getenv("SMTP_USERNAME"),
+            password=os.getenv("SMTP_PASSWORD"),
+            starttls=os.getenv("SMTP_STARTTLS", "false").lower() == "true",
+        )
+    if kind == "memory":
+        return MemoryTransport()
+    return SendGridTransport(os.getenv("SENDGRID_API_KEY"), from_email)
+
+
+def format_scrape_content(scrape: ScrapeModel) -> str:
+    """
+    Format the scrape content from a ScrapeModel object into a human-readable string.
+
+    Parameters:
+        scrape (ScrapeModel): The ScrapeModel object containing the content to be formatted.
+
+    Returns:
+        str: A formatted string representing the content of the scrape, including last updated time, summary, status, and originating update.
+
+    If the content of the scrape cannot be parsed as JSON, an error message is returned.
+    """
+    try:
+        content_dict = json.loads(scrape.content)
+        known_issues = content_dict.get("known_issues", {}).get("row", {})
+
+        formatted_content = (
+            f"Last updated: {known_issues.get('Last updated', 'N/A')}\n"
+            f"Summary:\n{known_issues.get('Summary', 'N/A')}\n"
+            f"Status: {known_issues.get('Status', 'N/A')}\n"
+            f"Originating update: {known_issues.get('Originating update', 'N/A')}\n"
+        )
+        return formatted_content
+    except json.JSONDecodeError:
+        return "Error: Unable to parse scrape content"
+
+
+def process_url_for_title(url):
+    """
+    Process the URL to extract a title.
+
+    Parameters:
+        url (str): The URL from which to extract the title.
+
+    Returns:
+        str: The processed title extracted from the URL.
+    """
+    # Parse the URL
+    parsed_url = urlparse(url)
+
+    # Get the path
+    path = parsed_url.path
+
+    # Remove 'status' from the path
+    path = path.replace("status-", "").replace("/status/", "")
+
+    # Split the path and get the last part
+    parts = path.split("/")
+    last_part = (
+        parts[-1] if parts[-1] else parts[-2]
+    )  # Use second to last if last is empty
+
+    # Remove file extension if present
+    last_part = re.sub(r"\.[^.]+$", "", last_part)
+
+    # Replace hyphens with spaces and capitalize each word
+    title = " ".join(word.capitalize() for word in last_part.split("-"))
+
+    return title
+
+
+def group_by_cluster(body: dict) -> list[tuple[ScrapeModel, list[str]]]:
+    """
+    Fold a digest's scrapes into one entry per known issue.
+
+    Scrapes sharing a cluster ID are the same issue published for several products; unclustered
+    scrapes stand alone.
+
+    Parameters:
+        body (dict): URLs as keys and lists of scrapes as values.
+
+    Returns:
+        list[tuple[ScrapeModel, list[str]]]: The most recent scrape of each issue and the URLs it affects,
+        in digest order.
+    """
+    issues = {}
+    for url, scrapes in body.items():
+        for scrape in scrapes:
+            key = scrape.cluster_id if scrape.cluster_id is not None else ("scrape", scrape.id)
+            latest, urls = issues.get(key, (scrape, []))
+            if scrape.timestamp and latest.timestamp and scrape.timestamp > latest.timestamp:
+                latest = scrape
+            if url not in urls:
+                urls.append(url)
+            issues[key] = (latest, urls)
+    return list(issues.values())
+
+
+def render_new_scrapes_email(body: dict) -> str:
+    """
+    Render the HTML digest of new scrapes, one section per known issue with the products it affects.
+
+    Parameters:
+        body (dict): A dictionary containing URLs as keys and a list of scrapes as values.
+            Each scrape should have attributes 'scrape_type', 'scrape_comment', and 'content'.
+
+    Returns:
+        str: The HTML body.
+    """
+    email_content = ["New scrapes found:<br><br>"]
+    for scrape, urls in group_by_cluster(body):
+        links = ", ".join(
+            f'<a href="{url}">{process_url_for_title(url)}</a>' for url in urls
+        )
+        email_content.append(
+            f"Product: {links}" if len(urls) == 1 else f"Affected products: {links}"
+        )
+        email_content.append("Known Issues:")
+        email_content.append(format_scrape_content(scrape))
+        email_content.append(f"Scrape Type: {scrape.scrape_type}")
+        email_content.append(f"Scrape Comment: {scrape.scrape_comment}")
+        email_content.append("---")
+
+    return "<br>".join(email_content)
+
+
+async def send_email(
+    subject: str,
+    body: dict,
+    recipients: list[str],
+    transport: EmailTransport = None,
+    idempotency_key: str = None,
+):
+    """
+    Render and send a digest of new scrapes immediately, without going through the outbox.
+
+    Parameters:
+        subject (str): The subject of the email.
+        body (dict): A dictionary containing URLs as keys and a list of scrapes as values.
+        recipients (list[str]): A list of email addresses to send the email to.
+        transport (EmailTransport, optional): Defaults to the transport selected by NOTIFY_TRANSPORT.
+        idempotency_key (str, optional): Defaults to a key derived from the current time.
+
+    Raises:
+        Exception: If the transport fails to send the email.
+    """
+    transport = transport or transport_from_env()
+    message = OutgoingEmail(
+        subject=subject,
+        recipients=recipients,
+        html=render_new_scrapes_email(body),
+        idempotency_key=idempotency_key
+        or f"adhoc:{datetime.now(timezone.utc).timestamp()}",
+    )
+    await transport.send(message)
+
+
+def enqueue_new_scrapes(
+    db: Session,
+    batch_key: str,
+    db_url: URLModel,
+    new_scrapes: list[ScrapeModel],
+    recipients: list[str] = None,
+    held: bool = True,
+    channel: str = "email",
+):
+    """
+    Write notifications for a URL's new scrapes to the outbox. Does not commit, so the rows are
+    committed in the same transaction as the scrapes themselves.
+
+    One row is written per recipient, keyed by batch, URL, channel and recipient, so re-running the
+    same batch after a crash does not enqueue duplicates. The dispatcher folds all rows of a batch
+    for one recipient into a single digest.
+
+    Parameters:
+        db (Session): The database session holding the new scrapes.
+        batch_key (str): Groups rows into one digest, e.g. "run:42".
+        db_url (URLModel): The URL the scrapes came from.
+        new_scrapes (list[ScrapeModel]): The new, flushed scrapes.
+        recipients (list[str], optional): Defaults to NOTIFY_DEFAULT_RECIPIENTS.
+        held (bool): Hold the rows until `release_batch` is called, e.g. when the run finishes.
+        channel (str): The outbox channel, e.g. "email" or "webhook".
+    """
+    if not new_scrapes:
+        return
+    now = datetime.now(timezone.utc)
+    payload = json.dumps(
+        {"url": db_url.url, "scrape_ids": [scrape.id for scrape in new_scrapes]}
+    )
+    rows = [
+        {
+            "idempotency_key": f"{batch_key}:url:{db_url.id}:{channel}:{recipient}",
+            "channel": channel,
+            "recipient": recipient,
+            "batch_key": batch_key,
+            "payload": payload,
+            "status": "held" if held else "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for recipient in (recipients or DEFAULT_RECIPIENTS)
+    ]
+    if not rows:
+        return
+    insert = insert_for(db)
+    db.execute(
+        insert(OutboxMessage)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["idempotency_key"])
+    )
+
+
+def release_batch(db: Session, batch_key: str) -> int:
+    """
+    Make a batch's held outbox rows available to the dispatcher. Idempotent. Does not commit.
+
+    Returns:
+        int: The number of rows released.
+    """
+    result = db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.batch_key == batch_key, OutboxMessage.status == "held")
+        .values(status="pending", next_attempt_at=datetime.now(timezone.utc))
+    )
+    return result.rowcount
+
+
+def group_messages(messages: list[OutboxMessage]) -> dict[tuple, list[OutboxMessage]]:
+    """
+    Group outbox rows into digests: one per channel, recipient and batch.
+    """
+    groups = defaultdict(list)
+    for message in messages:
+        groups[(message.channel, message.recipient, message.batch_key)].append(message)
+    return groups
+
+
+class OutboxDispatcher:
+    """
+    Drain the outbox asynchronously: claim due rows in batches of whole digests, fold them into
+    one digest per recipient and batch, send through the channel's transport, and record the
+    outcome.
+
+    Failed digests are retried with the retry policy's jittered backoff until `max_attempts`,
+    after which their rows are marked dead. Rows claimed by a dispatcher that died mid-send are
+    reclaimed after `claim_timeout`.
+
+    Each recipient's digests are sent by their own task, and a recipient with a delivery in
+    flight is left out of further claims until it finishes, so a slow or hanging receiver only
+    delays its own digests while the dispatcher keeps claiming and sending for the others.
+
+    A dispatcher only claims rows for the channels it has transports for, so running one
+    dispatcher per channel keeps a slow channel from holding up the others.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        transports: dict[str, Transport],
+        batch_size: int = 200,
+        max_attempts: int = 8,
+        claim_timeout: timedelta = timedelta(minutes=10),
+        retry_policy: RetryPolicy = None,
+    ):
+        self.session_factory = session_factory
+        self.transports = transports
+        self.channels = list(transports)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+        self.retry_policy = retry_policy or RetryPolicy(base_delay=30, max_delay=3600)
+        self._lock = asyncio.Lock()
+        # (channel, recipient) -> the task delivering its claimed digests
+        self._in_flight: dict[tuple[str, str], asyncio.Task] = {}
+
+    def _due(self, now: datetime):
+        return and_(
+            OutboxMessage.channel.in_(self.channels),
+            or_(
+                and_(
+                    OutboxMessage.status == "pending",
+                    OutboxMessage.next_attempt_at <= now,
+                ),
+                and_(
+                    OutboxMessage.status == "sending",
+                    OutboxMessage.claimed_at <= now - self.claim_timeout,
+                ),
+            ),
+        )
+
+    def _claim(self, busy: list[tuple[str, str]] = ()) -> list[OutboxMessage]:
+        """
+        Claim due rows in whole digests: every due row of each (channel, recipient, batch) group
+        taken, oldest group first, until about `batch_size` rows. A digest is never split across
+        claims, so each recipient gets one digest per batch under its idempotency key.
+
+        Parameters:
+            busy (list[tuple[str, str]]): (channel, recipient) pairs with a delivery in flight,
+                whose rows are left for a later claim.
+        """
+        now = datetime.now(timezone.utc)
+        group = (OutboxMessage.channel, OutboxMessage.recipient, OutboxMessage.batch_key)
+        with self.session_factory() as db:
+            query = select(*group, func.count(OutboxMessage.id)).filter(self._due(now))
+            if busy:
+                query = query.filter(
+                    tuple_(OutboxMessage.channel, OutboxMessage.recipient).not_in(list(busy))
+                )
+            candidates = db.execute(
+                query
+                .group_by(*group)
+                .order_by(func.min(OutboxMessage.id))
+                .limit(self.batch_size)
+            ).all()
+            keys, size = [], 0
+            for channel, recipient, batch_key, count in candidates:
+                if keys and size + count > self.batch_size:
+                    break
+                keys.append((channel, recipient, batch_key))
+                size += count
+            if not keys:
+                return []
+            messages = (
+                db.execute(
+                    select(OutboxMessage)
+                    .filter(self._due(now), tuple_(*group).in_(keys))
+                    .order_by(OutboxMessage.id)
+                    .with_for_update(skip_locked=True)
+                )
+                .scalars()
+                .all()
+            )
+            for message in messages:
+                message.status = "sending"
+                message.claimed_at = now
+            # Detach before committing so the rows stay readable without a refresh.
+            db.flush()
+            db.expunge_all()
+            db.commit()
+        return messages
+
+    def _load_body(self, messages: list[OutboxMessage]) -> dict:
+        payloads = [json.loads(message.payload) for message in messages]
+        scrape_ids = [scrape_id for p in payloads for scrape_id in p["scrape_ids"]]
+        with self.session_factory() as db:
+            scrapes = {
+                scrape.id: scrape
+                for scrape in db.execute(
+                    select(ScrapeModel).filter(ScrapeModel.id.in_(scrape_ids))
+                )
+                .scalars()
+                .all()
+            }
+            db.expunge_all()
+        body = defaultdict(list)
+        for payload in payloads:
+            body[payload["url"]].extend(
+                scrapes[scrape_id]
+                for scrape_id in payload["scrape_ids"]
+                if scrape_id in scrapes
+            )
+        return body
+
+    def _record(self, messages: list[OutboxMessage], error: Exception = None):
+        now = datetime.now(timezone.utc)
+        ids = [message.id for message in messages]
+        with self.session_factory() as db:
+            if error is None:
+                db.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids))
+                    .values(status="sent", sent_at=now, last_error=None)
+                )
+            else:
+                attempts = max(message.attempts for message in messages) + 1
+                dead = attempts >= self.max_attempts
+                db.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids))
+                    .values(
+                        status="dead" if dead else "pending",
+                        attempts=attempts,
+                        last_error=str(error)[:1000],
+                        next_attempt_at=now
+                        + timedelta(
+                            seconds=max(
+                                self.retry_policy.base_delay,
+                                self.retry_policy.backoff(attempts - 1),
+                            )
+                        ),
+                    )
+                )
+            db.commit()
+
+    async def _deliver(self, key: tuple, messages: list[OutboxMessage]):
+        channel, recipient, batch_key = key
+        transport = self.transports[channel]
+        try:
+            body = await asyncio.to_thread(self._load_body, messages)
+            await transport.deliver(
+                recipient, body, f"{batch_key}:{channel}:{recipient}"
+            )
+        except Exception as e:
+            logger.error(f"Error sending {batch_key} to {recipient}: {e}")
+            await asyncio.to_thread(self._record, messages, e)
+            return
+        await asyncio.to_thread(self._record, messages)
+
+    async def _deliver_all(self, groups: list[tuple[tuple, list[OutboxMessage]]]):
+        for key, messages in groups:
+            await self._deliver(key, messages)
+
+    async def drain_once(self) -> int:
+        """
+        Claim one batch of due outbox rows, leaving out recipients with a delivery in flight, and
+        start delivering it: one task per recipient, sending its digests in batch order. Does not
+        wait for the deliveries.
+
+        Returns:
+            int: The number of outbox rows claimed.
+        """
+        async with self._lock:
+            messages = await asyncio.to_thread(self._claim, list(self._in_flight))
+            if not messages:
+                return 0
+            groups = group_messages(messages)
+            logger.info(
+                f"Dispatching {len(messages)} outbox rows as {len(groups)} digests"
+            )
+            by_recipient = defaultdict(list)
+            for key, group in groups.items():
+                by_recipient[key[:2]].append((key, group))
+            for receiver, receiver_groups in by_recipient.items():
+                task = asyncio.create_task(self._deliver_all(receiver_groups))
+                self._in_flight[receiver] = task
+                task.add_done_callback(
+                    lambda _, receiver=receiver: self._in_flight.pop(receiver, None)
+                )
+            return len(messages)
+
+    async def drain(self) -> int:
+        """
+        Drain until no due rows remain and every delivery has finished. Whenever a recipient's
+        delivery finishes, due rows are claimed again, so fast recipients are not held up by slow
+        ones.
+
+        Returns:
+            int: The number of outbox rows processed.
+        """
+        total = 0
+        while True:
+            processed = await self.drain_once()
+            total += processed
+            if processed:
+                continue
+            if not self._in_flight:
+                return total
+            await asyncio.wait(
+                set(self._in_flight.values()), return_when=asyncio.FIRST_COMPLETED
+            )
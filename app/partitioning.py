@@ -0,0 +1,268 @@
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import and_, delete, exists, insert, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import AddConstraint
+
+from app.events import notify_dashboard
+from app.models import KnownIssue, Scrape
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Monthly partitions created ahead of time, so inserts never fall into the default partition
+SCRAPE_PARTITION_MONTHS_AHEAD = int(os.getenv("SCRAPE_PARTITION_MONTHS_AHEAD", "3"))
+# Months of scrapes kept in the database; older months are archived. 0 keeps everything.
+SCRAPE_RETENTION_MONTHS = int(os.getenv("SCRAPE_RETENTION_MONTHS", "12"))
+SCRAPE_ARCHIVE_DIR = os.getenv("SCRAPE_ARCHIVE_DIR", "archive/scrapes")
+
+# Rows outside every monthly partition: those without a timestamp, and the scrapes kept back when
+# their month was archived
+DEFAULT_PARTITION = "scrapes_default"
+UNPARTITIONED_TABLE = "scrapes_unpartitioned"
+
+scrapes = Scrape.__table__
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"scrapes_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> datetime | None:
+    """
+    The month a partition named by `partition_name` holds, or None for other tables.
+    """
+    try:
+        return datetime.strptime(name, "scrapes_p%Y_%m")
+    except ValueError:
+        return None
+
+
+def archive_path(archive_dir: str, month: datetime) -> Path:
+    return Path(archive_dir) / f"scrapes-{month:%Y-%m}.parquet"
+
+
+def is_partitioned(connection: Connection) -> bool:
+    return (
+        connection.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass('scrapes')")
+        ).scalar()
+        == "p"
+    )
+
+
+def partition_months(connection: Connection) -> list[datetime]:
+    """
+    Months that have a partition of the scrapes table.
+    """
+    names = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'scrapes'::regclass"
+        )
+    ).scalars()
+    return sorted(month for month in map(partition_month, names) if month is not None)
+
+
+def create_partition(connection: Connection, month: datetime):
+    connection.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF scrapes "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+        )
+    )
+
+
+def partition_scrapes_table(engine: Engine, now: datetime = None):
+    """
+    Convert the scrapes table into one range-partitioned by month on `timestamp`, on PostgreSQL.
+
+    Runs once, on the first startup after upgrading: the rows are copied into monthly partitions
+    under an exclusive lock, foreign keys referencing scrapes are dropped (a partitioned table's
+    unique keys must include the partition key), and the primary key becomes (id, timestamp), which
+    makes `timestamp` NOT NULL: rows without one get 1970-01-01 first, landing in the default
+    partition. The foreign keys of scrapes itself (url_id, known_issue_id) are re-created on the
+    partitioned table. Does nothing on other databases or once partitioned.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    now = now or datetime.now()
+    with engine.begin() as connection:
+        if is_partitioned(connection):
+            return
+        logger.info("Partitioning the scrapes table by month")
+        connection.execute(text("LOCK TABLE scrapes IN ACCESS EXCLUSIVE MODE"))
+        foreign_keys = connection.execute(
+            text(
+                "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+                "WHERE contype = 'f' AND confrelid = 'scrapes'::regclass"
+            )
+        ).all()
+        for table, constraint in foreign_keys:
+            logger.info(f"Dropping foreign key {constraint} of {table}, which references scrapes")
+            connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+        oldest = connection.execute(text('SELECT min("timestamp") FROM scrapes')).scalar()
+        # These land in the default partition
+        missing = connection.execute(
+            text('UPDATE scrapes SET "timestamp" = \'1970-01-01\' WHERE "timestamp" IS NULL')
+        ).rowcount
+        if missing:
+            logger.warning(f"Set the timestamp of {missing} scrapes without one to 1970-01-01")
+
+        connection.execute(text(f"ALTER TABLE scrapes RENAME TO {UNPARTITIONED_TABLE}"))
+        connection.execute(
+            text(
+                f"CREATE TABLE scrapes (LIKE {UNPARTITIONED_TABLE} INCLUDING DEFAULTS) "
+                'PARTITION BY RANGE ("timestamp")'
+            )
+        )
+        connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF scrapes DEFAULT"))
+        month = month_start(min(oldest, now) if oldest else now)
+        while month <= add_months(month_start(now), SCRAPE_PARTITION_MONTHS_AHEAD):
+            create_partition(connection, month)
+            month = add_months(month, 1)
+        copied = connection.execute(
+            text(f"INSERT INTO scrapes SELECT * FROM {UNPARTITIONED_TABLE}")
+        ).rowcount
+
+        # The ID sequence belongs to the old table's column and would be dropped with it
+        connection.execute(text("ALTER SEQUENCE IF EXISTS scrapes_id_seq OWNED BY NONE"))
+        connection.execute(text(f"DROP TABLE {UNPARTITIONED_TABLE}"))
+        connection.execute(text("ALTER SEQUENCE IF EXISTS scrapes_id_seq OWNED BY scrapes.id"))
+        connection.execute(text('ALTER TABLE scrapes ALTER COLUMN "timestamp" SET NOT NULL'))
+        connection.execute(text('ALTER TABLE scrapes ADD PRIMARY KEY (id, "timestamp")'))
+        # LIKE copies neither; partitioned tables may reference other tables
+        for constraint in scrapes.foreign_key_constraints:
+            connection.execute(AddConstraint(constraint))
+        for index in scrapes.indexes:
+            index.create(connection)
+        logger.info(f"Copied {copied} scrapes into monthly partitions")
+
+
+def ensure_partitions(engine: Engine, now: datetime = None):
+    """
+    Create the partitions of the current month and the next SCRAPE_PARTITION_MONTHS_AHEAD months.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    month = month_start(now or datetime.now())
+    for _ in range(SCRAPE_PARTITION_MONTHS_AHEAD + 1):
+        try:
+            with engine.begin() as connection:
+                create_partition(connection, month)
+        except Exception as e:
+            # e.g. rows of that month already landed in the default partition
+            logger.error(f"Could not create partition {partition_name(month)}: {e}")
+        month = add_months(month, 1)
+
+
+def kept_on_archival():
+    """
+    Scrapes kept in the database when their month is archived: the latest scrape of each URL and of
+    each known issue, which duplicate detection and /latest compare new scrapes with, and flagged
+    scrapes, which are still being triaged.
+    """
+    newer = scrapes.alias("newer")
+    return or_(
+        scrapes.c.create_alert.is_(True),
+        scrapes.c.id.in_(
+            select(KnownIssue.latest_scrape_id).where(KnownIssue.latest_scrape_id.isnot(None))
+        ),
+        ~exists().where(
+            newer.c.url_id == scrapes.c.url_id, newer.c.timestamp > scrapes.c.timestamp
+        ),
+    )
+
+
+def write_parquet(frame: pd.DataFrame, path: Path):
+    """
+    Write `frame` to `path` as zstd-compressed Parquet, replacing the file only once it is complete.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".parquet.partial")
+    frame.to_parquet(partial, compression="zstd", index=False)
+    if pq.read_metadata(partial).num_rows != len(frame):
+        raise IOError(f"Archive {partial} is incomplete")
+    os.replace(partial, path)
+
+
+def publish_archived(engine: Engine, url_ids: list[int]):
+    """
+    Publish a `scrape.archived` dashboard event per URL whose scrapes were archived, like new
+    scrapes are, so every replica drops its cached responses for them and dashboards refetch.
+    """
+    with Session(engine) as db:
+        for url_id in url_ids:
+            notify_dashboard(db, "scrape.archived", url_id, [])
+        db.commit()
+
+
+def archive_old_scrapes(
+    engine: Engine,
+    archive_dir: str = SCRAPE_ARCHIVE_DIR,
+    retention_months: int = SCRAPE_RETENTION_MONTHS,
+    now: datetime = None,
+) -> list[Path]:
+    """
+    Move the scrapes of months older than `retention_months` to one Parquet file per month.
+
+    Each month is written to `archive_dir`/scrapes-YYYY-MM.parquet before it is removed. On
+    PostgreSQL the month's partition is detached and dropped, which costs no vacuum, and the
+    scrapes `kept_on_archival` are re-inserted, landing in the default partition. On other
+    databases the rows are deleted, and months already archived are skipped. Each archived month is
+    published with `publish_archived`.
+
+    Returns:
+        list[Path]: The archive files written.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now or datetime.now()), -retention_months)
+    postgres = engine.dialect.name == "postgresql"
+    with engine.connect() as connection:
+        if postgres:
+            months = [month for month in partition_months(connection) if add_months(month, 1) <= cutoff]
+        else:
+            timestamps = connection.execute(
+                select(scrapes.c.timestamp).where(scrapes.c.timestamp < cutoff)
+            ).scalars()
+            months = sorted({month_start(timestamp) for timestamp in timestamps})
+
+    written = []
+    for month in months:
+        path = archive_path(archive_dir, month)
+        if not postgres and path.exists():
+            continue
+        in_month = and_(scrapes.c.timestamp >= month, scrapes.c.timestamp < add_months(month, 1))
+        with engine.begin() as connection:
+            frame = pd.read_sql(select(scrapes).where(in_month), connection)
+            write_parquet(frame, path)
+            if postgres:
+                kept = connection.execute(select(scrapes).where(in_month, kept_on_archival())).mappings().all()
+                connection.execute(text(f"ALTER TABLE scrapes DETACH PARTITION {partition_name(month)}"))
+                connection.execute(text(f"DROP TABLE {partition_name(month)}"))
+                if kept:
+                    connection.execute(insert(scrapes), [dict(row) for row in kept])
+                kept = len(kept)
+            else:
+                deleted = connection.execute(delete(scrapes).where(in_month, ~kept_on_archival()))
+                kept = len(frame) - deleted.rowcount
+        logger.info(f"Archived {len(frame)} scrapes of {month:%Y-%m} to {path}, kept {kept} in the database")
+        publish_archived(engine, sorted(int(url_id) for url_id in frame["url_id"].dropna().unique()))
+        written.append(path)
+    return written
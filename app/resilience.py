@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlparse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a host whose circuit breaker is open.
+
+    Attributes:
+        host (str): The host that is failing fast.
+        retry_in (float): Seconds until the breaker lets a trial call through.
+    """
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host}; retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Attempt n (0-based) sleeps a random duration between 0 and min(max_delay, base_delay * multiplier**n)
+    before the next attempt, so callers that failed together do not retry in lockstep.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        multiplier: float = 2.0,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self._sleep = sleep
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * self.multiplier**attempt)
+        )
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        is_retryable: Callable[[Exception], bool],
+        retry_after: Callable[[Exception], Optional[float]] = lambda e: None,
+    ) -> Any:
+        """
+        Call `fn` until it succeeds, a non-retryable error is raised, or attempts run out.
+
+        Parameters:
+            fn: Coroutine function performing one attempt.
+            is_retryable: Decides whether an exception from an attempt is worth retrying.
+            retry_after: Optional server-requested delay for an exception, used as a lower bound on the
+                backoff. A request to wait longer than `max_delay` is not waited out: the error is
+                raised at once, so callers don't hold a request (or a slot) for as long as a server asks.
+
+        Returns:
+            The result of the first successful attempt.
+
+        Raises:
+            Exception: The last attempt's exception, the first non-retryable one, or one asking
+                to be retried after more than `max_delay`.
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable(e):
+                    raise
+                requested = retry_after(e) or 0
+                if requested > self.max_delay:
+                    logger.warning(
+                        f"Attempt {attempt + 1}/{self.max_attempts} failed ({e}); not retrying, "
+                        f"Retry-After of {requested:.0f}s exceeds {self.max_delay:.0f}s"
+                    )
+                    raise
+                delay = max(self.backoff(attempt), requested)
+                logger.warning(
+                    f"Attempt {attempt + 1}/{self.max_attempts} failed ({e}); retrying in {delay:.1f}s"
+                )
+                await self._sleep(delay)
+
+
+class HostRateLimiter:
+    """
+    Space out requests to each host so that no host sees more than one request per `min_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._next_allowed: dict[str, float] = {}
+
+    async def acquire(self, host: str):
+        now = self._clock()
+        # Reserve the next free slot before sleeping so concurrent callers queue up behind each other.
+        slot = max(now, self._next_allowed.get(host, now))
+        self._next_allowed[host] = slot + self.min_interval
+        if slot > now:
+            await self._sleep(slot - now)
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    Closed: calls go through and consecutive failures are counted. After `failure_threshold`
+    consecutive failures the breaker opens and calls fail fast with CircuitOpenError. Once
+    `reset_timeout` seconds have passed it lets a single trial call through (half-open); success
+    closes it, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == self.OPEN
+            and self._clock() - self._opened_at >= self.reset_timeout
+        ):
+            return self.HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with a trial call already in flight.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        retry_in = max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+        raise CircuitOpenError(self.host, retry_in)
+
+    def record_success(self):
+        if self._state != self.CLOSED:
+            logger.info(f"Circuit for {self.host} closed")
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def release_trial(self):
+        """
+        Give back a half-open trial slot without recording an outcome.
+        """
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial_in_flight or self._failures >= self.failure_threshold:
+            logger.warning(
+                f"Circuit for {self.host} opened after {self._failures} consecutive failures"
+            )
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+class HostCircuitBreakers:
+    """
+    Registry handing out one CircuitBreaker per host.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def for_host(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+            self._breakers[host] = breaker
+        return breaker
+
+    def states(self) -> dict[str, str]:
+        return {host: breaker.state for host, breaker in self._breakers.items()}
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
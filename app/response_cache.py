@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from fastapi import Request, Response
+from app.serialization import choose_encoding, compress
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+# Invalidation tags: the URL list, and the flagged scrapes of all URLs
+URLS_TAG = "urls"
+FLAGGED_TAG = "flagged"
+
+
+def url_tag(url_id: int) -> str:
+    """
+    Tag of responses built from one URL's scrapes, e.g. /scrapes/urlid/{id} and /latest.
+    """
+    return f"url:{url_id}"
+
+
+def etag_for(body: bytes) -> str:
+    """
+    Strong ETag of a response body.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`, using the weak comparison RFC 9110 prescribes
+    for this header.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Serialized responses of read endpoints, with strong ETags, invalidated by tag.
+
+    Each entry carries tags naming the data it was built from. Writes invalidate tags by bumping
+    their generation, which drops matching entries; a response whose tags were invalidated while it
+    was being built is returned but not stored, so a slow read never caches data older than a write.
+    The least recently used entry is evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[bytes, str, frozenset, dict]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._epoch = 0
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key_for(request: Request) -> tuple:
+        return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+    def _snapshot(self, tags: Iterable[str]) -> tuple:
+        return self._epoch, tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def invalidate(self, *tags: str):
+        """
+        Drop the entries carrying any of `tags`, or every entry if none are given.
+        """
+        with self._lock:
+            if not tags:
+                self._epoch += 1
+                self._entries.clear()
+                return
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            dropped = set(tags)
+            for key in [key for key, entry in self._entries.items() if entry[2] & dropped]:
+                del self._entries[key]
+
+    def respond(
+        self,
+        request: Request,
+        tags: Iterable[str],
+        build: Callable[[], bytes],
+        media_type: str = "application/json",
+    ) -> Response:
+        """
+        Serve `request` from the cache, calling `build` for the serialized body on a miss.
+
+        A request whose If-None-Match matches the current ETag gets an empty 304, and a cached one
+        costs no database access at all. Bodies are compressed as the client's Accept-Encoding
+        allows.
+
+        Parameters:
+            request (Request): The incoming request; its path and query parameters are the cache key.
+            tags (Iterable[str]): What the response is built from, for invalidation.
+            build (Callable[[], bytes]): Produces the response body.
+        """
+        tags = tuple(tags)
+        key = self.key_for(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                snapshot = self._snapshot(tags)
+
+        if entry is None:
+            body = build()
+            entry = (body, etag_for(body), frozenset(tags), {})
+            with self._lock:
+                if self._snapshot(tags) == snapshot:
+                    self._entries[key] = entry
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        body, etag, _, encoded = entry
+
+        # Each content coding is a separate representation with its own strong ETag, compressed
+        # once per cache entry
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        encoding = choose_encoding(request.headers.get("accept-encoding"), len(body))
+        if encoding is not None:
+            if encoding not in encoded:
+                encoded[encoding] = compress(body, encoding)
+            body = encoded[encoding]
+            etag = f'{etag[:-1]}-{encoding}"'
+            headers["Content-Encoding"] = encoding
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def on_dashboard_event(self, payload: Optional[str]):
+        """
+        DASHBOARD_CHANNEL listener: new scrapes and triage updates invalidate their URL and the
+        flagged list. None (missed events) clears everything.
+        """
+        if payload is None:
+            self.invalidate()
+            return
+        try:
+            url_id = json.loads(payload)["url_id"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            self.invalidate()
+            return
+        self.invalidate(url_tag(url_id), FLAGGED_TAG)
+
+    def on_url_event(self, payload: Optional[str]):
+        """
+        URL_CHANNEL listener: any created URL changes the URL list.
+        """
+        if payload is None:
+            self.invalidate()
+        else:
+            self.invalidate(URLS_TAG)
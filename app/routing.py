@@ -0,0 +1,200 @@
+import json
+import logging
+import re
+from collections import defaultdict
+
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import URL as URLModel, Scrape as ScrapeModel, Subscription
+from app.notifications import DEFAULT_RECIPIENTS, process_url_for_title
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+KB_PATTERN = re.compile(r"\bKB\s?(\d{6,8})\b", re.IGNORECASE)
+
+
+def normalize_product(name: str) -> str:
+    """
+    Normalize a product name so "Windows 11 23H2", "windows-11-23h2" and "status-windows-11-23H2" agree.
+    """
+    name = re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+    return re.sub(r"^status ", "", name)
+
+
+def normalize_kb(kb: str) -> str:
+    return "KB" + re.sub(r"\D", "", kb)
+
+
+def issue_terms(status: str) -> set[str]:
+    return set(re.findall(r"[a-z0-9]+", status.lower()))
+
+
+def issue_kbs(row: dict) -> set[str]:
+    text = f"{row.get('Originating update', '')} {row.get('Status', '')}"
+    return {f"KB{number}" for number in KB_PATTERN.findall(text)}
+
+
+class SubscriptionIndex:
+    """
+    Inverted index from product, status term and KB number to subscription IDs.
+
+    Each dimension keeps a posting list per value plus the set of subscriptions that do not filter
+    on that dimension. Matching an issue starts from the product posting list (the most selective
+    dimension) and filters those candidates against the other two, so the cost grows with the
+    number of candidate subscriptions for the issue's product rather than with the total number
+    of subscriptions.
+    """
+
+    def __init__(self):
+        self._emails: dict[int, str] = {}
+        self._by_product = defaultdict(set)
+        self._any_product: set[int] = set()
+        self._by_term = defaultdict(set)
+        self._any_term: set[int] = set()
+        # Each subscription's status keywords, as the sets of words that must all be in the status
+        self._keywords: dict[int, list[frozenset[str]]] = {}
+        self._by_kb = defaultdict(set)
+        self._any_kb: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    def add(
+        self,
+        subscription_id: int,
+        email: str,
+        products: list[str] = (),
+        status_keywords: list[str] = (),
+        kb_numbers: list[str] = (),
+    ):
+        self._emails[subscription_id] = email
+        self._post(
+            self._by_product,
+            self._any_product,
+            subscription_id,
+            [normalize_product(product) for product in products],
+        )
+        keywords = [frozenset(issue_terms(keyword)) for keyword in status_keywords]
+        keywords = [keyword for keyword in keywords if keyword]
+        self._keywords[subscription_id] = keywords
+        # Posted under one word of each keyword; candidates are then checked for the rest.
+        self._post(
+            self._by_term,
+            self._any_term,
+            subscription_id,
+            [min(keyword) for keyword in keywords],
+        )
+        self._post(
+            self._by_kb,
+            self._any_kb,
+            subscription_id,
+            [normalize_kb(kb) for kb in kb_numbers],
+        )
+
+    @staticmethod
+    def _post(index: dict, any_set: set, subscription_id: int, values):
+        values = [value for value in values if value]
+        if not values:
+            any_set.add(subscription_id)
+        for value in values:
+            index[value].add(subscription_id)
+
+    def match(self, product: str, status: str, kbs: set[str]) -> set[str]:
+        """
+        Return the email addresses whose subscriptions match an issue.
+
+        A subscription matches when every dimension it filters on matches: the product is one of
+        its products, every word of any of its status keywords is a word of the status (so
+        "mitigated external" matches "Mitigated External"), and any of its KB numbers appears in the
+        issue's originating update or status.
+        """
+        candidates = (
+            self._by_product.get(normalize_product(product), set())
+            | self._any_product
+        )
+        if not candidates:
+            return set()
+
+        terms = issue_terms(status)
+        term_hits = {
+            sid
+            for sid in set().union(*(self._by_term.get(term, ()) for term in terms))
+            if any(keyword <= terms for keyword in self._keywords[sid])
+        }
+        kb_hits = set().union(*(self._by_kb.get(kb, ()) for kb in kbs))
+        return {
+            self._emails[sid]
+            for sid in candidates
+            if (sid in self._any_term or sid in term_hits)
+            and (sid in self._any_kb or sid in kb_hits)
+        }
+
+
+def build_subscription_index(db: Session) -> SubscriptionIndex:
+    index = SubscriptionIndex()
+    subscriptions = db.execute(
+        select(Subscription).filter(Subscription.active.is_(True))
+    ).scalars()
+    for subscription in subscriptions:
+        index.add(
+            subscription.id,
+            subscription.email,
+            json.loads(subscription.products or "[]"),
+            json.loads(subscription.status_keywords or "[]"),
+            json.loads(subscription.kb_numbers or "[]"),
+        )
+    logger.info(f"Subscription index built with {len(index)} subscriptions")
+    return index
+
+
+class SubscriptionRouter:
+    """
+    Holds the current subscription index and routes new scrapes to recipients.
+
+    With no active subscriptions at all, everything goes to NOTIFY_DEFAULT_RECIPIENTS.
+
+    Writes to subscriptions publish a SUBSCRIPTION_CHANNEL event; registered with `add_listener`,
+    `on_subscription_event` rebuilds the index in every replica.
+    """
+
+    def __init__(self, session_factory: sessionmaker = None):
+        self.session_factory = session_factory
+        self.index = SubscriptionIndex()
+
+    def rebuild(self, db: Session):
+        self.index = build_subscription_index(db)
+
+    def on_subscription_event(self, payload: str | None):
+        """
+        Rebuild the index after subscriptions changed, or after the PostgreSQL listener reconnected.
+        """
+        with self.session_factory() as db:
+            self.rebuild(db)
+
+    def route(
+        self, db_url: URLModel, new_scrapes: list[ScrapeModel]
+    ) -> dict[str, list[ScrapeModel]]:
+        """
+        Group a URL's new scrapes by the recipients they should be sent to.
+
+        Returns:
+            dict[str, list[ScrapeModel]]: Email address to the scrapes that match its subscriptions.
+        """
+        if not len(self.index):
+            return {recipient: list(new_scrapes) for recipient in DEFAULT_RECIPIENTS}
+
+        product = process_url_for_title(db_url.url)
+        routed = defaultdict(list)
+        for scrape in new_scrapes:
+            try:
+                row = json.loads(scrape.content)["known_issues"]["row"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                row = {}
+            recipients = self.index.match(
+                product, row.get("Status", ""), issue_kbs(row)
+            )
+            for email in recipients:
+                routed[email].append(scrape)
+        return routed
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl, field_validator
 from datetime import datetime
 from typing import Optional
+import json
 
 print("Schemas module loaded successfully")
 
@@ -18,6 +19,16 @@ class URL(URLBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class URLImport(BaseModel):
+    urls: list[str] = Field(min_length=1, max_length=20000)
+
+
+class URLImportResult(BaseModel):
+    created: int
+    skipped: int
+    invalid: list[str] = []
+
+
 class ScrapeBase(BaseModel):
     timestamp: datetime
     content: str
@@ -34,6 +45,8 @@ class ScrapeCreate(ScrapeBase):
 class Scrape(ScrapeBase):
     id: int
     url_id: int
+    cluster_id: Optional[int] = None
+    known_issue_id: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -48,6 +61,54 @@ class ScrapeUpdate(BaseModel):
     hash: Optional[str] = None
 
 
+class BulkScrapeUpdate(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=1000)
+    update: ScrapeUpdate
+
+
+class BulkScrapeUpdateItem(BaseModel):
+    id: int
+    updated: bool
+    detail: Optional[str] = None
+
+
+class BulkScrapeUpdateResult(BaseModel):
+    updated: int
+    results: list[BulkScrapeUpdateItem]
+
+
+class KnownIssue(BaseModel):
+    id: int
+    url_id: int
+    title: Optional[str] = None
+    status: Optional[str] = None
+    first_seen: datetime
+    last_seen: datetime
+    latest_scrape_id: Optional[int] = None
+    details: Optional[dict] = None
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("details", mode="before")
+    @classmethod
+    def parse_details(cls, value):
+        # Stored as a JSON string on the model
+        return json.loads(value) if isinstance(value, str) else value
+
+
+class ClusterProduct(BaseModel):
+    url_id: int
+    url: str
+    scrape_id: int
+
+
+class IssueCluster(BaseModel):
+    cluster_id: int
+    summary: str
+    status: Optional[str] = None
+    last_seen: datetime
+    products: list[ClusterProduct]
+
+
 class ChangeBase(BaseModel):
     change_type: str
     details: str
@@ -56,9 +117,75 @@ class ChangeBase(BaseModel):
 class Change(ChangeBase):
     id: int
     scrape_id: int
+    known_issue_id: Optional[int] = None
+    previous_scrape_id: Optional[int] = None
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+    created_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
 
+class Feed(BaseModel):
+    scrapes: list[Scrape]
+    changes: list[Change]
+    cursor: str
+    has_more: bool
+
+
+class SubscriptionBase(BaseModel):
+    email: str
+    team: Optional[str] = None
+    products: list[str] = []
+    status_keywords: list[str] = []
+    kb_numbers: list[str] = []
+    active: bool = True
+
+
+class SubscriptionCreate(SubscriptionBase):
+    pass
+
+
+class Subscription(SubscriptionBase):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("products", "status_keywords", "kb_numbers", mode="before")
+    @classmethod
+    def parse_json_list(cls, value):
+        # Stored as JSON strings on the model
+        return json.loads(value) if isinstance(value, str) else value
+
+
+class WebhookBase(BaseModel):
+    url: str
+    max_concurrency: int = Field(4, ge=1, le=64)
+    active: bool = True
+
+
+class WebhookCreate(WebhookBase):
+    url: HttpUrl
+    # Generated when omitted
+    secret: Optional[str] = None
+
+    @field_validator("url")
+    @classmethod
+    def require_https(cls, value: HttpUrl):
+        # Deliveries are POSTed from the server; the host is checked by webhooks.check_receiver_host
+        if value.scheme != "https":
+            raise ValueError("Webhook URLs must use https")
+        return value
+
+
+class Webhook(WebhookBase):
+    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+
+class WebhookCreated(Webhook):
+    # Only returned once, when the webhook is registered
+    secret: str
+
+
 # Add a test function to verify schema creation
 # def test_schemas():
 #     test_url = URL(
@@ -1,6 +1,8 @@
 # from playwright.sync_api import sync_playwright
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Error as PlaywrightError
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
 import json
 from sqlalchemy import text, func, DateTime
 
@@ -12,41 +14,378 @@ from app import schemas
 from app.models import URL as URLModel, Scrape as ScrapeModel
 from app.schemas import URLBase as URLSchema, Scrape as ScrapeSchema
 from app.database import SessionLocal, get_db
+from app.url_repository import URLRepository
+from app.html_archive import HTML_HASH_KEY, HTMLArchive
 
 from datetime import datetime, timezone, timedelta
 import time
 import re
 import asyncio
 import logging
+import os
 
 # from playwright.async_api import async_playwright
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-phase and per-run time budgets, in seconds.
+NAVIGATION_TIMEOUT = float(os.getenv("SCRAPE_NAVIGATION_TIMEOUT", "30"))
+CONTENT_TIMEOUT = float(os.getenv("SCRAPE_CONTENT_TIMEOUT", "15"))
+PARSE_TIMEOUT = float(os.getenv("SCRAPE_PARSE_TIMEOUT", "10"))
+RUN_DEADLINE = float(os.getenv("SCRAPE_RUN_DEADLINE", "1800"))
+
+
+class ScrapeTimeoutError(Exception):
+    """
+    Raised when a scrape exceeds its time budget.
+
+    Attributes:
+        url (str): The URL being scraped.
+        phase (str): Where the budget ran out: "navigation", "content", "parse" or "run_deadline".
+    """
+
+    def __init__(self, url: str, phase: str):
+        super().__init__(f"Timed out during {phase} for {url}")
+        self.url = url
+        self.phase = phase
+
+
+class ScrapeHTTPError(Exception):
+    """
+    Raised when a page responds with a throttling or server error status.
+
+    Attributes:
+        url (str): The URL being scraped.
+        status (int): The HTTP status code.
+        retry_after (float | None): Seconds requested by a Retry-After header, if any.
+    """
+
+    def __init__(self, url: str, status: int, retry_after: float | None = None):
+        super().__init__(f"HTTP {status} from {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+def is_transient_scrape_error(error: Exception) -> bool:
+    """
+    Decide whether a failed scrape is worth retrying: throttling, server errors, connection and
+    timeout errors, the browser's network errors, and navigation or content timeouts. Parse
+    timeouts are not, as the same HTML would be parsed again; nor are permanent failures such as a
+    missing browser or a permission error.
+    """
+    if isinstance(error, ScrapeTimeoutError):
+        return error.phase in ("navigation", "content")
+    if isinstance(error, PlaywrightTimeoutError):
+        return True
+    if isinstance(error, PlaywrightError):
+        return "net::ERR_" in str(error)
+    return isinstance(error, (ScrapeHTTPError, ConnectionError, TimeoutError))
+
+
+def retry_after_of(error: Exception) -> float | None:
+    return getattr(error, "retry_after", None)
+
+
+class ScrapeRunReport:
+    """
+    Outcome of one scrape run, recording which URLs succeeded, failed or timed out and where.
+    """
+
+    def __init__(self):
+        self.run_id = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.succeeded: list[str] = []
+        self.failed: dict[str, str] = {}
+        self.timed_out: dict[str, str] = {}
+
+    def record_success(self, url: str):
+        self.succeeded.append(url)
+
+    def record_failure(self, url: str, error: Exception):
+        self.failed[url] = str(error)
+
+    def record_timeout(self, url: str, phase: str):
+        self.timed_out[url] = phase
+
+    def finish(self):
+        self.finished_at = datetime.now(timezone.utc)
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+        }
+
+    def summary(self) -> str:
+        lines = [
+            f"Scrape run: {len(self.succeeded)} succeeded, {len(self.failed)} failed, "
+            f"{len(self.timed_out)} timed out"
+        ]
+        for url, phase in self.timed_out.items():
+            lines.append(f"  timed out during {phase}: {url}")
+        for url, error in self.failed.items():
+            lines.append(f"  failed: {url}: {error}")
+        return "\n".join(lines)
+
 
 async def scrape_url_async(url: str):
+    """
+    Fetch the rendered HTML of a page with Playwright, bounded by the navigation and content timeouts.
+
+    The browser is closed in all cases, including when the surrounding task is cancelled.
+
+    Raises:
+        ScrapeTimeoutError: If navigation or reading the page content exceeds its budget.
+        ScrapeHTTPError: If the page responds with 429 or a 5xx status.
+    """
     print(f"Starting to scrape URL: {url}")
     async with async_playwright() as p:
         browser = await p.chromium.launch()
-        page = await browser.new_page()
-        await page.goto(url)
-        content = await page.content()
-        await browser.close()
-    return content
+        try:
+            page = await browser.new_page()
+            return await fetch_page(page, url)
+        finally:
+            await browser.close()
+
+
+async def fetch_page(page, url: str) -> str:
+    """
+    Navigate an open page to `url` and read its HTML, each phase bounded by its timeout.
+
+    Raises:
+        ScrapeTimeoutError: If navigation or reading the page content exceeds its budget.
+        ScrapeHTTPError: If the page responds with 429 or a 5xx status.
+    """
+    try:
+        response = await asyncio.wait_for(
+            page.goto(url, timeout=NAVIGATION_TIMEOUT * 1000),
+            NAVIGATION_TIMEOUT,
+        )
+    except (asyncio.TimeoutError, PlaywrightTimeoutError):
+        raise ScrapeTimeoutError(url, "navigation")
+    if response is not None and (
+        response.status == 429 or response.status >= 500
+    ):
+        retry_after = response.headers.get("retry-after")
+        raise ScrapeHTTPError(
+            url,
+            response.status,
+            float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+    try:
+        return await asyncio.wait_for(page.content(), CONTENT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ScrapeTimeoutError(url, "content")
 
 
 async def scrape_url(
     url_data: URLSchema,
     db: Session = None,
     enable_deep_scrape: bool = False,
+    archive: HTMLArchive = None,
 ) -> dict:
+    """
+    Fetch and parse a status page.
+
+    Parameters:
+        url_data (URLSchema): The URL to scrape.
+        enable_deep_scrape (bool): Whether to extract every known-issue row.
+        archive (HTMLArchive, optional): Where to keep the fetched HTML, so it can be parsed again
+            later; its hash is returned under HTML_HASH_KEY. A failure to archive is logged, not raised.
+
+    Returns:
+        dict: The scraped data, as returned by `parse_scraped_content`.
+    """
     logger.info(
         f"Starting scrape for URL: {url_data}, Deep scrape: {enable_deep_scrape}"
     )
     url = url_data.url
     content = await scrape_url_async(url)
 
+    digest = None
+    if archive is not None:
+        try:
+            digest = await asyncio.to_thread(archive.put, content)
+        except OSError as e:
+            logger.error(f"Could not archive the HTML of {url}: {e}")
+
+    # BeautifulSoup is CPU-bound, so parse off the event loop. A timed-out parse is abandoned,
+    # not interrupted: the worker thread finishes on its own.
+    try:
+        scraped_data = await asyncio.wait_for(
+            asyncio.to_thread(parse_scraped_content, content, enable_deep_scrape),
+            PARSE_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        raise ScrapeTimeoutError(url, "parse")
+    if digest is not None:
+        scraped_data[HTML_HASH_KEY] = digest
+    return scraped_data
+
+
+# Key of a known-issue row's parsed "Issue details" section. It is not part of the stored scrape
+# content or its fingerprint (see app.main.process_scraped_data) but kept on the known issue.
+ISSUE_DETAILS_KEY = "Details"
+
+# Labels that open a part of an issue details section, and the keys they are extracted to. Text
+# under "Next steps" is kept out of every field; Status, Originating update and History lines are
+# the issue's metadata, repeated from the summary table, and are skipped.
+DETAIL_LABELS = {
+    "affected platforms": "affected_platforms",
+    "workaround": "workaround",
+    "resolution": "resolution",
+    "next steps": None,
+}
+METADATA_LABELS = {"status", "originating update", "history"}
+DETAIL_LABEL_PATTERN = re.compile(
+    r"^\s*(" + "|".join(sorted(DETAIL_LABELS.keys() | METADATA_LABELS)) + r")\s*:\s*", re.IGNORECASE
+)
+# Elements that start a new line of text in an issue details section
+BLOCK_TAGS = {"p", "div", "ul", "ol", "li", "table", "h3", "h4", "h5", "h6", "blockquote"}
+# Ids of the anchors issue details sections start at, e.g. "3204msgdesc"
+MSGDESC_ID = re.compile(r"msgdesc$")
+KB_PATTERN = re.compile(r"\bKB\s?(\d{6,7})\b", re.IGNORECASE)
+KB_LINK_PATTERN = re.compile(r"support\.microsoft\.com/.*?help/(\d{6,7})", re.IGNORECASE)
+
+
+def _detail_line(nodes: list) -> tuple | None:
+    """
+    The (text, links, is_heading) of a line of an issue details section, or None if it is blank.
+    A line made of bold text only, such as the issue's title, is a heading.
+    """
+    nodes = [node for node in nodes if isinstance(node, Tag) or node.strip()]
+    text = " ".join("".join(node.get_text() if isinstance(node, Tag) else node for node in nodes).split())
+    if not text:
+        return None
+    links = [
+        link
+        for node in nodes
+        if isinstance(node, Tag)
+        for link in ([node] if node.name == "a" else node.find_all("a"))
+        if link.has_attr("href")
+    ]
+    is_heading = len(nodes) == 1 and nodes[0].name in ("b", "strong") and not text.endswith(":")
+    return text, links, is_heading
+
+
+def _detail_lines(element) -> list[tuple]:
+    """
+    Split an issue details section into lines, in page order. A line ends at a block element or
+    <br>: pages use both <p> and <div> blocks, and put either list items or <br>-separated lines
+    under a label. Nested tables, which hold the issue's status and history, are skipped.
+    """
+    lines, nodes = [], []
+    for child in element.children:
+        if isinstance(child, Tag) and child.name in BLOCK_TAGS | {"br"}:
+            lines.append(_detail_line(nodes))
+            nodes = []
+            if child.name not in ("table", "br"):
+                lines.extend(_detail_lines(child))
+        elif isinstance(child, (Tag, NavigableString)) and not isinstance(child, Comment):
+            nodes.append(child)
+    lines.append(_detail_line(nodes))
+    return [line for line in lines if line is not None]
+
+
+def parse_affected_platforms(items: list[str]) -> dict[str, list[str]]:
+    """
+    Split lines such as "Client: Windows 11, version 23H2; Windows 10, version 22H2" and
+    "Server: None" into platform lists per kind.
+    """
+    platforms = {}
+    for item in items:
+        kind, separator, names = item.partition(":")
+        if not separator:
+            kind, names = "Other", item
+        platforms[kind.strip()] = [
+            name.strip() for name in names.split(";") if name.strip() and name.strip().lower() != "none"
+        ]
+    return platforms
+
+
+def issue_details_section(target):
+    """
+    The element holding the issue details section an anchor target starts: the table cell it is or
+    sits in, else its parent. None when that element also holds another issue's anchor, as its
+    text couldn't be told apart from the other issue's.
+    """
+    section = target if target.name == "td" else target.find_parent("td") or target.parent
+    if section is None or any(other is not target for other in section.find_all(id=MSGDESC_ID)):
+        return None
+    return section
+
+
+def extract_issue_details(section) -> dict:
+    """
+    Parse one issue's section under "Issue details": its description, affected platforms,
+    workaround, resolution and the KB the resolution points to.
+
+    Parameters:
+        section: The element containing the section, e.g. the table cell around its anchor.
+
+    Returns:
+        dict: The fields found; a missing description, workaround or resolution is None and
+            missing affected platforms are empty.
+    """
+    parts = {"description": [], "affected_platforms": [], "workaround": [], "resolution": [], None: []}
+    resolution_links = []
+    current = "description"
+    for text, links, is_heading in _detail_lines(section):
+        if is_heading:
+            continue
+        label = DETAIL_LABEL_PATTERN.match(text)
+        if label is not None:
+            name = label.group(1).lower()
+            if name in METADATA_LABELS:
+                continue
+            current = DETAIL_LABELS[name]
+            text = text[label.end():]
+        if text:
+            parts[current].append(text)
+        if current == "resolution":
+            resolution_links.extend(links)
+
+    details = {
+        "description": " ".join(parts["description"]) or None,
+        "affected_platforms": parse_affected_platforms(parts["affected_platforms"]),
+        "workaround": " ".join(parts["workaround"]) or None,
+        "resolution": " ".join(parts["resolution"]) or None,
+    }
+
+    resolution_kb = None
+    match = KB_PATTERN.search(details["resolution"] or "")
+    if match:
+        resolution_kb = f"KB{match.group(1)}"
+    else:
+        for link in resolution_links:
+            match = KB_LINK_PATTERN.search(link["href"])
+            if match:
+                resolution_kb = f"KB{match.group(1)}"
+                break
+    details["resolution_kb"] = resolution_kb
+    return details
+
+
+def parse_scraped_content(content: str, enable_deep_scrape: bool = False) -> dict:
+    """
+    Extract the known-issues table from a status page's HTML, and for each row its section under
+    "Issue details", which the row's summary links to, in the same parse.
+
+    Parameters:
+        content (str): The page HTML.
+        enable_deep_scrape (bool): Whether to extract every row instead of only the first.
+
+    Returns:
+        dict: The scraped data, with a "known_issues" entry when the table is present. Rows whose
+            details section was found carry it under ISSUE_DETAILS_KEY.
+    """
     soup = BeautifulSoup(content, "html.parser")
 
     scraped_data = {}
@@ -84,6 +423,11 @@ async def scrape_url(
                     else ""
                 ),
             }
+            anchor = row.select_one('td:nth-of-type(1) a[href^="#"]')
+            target = soup.find(id=anchor["href"][1:]) if anchor and len(anchor["href"]) > 1 else None
+            section = issue_details_section(target) if target is not None else None
+            if section is not None:
+                data[ISSUE_DETAILS_KEY] = {"anchor": target["id"], **extract_issue_details(section)}
             known_issues_data.append(data)
         scraped_data["known_issues"] = {
             "header": (
@@ -97,16 +441,16 @@ async def scrape_url(
     return scraped_data
 
 
-def get_latest_scrape(url: str, db: Session) -> dict:
+def get_latest_scrape(url: str, db: Session, url_repo: URLRepository) -> dict:
     print(f"Getting latest scrape for URL: {url}")
-    db_url = db.query(URLModel).filter(URLModel.url == url).first()
-    if not db_url:
+    url_id = url_repo.get_id(db, url)
+    if url_id is None:
         print("URL not found in database")
         return None
 
     latest_scrape = (
         db.query(ScrapeModel)
-        .filter(ScrapeModel.url_id == db_url.id)
+        .filter(ScrapeModel.url_id == url_id)
         .order_by(ScrapeModel.timestamp.desc())
         .first()
     )
@@ -0,0 +1,258 @@
+import gzip
+import logging
+import os
+from typing import Any, Iterable, Optional
+
+from fastapi import Request, Response
+from pydantic import ConfigDict, TypeAdapter, create_model
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent uncompressed; the headers would eat the gain
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+_adapters: dict[Any, TypeAdapter] = {}
+_sparse_schemas: dict[tuple, type] = {}
+
+
+def adapter_for(schema) -> TypeAdapter:
+    """
+    A cached TypeAdapter for `list[schema]`; building one compiles a validator, so it is done once.
+    """
+    if schema not in _adapters:
+        _adapters[schema] = TypeAdapter(list[schema])
+    return _adapters[schema]
+
+
+def columns_for(model, schema) -> list:
+    """
+    The table columns of `model` that `schema` has fields for, to select rows as plain mappings.
+
+    Validating mappings is several times faster than reading the same values off ORM instances.
+    """
+    table = model.__table__
+    return [table.c[name] for name in schema.model_fields if name in table.c]
+
+
+def sparse_schema(schema, fields: Optional[str], always: Iterable[str] = ("id",)):
+    """
+    `schema` restricted to a sparse fieldset, so that `columns_for` selects only those columns.
+
+    Parameters:
+        schema: The full response schema.
+        fields (str, optional): Comma-separated field names; empty or None means every field.
+        always (Iterable[str]): Fields included whether requested or not, e.g. the primary key.
+
+    Returns:
+        The full schema, or a cached model with the requested fields in the schema's field order.
+
+    Raises:
+        ValueError: If a requested field is not a field of `schema`.
+    """
+    requested = {name.strip() for name in (fields or "").split(",") if name.strip()}
+    if not requested:
+        return schema
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Available: {', '.join(schema.model_fields)}"
+        )
+    chosen = tuple(name for name in schema.model_fields if name in requested or name in always)
+    if chosen == tuple(schema.model_fields):
+        return schema
+    key = (schema, chosen)
+    if key not in _sparse_schemas:
+        _sparse_schemas[key] = create_model(
+            f"{schema.__name__}Fields",
+            __config__=ConfigDict(from_attributes=True),
+            **{name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in chosen},
+        )
+    return _sparse_schemas[key]
+
+
+def validate_many(schema, rows) -> list:
+    """
+    Validate rows (ORM objects or mappings) into `schema` instances in one call, instead of one
+    `model_validate` each.
+    """
+    return adapter_for(schema).validate_python(rows, from_attributes=True)
+
+
+def dump_many(schema, rows) -> bytes:
+    """
+    JSON body of `rows` as `list[schema]`, equal to what `response_model=list[schema]` renders, but
+    validated in bulk and encoded by pydantic-core in one pass.
+    """
+    adapter = adapter_for(schema)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> dict[str, float]:
+    """
+    Content codings in an Accept-Encoding header, with their q-values.
+    """
+    encodings = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        encodings[name.strip().lower()] = q
+    return encodings
+
+
+def choose_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+    """
+    The content coding to send a body of `size` bytes in: brotli if installed and accepted, else
+    gzip if accepted, else None for identity.
+    """
+    if size < COMPRESS_MIN_SIZE:
+        return None
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def encoded_response(
+    request: Request,
+    body: bytes,
+    media_type: str = "application/json",
+    headers: dict = None,
+    status_code: int = 200,
+) -> Response:
+    """
+    Response with `body` compressed in the coding the client prefers.
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding"), len(body))
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers, status_code=status_code)
+
+
+def list_response(request: Request, schema, rows) -> Response:
+    """
+    The fast path for list endpoints: bulk validation, fast encoding and negotiated compression.
+    """
+    return encoded_response(request, dump_many(schema, rows))
+
+
+def benchmark(rows: int = 10000, repeat: int = 5) -> dict[str, float]:
+    """
+    Time a `rows`-row scrape list through the default `response_model` path and through the fast
+    path, end to end over ASGI against an in-memory SQLite database.
+
+    Returns:
+        dict[str, float]: Best time in milliseconds per variant, and body sizes in bytes.
+    """
+    import json
+    import time
+    from datetime import datetime
+
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session, sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from app.database import Base
+    from app.models import URL, Scrape
+    from app.schemas import Scrape as ScrapeSchema
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    content = json.dumps(
+        {
+            "known_issues": {
+                "header": "Known issues",
+                "row": [
+                    {
+                        "Summary": "Devices might fail to start after installing this update. " * 6,
+                        "Originating update": "OS Build 22631.3007 | KB5034123 | 2024-01-09",
+                        "Status": "Confirmed",
+                        "Last updated": "2024-01-12 10:04 PT",
+                    }
+                ],
+            }
+        }
+    )
+    with factory() as db:
+        db.add(URL(id=1, url="https://example.com/status"))
+        db.execute(
+            Scrape.__table__.insert(),
+            [
+                {"url_id": 1, "timestamp": datetime(2024, 1, 1, n % 24), "content": content, "hash": f"{n:032x}"}
+                for n in range(rows)
+            ],
+        )
+        db.commit()
+
+    def get_session():
+        with factory() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/default", response_model=list[ScrapeSchema])
+    def default(db: Session = Depends(get_session)):
+        return db.execute(select(Scrape)).scalars().all()
+
+    @app.get("/fast")
+    def fast(request: Request, db: Session = Depends(get_session)):
+        return list_response(request, ScrapeSchema, db.execute(select(*columns_for(Scrape, ScrapeSchema))).mappings().all())
+
+    results = {}
+    with TestClient(app) as client:
+        for name, path, encoding in (
+            ("default", "/default", "identity"),
+            ("fast", "/fast", "identity"),
+            ("fast_gzip", "/fast", "gzip"),
+            ("fast_br", "/fast", "br"),
+        ):
+            if encoding == "br" and brotli is None:
+                continue
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(path, headers={"Accept-Encoding": encoding})
+                best = min(best, time.perf_counter() - started)
+            results[f"{name}_ms"] = round(best * 1000, 1)
+            results[f"{name}_bytes"] = int(response.headers["content-length"])
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in benchmark().items():
+        print(f"{name:>20}: {value}")
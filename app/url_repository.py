@@ -1,34 +1,271 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
+from app.database import insert_for
+from app.events import URL_CHANNEL, notify
 from app.models import URL
 
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Rows per INSERT statement, well below the bound-parameter limits of PostgreSQL and SQLite
+IMPORT_CHUNK_SIZE = 5000
+URL_CACHE_TTL = float(os.getenv("URL_CACHE_TTL", "300"))
+URL_CACHE_MAX_SIZE = int(os.getenv("URL_CACHE_MAX_SIZE", "10000"))
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7500
+
+
+def normalize_url(url: str) -> str | None:
+    """
+    Normalize a URL so trivially different spellings of the same page compare equal.
+
+    Surrounding whitespace is stripped, the scheme and host are lowercased, a default port is
+    dropped and an empty path becomes "/". Path, query and fragment are kept as given.
+
+    Returns:
+        str | None: The normalized URL, or None if it is not an absolute http(s) URL.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host if port is None or port == DEFAULT_PORTS[scheme] else f"{host}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
+
+
+class URLCache:
+    """
+    Bounded, thread-safe map between URL IDs and URL strings, in both directions.
+
+    Entries expire `ttl` seconds after they were stored, and the least recently used entry is
+    evicted once `max_size` is reached. Only URLs that exist are cached, so a miss always falls
+    through to the database and a URL created by another process is found on first use.
+    """
+
+    def __init__(
+        self,
+        ttl: float = URL_CACHE_TTL,
+        max_size: int = URL_CACHE_MAX_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._by_id: OrderedDict[int, tuple[str, float]] = OrderedDict()
+        self._by_url: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def _drop(self, url_id: int):
+        url, _ = self._by_id.pop(url_id)
+        if self._by_url.get(url) == url_id:
+            del self._by_url[url]
+
+    def _live(self, url_id: int) -> Optional[str]:
+        entry = self._by_id.get(url_id)
+        if entry is None:
+            return None
+        if entry[1] <= self._clock():
+            self._drop(url_id)
+            return None
+        self._by_id.move_to_end(url_id)
+        return entry[0]
+
+    def get_url(self, url_id: int) -> Optional[str]:
+        with self._lock:
+            return self._live(url_id)
+
+    def get_id(self, url: str) -> Optional[int]:
+        with self._lock:
+            url_id = self._by_url.get(url)
+            if url_id is None or self._live(url_id) is None:
+                return None
+            return url_id
+
+    def put(self, url_id: int, url: str):
+        with self._lock:
+            if url_id in self._by_id:
+                self._drop(url_id)
+            stale_id = self._by_url.get(url)
+            if stale_id is not None and stale_id in self._by_id:
+                self._drop(stale_id)
+            self._by_id[url_id] = (url, self._clock() + self.ttl)
+            self._by_url[url] = url_id
+            while len(self._by_id) > self.max_size:
+                self._drop(next(iter(self._by_id)))
+
+    def urls(self) -> set[str]:
+        """
+        The cached URLs that have not expired.
+        """
+        with self._lock:
+            now = self._clock()
+            return {url for url, expires in self._by_id.values() if expires > now}
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_url.clear()
+
+    def apply_notification(self, payload: Optional[str]):
+        """
+        Handle a URL_CHANNEL event: a JSON list of [id, url] pairs to store, or None after the
+        PostgreSQL listener reconnected, which drops everything as events may have been missed.
+        """
+        if payload is None:
+            self.clear()
+            return
+        for url_id, url in json.loads(payload):
+            self.put(url_id, url)
+
+
+def notify_urls_created(db: Session, rows: Iterable[tuple[int, str]]):
+    """
+    Queue URL_CHANNEL notifications for newly created URLs, split to fit PostgreSQL's payload limit.
+    """
+    batch, size = [], 2
+    for url_id, url in rows:
+        entry = [url_id, url]
+        entry_size = len(json.dumps(entry, separators=(",", ":"))) + 1
+        if batch and size + entry_size > NOTIFY_PAYLOAD_LIMIT:
+            notify(db, URL_CHANNEL, json.dumps(batch, separators=(",", ":")))
+            batch, size = [], 2
+        batch.append(entry)
+        size += entry_size
+    if batch:
+        notify(db, URL_CHANNEL, json.dumps(batch, separators=(",", ":")))
+
 
 class URLRepository:
-    def __init__(self):
-        self.url_cache = set()
+    """
+    Lookups and inserts of monitored URLs, backed by a `URLCache`.
+
+    The cache is warmed by `load_cache` and kept current across processes: every insert sends a
+    URL_CHANNEL event, which reaches `cache.apply_notification` in every replica once it is
+    registered with `events.add_listener`.
+    """
+
+    def __init__(self, cache: URLCache = None):
+        self.cache = cache or URLCache()
+
+    @property
+    def url_cache(self) -> set[str]:
+        return self.cache.urls()
 
     def load_cache(self, session: Session):
-        query = select(URL.url)
-        result = session.execute(query)
-        urls = result.scalars().all()
-        self.url_cache = set(urls)
+        self.cache.clear()
+        for url_id, url in session.execute(select(URL.id, URL.url).limit(self.cache.max_size)):
+            self.cache.put(url_id, url)
+
+    def all_urls(self, db: Session) -> set[str]:
+        """
+        Every monitored URL, read from the database since the cache may hold only some of them.
+        """
+        return set(db.execute(select(URL.url)).scalars())
 
-    async def create_url(self, db, url: str):
-        if url in self.url_cache:
-            return await self.get_url_by_url(db, url)
+    def get_id(self, db: Session, url: str) -> Optional[int]:
+        """
+        The ID of `url`, as given or in its normalized spelling, from the cache or the database.
+        """
+        candidates = list(dict.fromkeys([url, normalize_url(url) or url]))
+        for candidate in candidates:
+            url_id = self.cache.get_id(candidate)
+            if url_id is not None:
+                return url_id
+        row = db.execute(select(URL.id, URL.url).where(URL.url.in_(candidates))).first()
+        if row is None:
+            return None
+        self.cache.put(row.id, row.url)
+        return row.id
+
+    def get_url(self, db: Session, url_id: int) -> Optional[str]:
+        """
+        The URL string of `url_id`, from the cache or the database.
+        """
+        url = self.cache.get_url(url_id)
+        if url is None:
+            url = db.execute(select(URL.url).where(URL.id == url_id)).scalar_one_or_none()
+            if url is not None:
+                self.cache.put(url_id, url)
+        return url
+
+    def create_url(self, db: Session, url: str):
+        url = normalize_url(url) or url
+        url_id = self.get_id(db, url)
+        if url_id is not None:
+            return db.get(URL, url_id)
 
         try:
             new_url = URL(url=url)
             db.add(new_url)
-            await db.commit()
-            self.url_cache.add(url)
+            db.flush()
+            notify_urls_created(db, [(new_url.id, url)])
+            db.commit()
+            self.cache.put(new_url.id, url)
             return new_url
         except IntegrityError:
-            await db.rollback()
-            return await self.get_url_by_url(db, url)
+            db.rollback()
+            return self.get_url_by_url(db, url)
+
+    def get_url_by_url(self, db: Session, url: str):
+        url_id = self.get_id(db, url)
+        return db.get(URL, url_id) if url_id is not None else None
+
+    def bulk_create(self, db: Session, urls: list[str]) -> dict:
+        """
+        Import many URLs at once.
+
+        URLs are normalized and deduplicated against each other and the cache; the rest are inserted
+        in one transaction with ON CONFLICT DO NOTHING, so URLs added concurrently elsewhere are
+        skipped instead of failing the import.
+
+        Parameters:
+            db (Session): The database session.
+            urls (list[str]): URLs to import, in any spelling.
+
+        Returns:
+            dict: `created` and `skipped` counts, and the `invalid` inputs (counted as skipped).
+        """
+        invalid, candidates = [], {}
+        for url in urls:
+            normalized = normalize_url(url)
+            if normalized is None:
+                invalid.append(url)
+            elif self.cache.get_id(normalized) is None and self.cache.get_id(url.strip()) is None:
+                candidates.setdefault(normalized, None)
+
+        created = []
+        insert = insert_for(db)
+        pending = list(candidates)
+        for start in range(0, len(pending), IMPORT_CHUNK_SIZE):
+            chunk = pending[start : start + IMPORT_CHUNK_SIZE]
+            result = db.execute(
+                insert(URL)
+                .values([{"url": url} for url in chunk])
+                .on_conflict_do_nothing(index_elements=[URL.url])
+                .returning(URL.id, URL.url)
+            )
+            created.extend(result.tuples().all())
+        if created:
+            notify_urls_created(db, created)
+        db.commit()
 
-    async def get_url_by_url(self, db, url: str):
-        query = select(URL).where(URL.url == url)
-        result = await db.execute(query)
-        return result.scalar_one_or_none()
+        for url_id, url in created:
+            self.cache.put(url_id, url)
+        return {"created": len(created), "skipped": len(urls) - len(created), "invalid": invalid}
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import time
+
+import httpx
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import URL as URLModel, Scrape as ScrapeModel, Webhook
+from app.notifications import Transport, enqueue_new_scrapes
+from app.resilience import RetryPolicy
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WEBHOOK_CHANNEL = "webhook"
+WEBHOOK_EVENT = "known_issues.new"
+SIGNATURE_HEADER = "X-Webhook-Signature"
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "100"))
+
+
+class WebhookDeliveryError(Exception):
+    """
+    Raised when a receiver answers a delivery with a non-2xx status.
+
+    Attributes:
+        status_code (int): The receiver's HTTP status.
+        retry_after (float): Seconds from a Retry-After header, if any.
+    """
+
+    def __init__(self, url: str, status_code: int, retry_after: float = None):
+        super().__init__(f"Webhook {url} responded with HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class UnsafeWebhookURL(ValueError):
+    """
+    Raised when a webhook URL points at a host the server must not POST to.
+    """
+
+
+# Names that only resolve inside a network, e.g. "localhost" or "metadata.google.internal"
+LOCAL_NAME_SUFFIXES = (".localhost", ".local", ".internal", ".lan", ".home.arpa")
+
+
+def check_receiver_host(host: str, resolve=socket.getaddrinfo):
+    """
+    Refuse webhook receivers on loopback, private, link-local (such as cloud metadata services)
+    or otherwise non-public addresses, so registering a webhook can't make the server POST into
+    its own network. Host names are resolved and every address they resolve to must be public.
+
+    Raises:
+        UnsafeWebhookURL: If the host is not public or does not resolve.
+    """
+    host = host.strip("[]").rstrip(".").lower()
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        if "." not in host or host == "localhost" or host.endswith(LOCAL_NAME_SUFFIXES):
+            raise UnsafeWebhookURL(f"{host} is not a public host")
+        try:
+            addresses = {
+                ipaddress.ip_address(info[4][0].split("%")[0]) for info in resolve(host, None)
+            }
+        except (OSError, UnicodeError) as e:
+            raise UnsafeWebhookURL(f"{host} does not resolve: {e}")
+    for address in addresses:
+        if not address.is_global:
+            raise UnsafeWebhookURL(f"{host} resolves to non-public address {address}")
+
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    Compute the signature header value for a delivery: `t=<timestamp>,v1=<hex HMAC-SHA256>`
+    over `"<timestamp>." + body`. Including the timestamp lets receivers reject replays.
+    """
+    digest = hmac.new(
+        secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(
+    secret: str, header: str, body: bytes, tolerance: float = 300, now: float = None
+) -> bool:
+    """
+    Check a signature header produced by `sign_payload`, for use by receivers.
+
+    Returns:
+        bool: True if the signature matches and the timestamp is within `tolerance` seconds.
+    """
+    try:
+        parts = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs((now or time.time()) - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), header)
+
+
+def is_transient_webhook_error(error: Exception) -> bool:
+    if isinstance(error, WebhookDeliveryError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def build_payload(body: dict, idempotency_key: str) -> dict:
+    """
+    Render a digest as the JSON document POSTed to receivers.
+
+    Parameters:
+        body (dict): URLs as keys and lists of new scrapes as values.
+        idempotency_key (str): Stable key for this digest, repeated on every retry.
+    """
+    issues = []
+    for url, scrapes in body.items():
+        for scrape in scrapes:
+            try:
+                content = json.loads(scrape.content)
+            except (json.JSONDecodeError, TypeError):
+                content = scrape.content
+            issues.append(
+                {
+                    "scrape_id": scrape.id,
+                    "cluster_id": scrape.cluster_id,
+                    "url_id": scrape.url_id,
+                    "url": url,
+                    "timestamp": scrape.timestamp.isoformat(),
+                    "content": content,
+                }
+            )
+    return {"event": WEBHOOK_EVENT, "idempotency_key": idempotency_key, "issues": issues}
+
+
+class WebhookTransport(Transport):
+    """
+    Deliver digests to registered webhook receivers over a shared, pooled HTTP client.
+
+    Each receiver gets its own semaphore sized by its `max_concurrency`, so a slow receiver only
+    queues its own deliveries; the others keep flowing. Every request is bounded by
+    WEBHOOK_TIMEOUT. Transient failures (network errors, 429, 5xx) are retried here with jittered
+    backoff; if they persist the error is raised and the outbox reschedules the digest.
+
+    Outbox recipients for this channel are webhook IDs.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        client: httpx.AsyncClient = None,
+        retry_policy: RetryPolicy = None,
+    ):
+        self.session_factory = session_factory
+        self.client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(WEBHOOK_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                max_keepalive_connections=WEBHOOK_MAX_CONNECTIONS,
+            ),
+        )
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=3, base_delay=1, max_delay=10
+        )
+        self._limits: dict[int, tuple[int, asyncio.Semaphore]] = {}
+
+    def _semaphore(self, webhook: Webhook) -> asyncio.Semaphore:
+        # Recreated if the receiver's limit was changed since the last delivery.
+        size, semaphore = self._limits.get(webhook.id, (None, None))
+        if size != webhook.max_concurrency:
+            semaphore = asyncio.Semaphore(webhook.max_concurrency)
+            self._limits[webhook.id] = (webhook.max_concurrency, semaphore)
+        return semaphore
+
+    def _load_webhook(self, webhook_id: int) -> Webhook:
+        with self.session_factory() as db:
+            webhook = db.get(Webhook, webhook_id)
+            db.expunge_all()
+        return webhook
+
+    async def deliver(self, recipient: str, body: dict, idempotency_key: str):
+        webhook = await asyncio.to_thread(self._load_webhook, int(recipient))
+        if webhook is None or not webhook.active:
+            logger.info(f"Webhook {recipient} is gone or inactive; dropping {idempotency_key}")
+            return
+
+        content = json.dumps(build_payload(body, idempotency_key)).encode()
+
+        async def attempt():
+            # Signed per attempt so the timestamp stays fresh across retries.
+            headers = {
+                "Content-Type": "application/json",
+                "X-Idempotency-Key": idempotency_key,
+                SIGNATURE_HEADER: sign_payload(
+                    webhook.secret, int(time.time()), content
+                ),
+            }
+            async with self._semaphore(webhook):
+                response = await self.client.post(
+                    webhook.url, content=content, headers=headers
+                )
+            if response.status_code >= 300:
+                retry_after = response.headers.get("Retry-After")
+                raise WebhookDeliveryError(
+                    webhook.url,
+                    response.status_code,
+                    float(retry_after) if retry_after and retry_after.isdigit() else None,
+                )
+
+        await self.retry_policy.run(
+            attempt,
+            is_transient_webhook_error,
+            lambda e: getattr(e, "retry_after", None),
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def enqueue_webhooks(
+    db: Session,
+    batch_key: str,
+    db_url: URLModel,
+    new_scrapes: list[ScrapeModel],
+    held: bool = True,
+):
+    """
+    Write a URL's new scrapes to the outbox once per active webhook. Does not commit, so the rows
+    are committed in the same transaction as the scrapes themselves.
+
+    Parameters:
+        db (Session): The database session.
+        batch_key (str): Groups the rows of one scrape run into one delivery per receiver.
+        db_url (URLModel): The URL the scrapes belong to.
+        new_scrapes (list[ScrapeModel]): The newly stored scrapes (already flushed, so they have IDs).
+        held (bool): Hold the rows until the batch is released, e.g. when the run finishes.
+    """
+    if not new_scrapes:
+        return
+    webhook_ids = (
+        db.execute(select(Webhook.id).filter(Webhook.active.is_(True))).scalars().all()
+    )
+    if webhook_ids:
+        enqueue_new_scrapes(
+            db,
+            batch_key,
+            db_url,
+            new_scrapes,
+            [str(webhook_id) for webhook_id in webhook_ids],
+            held=held,
+            channel=WEBHOOK_CHANNEL,
+        )
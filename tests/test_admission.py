@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected, SingleFlight
+
+
+class TestAdmissionController:
+    @pytest.mark.asyncio
+    async def test_rejects_with_429_when_queue_is_full(self):
+        """
+        With one slot and a queue of one, a third concurrent caller is rejected immediately.
+        """
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        waiter = asyncio.create_task(hold())
+        try:
+            await asyncio.sleep(0.01)
+            assert controller.active == 1
+            assert controller.waiting == 1
+
+            with pytest.raises(AdmissionRejected) as excinfo:
+                async with controller.slot():
+                    pass
+            assert excinfo.value.status_code == 429
+        finally:
+            release.set()
+            await asyncio.gather(holder, waiter)
+        assert controller.active == 0
+
+    @pytest.mark.asyncio
+    async def test_rejects_with_503_when_wait_times_out(self):
+        """
+        A queued caller that does not get a slot within the timeout is rejected with 503.
+        """
+        controller = AdmissionController(max_concurrency=1, max_queue=4, queue_timeout=0.01)
+        async with controller.slot():
+            with pytest.raises(AdmissionRejected) as excinfo:
+                async with controller.slot():
+                    pass
+        assert excinfo.value.status_code == 503
+        assert controller.waiting == 0
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """
+        Concurrent calls with the same key run the function once and all receive its result.
+        """
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"known_issues": calls}
+
+        results = await asyncio.gather(*(flight.do("url", work) for _ in range(5)))
+        assert calls == 1
+        assert all(result == {"known_issues": 1} for result in results)
+        assert "url" not in flight
+
+    @pytest.mark.asyncio
+    async def test_exception_is_shared_and_key_is_released(self):
+        """
+        A failure is delivered to every joined caller, and the next call starts fresh work.
+        """
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            flight.do("url", fail), flight.do("url", fail), return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        async def succeed():
+            return "ok"
+
+        assert await flight.do("url", succeed) == "ok"
+
+    @pytest.mark.asyncio
+    async def test_work_is_cancelled_once_every_caller_gives_up(self):
+        """
+        Cancelling all joined callers cancels the shared work so its browser can be closed.
+        """
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def hang():
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.create_task(flight.do("url", hang))
+        second = asyncio.create_task(flight.do("url", hang))
+        await started.wait()
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.gather(first, second, return_exceptions=True)
+        assert "url" not in flight
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.api_client import ApiClient
+
+
+class StubAPI:
+    """
+    Local stand-in for the scraper API that counts requests per path.
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.hits = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, body):
+                path = self.path.split("?")[0]
+                with stub._lock:
+                    stub.hits[(self.command, path)] = stub.hits.get((self.command, path), 0) + 1
+                time.sleep(stub.delay)
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.startswith("/urls/"):
+                    self._reply([{"id": 2, "url": "https://b"}, {"id": 1, "url": "https://a"}])
+                else:
+                    url_id = int(self.path.split("?")[0].rstrip("/").split("/")[-1])
+                    self._reply([{"id": url_id * 10 + n} for n in range(3)] + [{"id": 0}])
+
+            def do_PUT(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                self._reply({"id": 10})
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    stub = StubAPI()
+    yield stub
+    stub.close()
+
+
+class TestApiClient:
+    def test_ttl_cache_and_invalidation_on_write(self, stub):
+        """
+        Repeated reads within the TTL hit the API once; a triage update drops the cached scrapes.
+        """
+        now = [0.0]
+        client = ApiClient(stub.url, ttl=30, clock=lambda: now[0])
+
+        assert [url["url"] for url in client.fetch_urls()] == ["https://a", "https://b"]
+        client.fetch_urls()
+        assert [s["id"] for s in client.fetch_scrapes(1)] == [10, 11, 12]
+        client.fetch_scrapes(1)
+        assert stub.hits[("GET", "/urls/")] == 1
+        assert stub.hits[("GET", "/scrapes/urlid/1")] == 1
+
+        client.update_scrape(10, {"scrape_type": "Critical"})
+        client.fetch_scrapes(1)
+        client.fetch_urls()
+        assert stub.hits[("GET", "/scrapes/urlid/1")] == 2
+        assert stub.hits[("GET", "/urls/")] == 1
+
+        now[0] = 31
+        client.fetch_urls()
+        assert stub.hits[("GET", "/urls/")] == 2
+
+    def test_fetch_scrapes_many_runs_concurrently(self):
+        """
+        Fetching several URLs takes about as long as the slowest one, not their sum.
+        """
+        stub = StubAPI(delay=0.2)
+        client = ApiClient(stub.url, max_workers=4)
+        try:
+            started = time.monotonic()
+            results = client.fetch_scrapes_many([1, 2, 3, 4])
+            elapsed = time.monotonic() - started
+        finally:
+            stub.close()
+
+        assert {url_id: [s["id"] for s in scrapes] for url_id, scrapes in results.items()} == {
+            1: [10, 11, 12],
+            2: [20, 21, 22],
+            3: [30, 31, 32],
+            4: [40, 41, 42],
+        }
+        assert elapsed < 0.6
+
+    def test_unreachable_api_returns_empty(self):
+        client = ApiClient("http://127.0.0.1:9")
+        assert client.fetch_urls() == []
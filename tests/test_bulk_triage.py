@@ -0,0 +1,89 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, get_db
+from app.events import DASHBOARD_CHANNEL, bus
+from app.main import app
+from app.models import URL as URLModel, Scrape as ScrapeModel
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'bulk.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add_all([URLModel(id=1, url="https://example.com/a"), URLModel(id=2, url="https://example.com/b")])
+        for scrape_id, url_id in ((1, 1), (2, 1), (3, 2), (4, 2)):
+            db.add(
+                ScrapeModel(
+                    id=scrape_id,
+                    url_id=url_id,
+                    timestamp=datetime(2024, 6, 1),
+                    content=json.dumps({"known_issues": {"row": {"Summary": f"Issue {scrape_id}"}}}),
+                    scrape_type="Unknown",
+                )
+            )
+        db.commit()
+    return factory
+
+
+@pytest.fixture
+def client(factory):
+    def override_get_db():
+        with factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    app.dependency_overrides.pop(get_db, None)
+
+
+class TestBulkTriage:
+    @pytest.mark.asyncio
+    async def test_updates_many_scrapes_and_reports_per_id(self, client, factory):
+        """
+        Only the given fields change, unknown IDs are reported, and one event is sent per URL.
+        """
+        queue = bus.subscribe(DASHBOARD_CHANNEL)
+        try:
+            response = await client.put(
+                "/scrapes/",
+                json={"ids": [1, 3, 99, 1], "update": {"scrape_type": "Critical", "create_alert": True}},
+            )
+            events = [json.loads(await asyncio.wait_for(queue.get(), 1)) for _ in range(2)]
+            assert queue.empty()
+        finally:
+            bus.unsubscribe(DASHBOARD_CHANNEL, queue)
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "updated": 2,
+            "results": [
+                {"id": 1, "updated": True, "detail": None},
+                {"id": 3, "updated": True, "detail": None},
+                {"id": 99, "updated": False, "detail": "Scrape not found"},
+            ],
+        }
+        assert sorted((e["url_id"], e["scrape_ids"]) for e in events) == [(1, [1]), (2, [3])]
+
+        with factory() as db:
+            rows = {s.id: (s.scrape_type, s.create_alert, s.scrape_comment) for s in db.query(ScrapeModel)}
+        assert rows[1] == ("Critical", True, None)
+        assert rows[3] == ("Critical", True, None)
+        assert rows[2] == ("Unknown", False, None)
+
+    @pytest.mark.asyncio
+    async def test_rejects_empty_update(self, client):
+        response = await client.put("/scrapes/", json={"ids": [1], "update": {}})
+        assert response.status_code == 400
+        response = await client.put("/scrapes/", json={"ids": [], "update": {"scrape_type": "Active"}})
+        assert response.status_code == 422
@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.checkpoint import (
+    RESUME_WINDOW,
+    RUN_LEASE,
+    finish_run,
+    keep_lease,
+    pending_urls,
+    record_url_result,
+    renew_lease,
+    run_batch_key,
+    start_or_resume_run,
+)
+from app.database import Base
+from app.models import URL as URLModel, OutboxMessage, Scrape as ScrapeModel, ScrapeRun
+from app.notifications import MemoryTransport, OutboxDispatcher, enqueue_new_scrapes
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'runs.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add_all(URLModel(id=n, url=f"https://example.com/status-{n}") for n in (1, 2, 3))
+        db.commit()
+    return factory
+
+
+def age_run(factory, run_id, started=timedelta(0), heartbeat=None):
+    """
+    Move a run's start back by `started`, and its last heartbeat back by `heartbeat`.
+    """
+    now = datetime.now(timezone.utc)
+    with factory() as db:
+        run = db.get(ScrapeRun, run_id)
+        run.started_at = now - started
+        run.heartbeat_at = now - heartbeat if heartbeat is not None else run.heartbeat_at
+        db.commit()
+
+
+class TestRunLease:
+    def test_crashed_run_is_resumed(self, factory):
+        """
+        A run whose worker stopped renewing its lease is taken over, with only its unfinished URLs left.
+        """
+        with factory() as db:
+            run_id = start_or_resume_run(db, True, "worker-a").id
+            record_url_result(db, run_id, 1, "done")
+            db.commit()
+        age_run(factory, run_id, heartbeat=RUN_LEASE * 2)
+
+        with factory() as db:
+            resumed = start_or_resume_run(db, False, "worker-b")
+            assert (resumed.id, resumed.owner, resumed.enable_deep_scrape) == (run_id, "worker-b", True)
+            assert [url_id for url_id, _ in pending_urls(db, run_id)] == [2, 3]
+            # The crashed worker can no longer renew or finish it.
+            assert not renew_lease(db, run_id, "worker-a")
+            assert not finish_run(db, run_id, "worker-a")
+            assert renew_lease(db, run_id, "worker-b")
+
+    def test_live_run_is_left_alone(self, factory):
+        """
+        While its lease is renewed, a run is neither resumed nor joined by a second run.
+        """
+        with factory() as db:
+            run_id = start_or_resume_run(db, False, "worker-a").id
+        with factory() as db:
+            assert start_or_resume_run(db, False, "worker-b") is None
+            assert db.query(ScrapeRun).count() == 1
+            assert db.get(ScrapeRun, run_id).owner == "worker-a"
+
+        # Not even once it is older than the resume window.
+        age_run(factory, run_id, started=RESUME_WINDOW * 2)
+        with factory() as db:
+            assert start_or_resume_run(db, False, "worker-b") is None
+            assert db.get(ScrapeRun, run_id).status == "running"
+
+    def test_stale_run_is_abandoned(self, factory):
+        """
+        A lapsed run older than the resume window is abandoned, its notifications released, and a new run started.
+        """
+        with factory() as db:
+            run_id = start_or_resume_run(db, False, "worker-a").id
+            enqueue_new_scrapes(
+                db, run_batch_key(run_id), db.get(URLModel, 1), [ScrapeModel(id=7)], ["ops@example.com"]
+            )
+            db.commit()
+        age_run(factory, run_id, started=RESUME_WINDOW * 2, heartbeat=RUN_LEASE * 2)
+
+        with factory() as db:
+            new = start_or_resume_run(db, False, "worker-b")
+            assert new.id != run_id
+            old = db.get(ScrapeRun, run_id)
+            assert old.status == "abandoned"
+            assert old.notified_at is not None
+            assert db.query(OutboxMessage).one().status == "pending"
+            assert len(pending_urls(db, new.id)) == 3
+
+    @pytest.mark.asyncio
+    async def test_notifications_are_released_once(self, factory):
+        """
+        Only the lease owner's first finish completes the run; its digest is sent once.
+        """
+        with factory() as db:
+            run_id = start_or_resume_run(db, False, "worker-a").id
+            enqueue_new_scrapes(
+                db, run_batch_key(run_id), db.get(URLModel, 1), [ScrapeModel(id=7)], ["ops@example.com"]
+            )
+            db.commit()
+            assert not finish_run(db, run_id, "worker-b")
+            assert db.query(OutboxMessage).one().status == "held"
+            assert finish_run(db, run_id, "worker-a")
+            notified_at = db.get(ScrapeRun, run_id).notified_at
+            assert not finish_run(db, run_id, "worker-a")
+            db.expire_all()
+            assert db.get(ScrapeRun, run_id).notified_at == notified_at
+
+        transport = MemoryTransport()
+        dispatcher = OutboxDispatcher(factory, {"email": transport})
+        assert await dispatcher.drain() == 1
+        assert await dispatcher.drain() == 0
+        assert [message.idempotency_key for message in transport.sent] == [f"run:{run_id}:email:ops@example.com"]
+
+    @pytest.mark.asyncio
+    async def test_keep_lease_returns_once_taken_over(self, factory):
+        """
+        The background renewal ends when another worker owns the run, which tells the scrape loop to stop.
+        """
+        with factory() as db:
+            run = start_or_resume_run(db, False, "worker-a")
+            run.owner = "worker-b"
+            db.commit()
+            run_id = run.id
+        await asyncio.wait_for(keep_lease(factory, run_id, "worker-a", interval=0.01), 1)
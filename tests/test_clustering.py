@@ -0,0 +1,173 @@
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.clustering import IssueClusterer, MinHasher
+from app.database import Base
+from app.events import CLUSTER_CHANNEL, add_listener, remove_listener
+from app.migrations import add_missing_columns
+from app.models import URL as URLModel, Scrape as ScrapeModel
+from app.notifications import render_new_scrapes_email
+
+TASKBAR = (
+    "Taskbar might not load after installing the June update. Devices might experience issues "
+    "with the taskbar not loading or responding after the update is installed."
+)
+TASKBAR_SERVER = (
+    "Taskbar might not load after installing the June update. Devices might experience issues "
+    "with the taskbar not loading or responding after the update is installed on servers."
+)
+BITLOCKER = (
+    "BitLocker recovery screen might appear on startup. Some devices might boot into BitLocker "
+    "recovery after installing the July security update."
+)
+
+
+def make_scrape(scrape_id, url_id, summary):
+    row = {"Summary": summary, "Status": "Confirmed", "Last updated": "2024-06-28 13:33 PT"}
+    return ScrapeModel(
+        id=scrape_id,
+        url_id=url_id,
+        timestamp=datetime(2024, 6, 28, tzinfo=timezone.utc),
+        content=json.dumps({"known_issues": {"header": "Known issues", "row": row}}),
+    )
+
+
+class TestMinHasher:
+    def test_similarity_tracks_text_overlap(self):
+        """
+        Near-identical summaries have a high estimated similarity; unrelated ones a low one.
+        """
+        hasher = MinHasher()
+        taskbar = hasher.signature(TASKBAR)
+        assert MinHasher.similarity(taskbar, hasher.signature(TASKBAR.upper())) == 1.0
+        assert MinHasher.similarity(taskbar, hasher.signature(TASKBAR_SERVER)) > 0.8
+        assert MinHasher.similarity(taskbar, hasher.signature(BITLOCKER)) < 0.2
+
+
+class TestIssueClusterer:
+    def test_same_issue_across_products_shares_a_cluster(self):
+        """
+        The same issue on three status pages lands in one cluster, identified by its first scrape.
+        """
+        clusterer = IssueClusterer()
+        scrapes = [
+            make_scrape(1, 1, TASKBAR),
+            make_scrape(2, 2, TASKBAR),
+            make_scrape(3, 3, TASKBAR_SERVER),
+            make_scrape(4, 1, BITLOCKER),
+        ]
+        clusterer.cluster_scrapes(scrapes)
+
+        assert [scrape.cluster_id for scrape in scrapes] == [1, 1, 1, 4]
+        assert all(scrape.minhash for scrape in scrapes)
+
+    def test_load_rebuilds_index_and_backfills(self):
+        """
+        Stored signatures are reloaded, and scrapes from before clustering are clustered on load.
+        """
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        with factory() as db:
+            db.add_all(URLModel(id=i, url=f"https://example.com/{i}") for i in (1, 2, 3))
+            first = make_scrape(1, 1, TASKBAR)
+            IssueClusterer().cluster_scrapes([first])
+            db.add_all([first, make_scrape(2, 2, TASKBAR), make_scrape(3, 3, BITLOCKER)])
+            db.commit()
+
+            clusterer = IssueClusterer()
+            clusterer.load(db)
+            assert len(clusterer) == 3
+            assert [scrape.cluster_id for scrape in db.query(ScrapeModel).order_by(ScrapeModel.id)] == [1, 1, 3]
+
+            late = make_scrape(4, 3, TASKBAR_SERVER)
+            clusterer.cluster_scrapes([late])
+            assert late.cluster_id == 1
+
+    def test_signatures_are_indexed_once_committed(self, tmp_path):
+        """
+        A rolled-back ingest leaves no signature behind; a committed one reaches every listening
+        clusterer, such as another replica's.
+        """
+        engine = create_engine(f"sqlite:///{tmp_path / 'clusters.db'}")
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        writer, replica = IssueClusterer(session_factory=factory), IssueClusterer(session_factory=factory)
+        for clusterer in (writer, replica):
+            add_listener(CLUSTER_CHANNEL, clusterer.apply_notification)
+        try:
+            with factory() as db:
+                db.add(URLModel(id=1, url="https://example.com/1"))
+                db.commit()
+                rolled_back = make_scrape(1, 1, TASKBAR)
+                db.add(rolled_back)
+                db.flush()
+                writer.cluster_scrapes([rolled_back], db)
+                db.rollback()
+                assert (len(writer), len(replica)) == (0, 0)
+
+                scrapes = [make_scrape(2, 1, TASKBAR), make_scrape(3, 1, TASKBAR_SERVER)]
+                db.add_all(scrapes)
+                db.flush()
+                writer.cluster_scrapes(scrapes, db)
+                assert [scrape.cluster_id for scrape in scrapes] == [2, 2]
+                assert len(writer) == 0
+                db.commit()
+            assert (len(writer), len(replica)) == (2, 2)
+
+            late = make_scrape(4, 1, TASKBAR)
+            replica.cluster_scrapes([late])
+            assert late.cluster_id == 2
+
+            # After the listener reconnects, the index is reloaded from the database.
+            replica.apply_notification(None)
+            assert sorted(replica._signatures) == [2, 3]
+        finally:
+            for clusterer in (writer, replica):
+                remove_listener(CLUSTER_CHANNEL, clusterer.apply_notification)
+
+
+class TestClusteredDigest:
+    def test_one_section_per_issue_with_affected_products(self):
+        """
+        A digest lists a clustered issue once, with every product it affects.
+        """
+        base = "https://learn.microsoft.com/en-us/windows/release-health"
+        scrapes = [make_scrape(1, 1, TASKBAR), make_scrape(2, 2, TASKBAR), make_scrape(3, 2, BITLOCKER)]
+        IssueClusterer().cluster_scrapes(scrapes)
+
+        html = render_new_scrapes_email(
+            {
+                f"{base}/status-windows-11-23H2": scrapes[:1],
+                f"{base}/status-windows-11-22H2": scrapes[1:],
+            }
+        )
+        assert html.count("Taskbar might not load") == 1
+        assert "Affected products: " in html
+        assert "Windows 11 23h2</a>, <a" in html
+        assert html.count("Known Issues:") == 2
+
+
+class TestMigrations:
+    def test_adds_new_columns_to_existing_tables(self):
+        """
+        Columns added to a model after its table was created are added on startup.
+        """
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE scrapes (id INTEGER PRIMARY KEY, url_id INTEGER, content VARCHAR)"
+            )
+        add_missing_columns(engine)
+        add_missing_columns(engine)
+
+        columns = {column["name"] for column in inspect(engine).get_columns("scrapes")}
+        assert {"cluster_id", "minhash", "hash"} <= columns
+        indexes = {index["name"] for index in inspect(engine).get_indexes("scrapes")}
+        assert "ix_scrapes_cluster_id" in indexes
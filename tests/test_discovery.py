@@ -0,0 +1,100 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.discovery import ReleaseHealthDiscovery, discover_status_pages, new_status_pages
+from app.models import URL as URLModel
+from app.url_repository import URLRepository
+
+BASE = "https://learn.microsoft.com/en-us/windows/release-health/"
+SAVED_PAGES = Path(__file__).parent / "data" / "release_health"
+
+
+class SavedPages:
+    """
+    Serves the saved release-health pages by URL and tracks how many fetches overlap.
+    """
+
+    def __init__(self):
+        self.pages = {BASE: (SAVED_PAGES / "index.html").read_text()}
+        for path in SAVED_PAGES.glob("*.html"):
+            self.pages.setdefault(BASE + path.stem, path.read_text())
+        self.fetched = []
+        self.active = self.max_active = 0
+
+    async def __call__(self, url):
+        self.fetched.append(url)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            return self.pages[url]
+        finally:
+            self.active -= 1
+
+
+class TestReleaseHealthDiscovery:
+    @pytest.mark.asyncio
+    async def test_finds_status_pages_within_depth(self):
+        """
+        Status pages linked from the index and its navigation pages are found; off-site and
+        out-of-directory pages are not crawled, and unavailable pages are skipped.
+        """
+        pages = SavedPages()
+        found = await ReleaseHealthDiscovery([BASE], fetch=pages, max_depth=1).crawl()
+
+        assert found == {
+            BASE + "status-windows-11-24H2",
+            BASE + "status-windows-11-23h2",
+            BASE + "status-windows-10-22H2",
+            BASE + "status-windows-server-2025",
+            BASE + "status-windows-server-2022",
+        }
+        assert "https://learn.microsoft.com/en-us/windows/whats-new/" not in pages.fetched
+        assert BASE + "windows-message-center" in pages.fetched
+
+        deeper = await ReleaseHealthDiscovery([BASE], fetch=SavedPages(), max_depth=2).crawl()
+        assert BASE + "status-windows-server-2019" in deeper
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        pages = SavedPages()
+        await ReleaseHealthDiscovery([BASE], fetch=pages, max_concurrency=1, max_depth=2).crawl()
+        assert pages.max_active == 1
+        assert len(pages.fetched) == len(set(pages.fetched))
+
+
+class TestRegistration:
+    def test_known_pages_match_regardless_of_case_and_fragment(self):
+        known = [BASE + "status-windows-11-23H2#known-issues"]
+        found = [BASE + "status-windows-11-23h2", BASE + "status-windows-11-24H2"]
+        assert new_status_pages(found, known) == [BASE + "status-windows-11-24H2"]
+
+    @pytest.mark.asyncio
+    async def test_registers_only_new_pages(self):
+        engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        repo = URLRepository()
+        with factory() as db:
+            repo.create_url(db, BASE + "status-windows-11-23H2#known-issues")
+            repo.create_url(db, BASE + "status-windows-10-22H2#known-issues")
+
+        discovery = ReleaseHealthDiscovery([BASE], fetch=SavedPages(), max_depth=1)
+        created = await discover_status_pages(discovery, repo, factory)
+
+        assert created == [
+            BASE + "status-windows-11-24H2",
+            BASE + "status-windows-server-2022",
+            BASE + "status-windows-server-2025",
+        ]
+        with factory() as db:
+            assert db.query(URLModel).count() == 5
+        assert await discover_status_pages(discovery, repo, factory) == []
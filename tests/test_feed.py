@@ -0,0 +1,189 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, get_db
+from app import events
+from app.events import FEED_CHANNEL, EventBus, PostgresListener, add_listener, notify, remove_listener
+from app.feed import InvalidCursor, decode_cursor, encode_cursor, read_feed
+from app.main import app
+from app.models import URL as URLModel, Scrape as ScrapeModel, Change
+
+
+def add_scrape(factory, scrape_id, publish=True):
+    with factory() as db:
+        db.add(
+            ScrapeModel(
+                id=scrape_id,
+                url_id=1,
+                timestamp=datetime(2024, 6, 1),
+                content=json.dumps({"known_issues": {"row": {"Summary": f"Issue {scrape_id}"}}}),
+            )
+        )
+        if publish:
+            notify(db, FEED_CHANNEL)
+        db.commit()
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'feed.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(URLModel(id=1, url="https://example.com/a"))
+        db.commit()
+    return factory
+
+
+@pytest.fixture
+def client(factory):
+    def override_get_db():
+        with factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    app.dependency_overrides.pop(get_db, None)
+
+
+class TestCursor:
+    def test_round_trip_and_rejects_garbage(self):
+        assert decode_cursor(encode_cursor(12, 3)) == (12, 3)
+        assert decode_cursor(None) == (0, 0)
+        with pytest.raises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+
+class TestReadFeed:
+    def test_pages_through_scrapes_and_changes(self, factory):
+        """
+        Following the returned cursor yields every item exactly once.
+        """
+        for scrape_id in (1, 2, 3):
+            add_scrape(factory, scrape_id, publish=False)
+        with factory() as db:
+            db.add(Change(scrape_id=3, change_type="status", old_value="Confirmed", new_value="Resolved"))
+            db.commit()
+
+            first = read_feed(db, None, limit=2)
+            assert [s.id for s in first["scrapes"]] == [1, 2]
+            assert len(first["changes"]) == 1
+            assert first["has_more"]
+
+            second = read_feed(db, first["cursor"], limit=2)
+            assert [s.id for s in second["scrapes"]] == [3]
+            assert second["changes"] == []
+            assert not second["has_more"]
+            assert read_feed(db, second["cursor"], limit=2)["scrapes"] == []
+
+
+    def test_rows_committed_out_of_id_order_are_not_skipped(self, factory):
+        """
+        A scrape whose transaction commits after a higher ID was already read is still returned.
+        """
+        add_scrape(factory, 6, publish=False)
+        with factory() as db:
+            first = read_feed(db, None, limit=10)
+        assert [s.id for s in first["scrapes"]] == [6]
+
+        # ID 5 was handed out first, but its transaction commits only now.
+        add_scrape(factory, 5, publish=False)
+        with factory() as db:
+            second = read_feed(db, first["cursor"], limit=10)
+            assert [s.id for s in second["scrapes"]] == [5]
+            assert read_feed(db, second["cursor"], limit=10)["scrapes"] == []
+
+    def test_positions_are_assigned_on_commit_and_reading_writes_nothing(self, factory, tmp_path):
+        """
+        Writers position their rows as they commit, so the feed can be read from a read-only
+        connection, such as a replica's.
+        """
+        add_scrape(factory, 1, publish=False)
+        with factory() as db:
+            db.add(Change(scrape_id=1, change_type="status", old_value="Confirmed", new_value="Resolved"))
+            db.commit()
+            assert [scrape.feed_seq for scrape in db.query(ScrapeModel)] == [1]
+            assert [change.feed_seq for change in db.query(Change)] == [1]
+
+        read_only = create_engine(f"sqlite:///file:{tmp_path / 'feed.db'}?mode=ro&uri=true")
+        with sessionmaker(bind=read_only)() as db:
+            page = read_feed(db, None, limit=10)
+            assert ([s.id for s in page["scrapes"]], len(page["changes"])) == ([1], 1)
+
+
+class TestEventBus:
+    @pytest.mark.asyncio
+    async def test_publish_from_another_thread_wakes_waiter(self):
+        bus = EventBus()
+        published = bus.current("ch")
+        await asyncio.to_thread(bus.publish, "ch")
+        await asyncio.wait_for(published.wait(), 1)
+        assert not await bus.wait("ch", 0.05)
+
+    def test_events_reach_the_notifying_process_once(self, factory, monkeypatch):
+        """
+        On PostgreSQL, while this process's listener is listening on a channel, the NOTIFY it
+        receives back is the only local delivery of an event, so callbacks do not run twice.
+        """
+        received = []
+        add_listener("ch", received.append)
+        listener = PostgresListener(None, [], target=EventBus())
+        try:
+            with factory() as db:
+                monkeypatch.setattr(db.connection().dialect, "name", "postgresql")
+                notified = []
+                monkeypatch.setattr(db, "execute", lambda statement, params, **kwargs: notified.append(params["payload"]))
+
+                notify(db, "ch", "before listening")
+                db.commit()
+                monkeypatch.setattr(events, "_listening", {"ch"})
+                notify(db, "ch", "while listening")
+                db.commit()
+            assert received == ["before listening"]
+
+            # Only the notification sent while listening comes back to this process
+            listener.dispatch("ch", notified[-1])
+            assert received == ["before listening", "while listening"]
+        finally:
+            remove_listener("ch", received.append)
+
+
+class TestFeedEndpoint:
+    @pytest.mark.asyncio
+    async def test_long_poll_returns_when_data_is_committed(self, client, factory):
+        """
+        A waiting request is answered as soon as a new scrape is committed, not at the timeout.
+        """
+        add_scrape(factory, 1, publish=False)
+        response = await client.get("/feed")
+        cursor = response.json()["cursor"]
+
+        started = time.monotonic()
+        request = asyncio.create_task(client.get("/feed", params={"cursor": cursor, "wait": 10}))
+        await asyncio.sleep(0.2)
+        assert not request.done()
+        await asyncio.to_thread(add_scrape, factory, 2)
+        response = await asyncio.wait_for(request, 5)
+
+        assert time.monotonic() - started < 5
+        assert [scrape["id"] for scrape in response.json()["scrapes"]] == [2]
+
+    @pytest.mark.asyncio
+    async def test_long_poll_times_out_empty(self, client):
+        response = await client.get("/feed", params={"wait": 0.1})
+        assert response.status_code == 200
+        assert response.json()["scrapes"] == []
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor(self, client):
+        response = await client.get("/feed", params={"cursor": "%%%"})
+        assert response.status_code == 400
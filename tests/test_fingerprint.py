@@ -0,0 +1,159 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.fingerprint import content_fingerprint, fingerprint, normalize_text
+from app.main import process_scraped_data
+from app.migrations import DATA_MIGRATIONS, run_data_migrations
+from app.models import (
+    URL as URLModel,
+    Scrape as ScrapeModel,
+    Change,
+    KnownIssue,
+    OutboxMessage,
+    SchemaMigration,
+    ScrapeRunItem,
+)
+
+ROW = {
+    "Summary": "Taskbar might not load",
+    "Originating update": "OS Build 22621.3810 | KB5039302 | 2024-06-25",
+    "Status": "Confirmed",
+    "Last updated": "2024-06-28 13:33 PT",
+}
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add(URLModel(id=1, url="https://example.com/a"))
+        session.commit()
+        yield session
+
+
+class TestFingerprint:
+    def test_formatting_noise_does_not_change_the_fingerprint(self):
+        """
+        Key order, separators, whitespace and date/timezone formatting are normalized away.
+        """
+        base = fingerprint({"known_issues": {"header": "Known issues", "row": ROW}})
+        noisy_row = {
+            "Last updated": "2024-06-28T13:33:00Z",
+            "Status": "  Confirmed\n",
+            "Summary": "Taskbar might  not load",
+            "Originating update": "OS Build 22621.3810 | KB5039302 | 2024-06-25",
+        }
+        noisy = json.dumps({"known_issues": {"row": noisy_row, "header": "Known issues"}}, indent=4)
+
+        assert content_fingerprint(noisy) == base
+        assert len(base) == 32
+        assert fingerprint({"known_issues": {"header": "Known issues", "row": {**ROW, "Status": "Resolved"}}}) != base
+
+    def test_normalize_text_dates(self):
+        assert normalize_text("2024-6-8 9:05 PST") == "2024-06-08T09:05"
+        assert normalize_text("2024-06-08") == "2024-06-08"
+        assert normalize_text("Build 2024-06-08 rollup") == "Build 2024-06-08 rollup"
+
+
+class TestProcessScrapedData:
+    def test_stores_every_new_row_once(self, db):
+        """
+        Every row of a deep scrape is stored, and re-ingesting reformatted content stores nothing.
+        """
+        other = {**ROW, "Summary": "Start menu might not open"}
+        scraped = {"known_issues": {"header": "Known issues", "row": [ROW, other]}}
+        assert len(process_scraped_data(db, db.get(URLModel, 1), scraped)) == 2
+
+        reformatted = {"known_issues": {"header": "Known issues", "row": [{**ROW, "Last updated": "2024-06-28 13:33"}]}}
+        assert process_scraped_data(db, db.get(URLModel, 1), reformatted) == []
+
+
+class TestRehashMigration:
+    def test_rehashes_and_dedupes_once(self, db):
+        """
+        Rows that only differ by formatting collapse into the earliest one, which keeps their triage.
+        """
+        def stored(scrape_id, row, **fields):
+            content = json.dumps({"known_issues": {"header": "Known issues", "row": row}})
+            return ScrapeModel(id=scrape_id, url_id=1, timestamp=datetime(2024, 6, scrape_id), content=content, hash="legacy", **fields)
+
+        db.add_all(
+            [
+                stored(1, ROW),
+                stored(2, {**ROW, "Last updated": "2024-06-28 13:33"}, create_alert=True, scrape_comment="watch"),
+                stored(3, {**ROW, "Status": "Resolved"}),
+            ]
+        )
+        db.add(KnownIssue(id=1, url_id=1, fingerprint="x", first_seen=datetime(2024, 6, 1), last_seen=datetime(2024, 6, 2), latest_scrape_id=2))
+        db.add_all(
+            [
+                Change(scrape_id=2, change_type="last_updated", previous_scrape_id=1),
+                Change(scrape_id=3, change_type="status", previous_scrape_id=2),
+            ]
+        )
+        db.commit()
+
+        run_data_migrations(db)
+        run_data_migrations(db)
+
+        scrapes = db.query(ScrapeModel).order_by(ScrapeModel.id).all()
+        assert [scrape.id for scrape in scrapes] == [1, 3]
+        assert scrapes[0].hash == content_fingerprint(scrapes[0].content)
+        assert (scrapes[0].create_alert, scrapes[0].scrape_comment) == (True, "watch")
+        assert [(c.scrape_id, c.previous_scrape_id) for c in db.query(Change)] == [(3, 1)]
+        assert db.get(KnownIssue, 1).latest_scrape_id == 1
+        assert db.query(SchemaMigration).count() == len(DATA_MIGRATIONS)
+
+    def test_references_to_duplicates_follow_the_kept_scrape(self, db):
+        """
+        Clusters, run items and undelivered notifications that named a deleted duplicate name the
+        scrape kept in its place.
+        """
+        def stored(scrape_id, row, cluster_id):
+            content = json.dumps({"known_issues": {"header": "Known issues", "row": row}})
+            return ScrapeModel(
+                id=scrape_id, url_id=1, timestamp=datetime(2024, 6, scrape_id), content=content, cluster_id=cluster_id
+            )
+
+        other = {**ROW, "Summary": "Start menu might not open"}
+        db.add_all(
+            [
+                stored(1, other, 1),
+                stored(2, ROW, 2),
+                stored(3, {**ROW, "Last updated": "2024-06-28 13:33"}, 2),
+                # Clustered onto the duplicate, e.g. the same issue on another product's page
+                stored(4, {**ROW, "Status": "Resolved"}, 3),
+            ]
+        )
+        db.add(ScrapeRunItem(run_id=1, url_id=1, state="done", new_scrape_ids="[2, 3]"))
+        for status in ("pending", "sent"):
+            db.add(
+                OutboxMessage(
+                    idempotency_key=f"run:1:url:1:email:{status}@example.com",
+                    recipient=f"{status}@example.com",
+                    batch_key="run:1",
+                    payload=json.dumps({"url": "https://example.com/1", "scrape_ids": [3, 4]}),
+                    status=status,
+                )
+            )
+        db.commit()
+
+        run_data_migrations(db)
+
+        assert [(scrape.id, scrape.cluster_id) for scrape in db.query(ScrapeModel).order_by(ScrapeModel.id)] == [
+            (1, 1),
+            (2, 2),
+            (4, 2),
+        ]
+        assert json.loads(db.query(ScrapeRunItem).one().new_scrape_ids) == [2]
+        payloads = {message.status: json.loads(message.payload)["scrape_ids"] for message in db.query(OutboxMessage)}
+        assert payloads == {"pending": [2, 4], "sent": [3, 4]}
@@ -0,0 +1,126 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.backfill import backfill
+from app.database import Base
+from app.html_archive import HTML_HASH_KEY, HTMLArchive, html_hash, record_snapshot
+from app.main import ingest_scraped_data
+from app.models import URL as URLModel, Change, KnownIssue, PageSnapshot, Scrape as ScrapeModel
+from app.scraper import parse_scraped_content
+
+STATUS_PAGE = (Path(__file__).parent / "data" / "release_health" / "status-windows-11-23h2.html").read_text()
+
+
+@pytest.fixture
+def factory():
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(URLModel(id=1, url="https://example.com/status-windows-11-23h2"))
+        db.commit()
+    return factory
+
+
+class TestHTMLArchive:
+    def test_pages_are_stored_once_by_content(self, tmp_path):
+        archive = HTMLArchive(str(tmp_path))
+        digest = archive.put(STATUS_PAGE)
+        assert digest == html_hash(STATUS_PAGE)
+        assert archive.put(STATUS_PAGE) == digest
+        assert archive.get(digest) == STATUS_PAGE
+        assert list(archive.digests()) == [digest]
+
+        path = archive.find(digest)
+        assert path.parent.name == digest[:2]
+        assert path.stat().st_size < len(STATUS_PAGE.encode())
+        with pytest.raises(KeyError):
+            archive.get("0" * 64)
+
+    def test_snapshots_record_first_and_last_fetch(self, factory):
+        with factory() as db:
+            record_snapshot(db, 1, "a" * 64, datetime(2024, 6, 1))
+            record_snapshot(db, 1, "a" * 64, datetime(2024, 6, 2))
+            db.commit()
+            snapshot = db.execute(select(PageSnapshot)).scalar_one()
+            assert (snapshot.first_fetched_at, snapshot.last_fetched_at) == (
+                datetime(2024, 6, 1),
+                datetime(2024, 6, 2),
+            )
+
+
+class TestBackfill:
+    def test_reextracts_history_without_fetching(self, factory, tmp_path):
+        """
+        Pages scraped with the first-row-only extraction yield their other rows when re-parsed with
+        deep scraping, dated when the page was fetched; a second run adds nothing.
+        """
+        archive = HTMLArchive(str(tmp_path))
+        fetched_at = datetime(2024, 7, 1, 6)
+        scraped_data = parse_scraped_content(STATUS_PAGE)
+        scraped_data[HTML_HASH_KEY] = archive.put(STATUS_PAGE)
+        with factory() as db:
+            ingest_scraped_data(db, db.get(URLModel, 1), scraped_data)
+            db.commit()
+            assert db.query(ScrapeModel).count() == 1
+            db.execute(PageSnapshot.__table__.update().values(first_fetched_at=fetched_at))
+            db.commit()
+
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            result = backfill(factory, archive, enable_deep_scrape=True, executor=pool)
+            again = backfill(factory, archive, enable_deep_scrape=True, executor=pool)
+        assert result == {"snapshots": 1, "failed": 0, "created": 1}
+        assert again["created"] == 0
+
+        with factory() as db:
+            backfilled = db.execute(select(ScrapeModel).order_by(ScrapeModel.id.desc())).scalars().first()
+            assert "Taskbar" in backfilled.content
+            assert backfilled.timestamp == fetched_at
+            assert db.query(KnownIssue).count() == 2
+
+    def test_history_between_versions_is_not_published_as_changes(self, factory, tmp_path):
+        """
+        An archived page older than the issue's latest version is stored without recording changes,
+        and the next live version is still diffed against the latest one.
+        """
+
+        def page(status, updated):
+            return STATUS_PAGE.replace("<td>Resolved KB5041585</td>", f"<td>{status}</td>", 1).replace(
+                "2024-08-13<br>10:00 PT", f"{updated}<br>10:00 PT", 1
+            )
+
+        archive = HTMLArchive(str(tmp_path))
+        with factory() as db:
+            for status, updated in [("Mitigated", "2024-07-20"), ("Resolved KB5041585", "2024-08-13")]:
+                ingest_scraped_data(db, db.get(URLModel, 1), parse_scraped_content(page(status, updated)))
+                db.commit()
+            assert db.query(Change).count() == 2
+            record_snapshot(db, 1, archive.put(page("Mitigated", "2024-07-30")), datetime(2024, 7, 30))
+            db.commit()
+
+        assert backfill(factory, archive, workers=1)["created"] == 1
+        with factory() as db:
+            assert db.query(Change).count() == 2
+            latest = db.query(KnownIssue).one().latest_scrape_id
+            ingest_scraped_data(
+                db, db.get(URLModel, 1), parse_scraped_content(page("Resolved KB5041585", "2024-08-20"))
+            )
+            db.commit()
+            [change] = db.query(Change).filter(Change.id > 2).all()
+            assert (change.change_type, change.previous_scrape_id) == ("last_updated", latest)
+            assert (change.old_value, change.new_value) == ("2024-08-1310:00 PT", "2024-08-2010:00 PT")
+
+    def test_missing_pages_are_reported(self, factory, tmp_path):
+        with factory() as db:
+            record_snapshot(db, 1, "b" * 64, datetime(2024, 6, 1))
+            db.commit()
+        result = backfill(factory, HTMLArchive(str(tmp_path)), workers=1)
+        assert result == {"snapshots": 1, "failed": 1, "created": 0}
@@ -0,0 +1,246 @@
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.issues import (
+    backfill_known_issues,
+    issue_fingerprint,
+    issue_timeline,
+    link_known_issues,
+    record_changes,
+)
+from app.main import ingest_scraped_data
+from app.models import URL as URLModel, Scrape as ScrapeModel, KnownIssue, Change
+from app.schemas import KnownIssue as KnownIssueSchema
+from app.scraper import ISSUE_DETAILS_KEY, parse_scraped_content
+
+T0 = datetime(2024, 6, 1)
+STATUS_PAGE = (Path(__file__).parent / "data" / "release_health" / "status-windows-11-23h2.html").read_text()
+# Saved from learn.microsoft.com, whose sections are <div>s around a status and history table
+LEARN_PAGE = (
+    Path(__file__).parent / "data" / "release_health" / "learn" / "status-windows-11-23h2.html"
+).read_text()
+
+
+def make_scrape(scrape_id, url_id, summary, status, days=0):
+    row = {"Summary": summary, "Status": status, "Last updated": f"2024-06-{days + 1:02d} 10:00 PT"}
+    return ScrapeModel(
+        id=scrape_id,
+        url_id=url_id,
+        timestamp=T0 + timedelta(days=days),
+        content=json.dumps({"known_issues": {"header": "Known issues", "row": row}}),
+    )
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add_all([URLModel(id=1, url="https://example.com/a"), URLModel(id=2, url="https://example.com/b")])
+        session.commit()
+        yield session
+
+
+class TestIssueFingerprint:
+    def test_ignores_cosmetic_edits_and_volatile_fields(self):
+        """
+        Case, punctuation and whitespace edits to the summary, and status changes, keep the identity.
+        """
+        base = issue_fingerprint({"Summary": "Taskbar might not load.", "Status": "Confirmed"})
+        assert issue_fingerprint({"Summary": "  taskbar might  NOT load", "Status": "Resolved"}) == base
+        assert issue_fingerprint({"Summary": "Start menu might not load"}) != base
+        assert issue_fingerprint({"Summary": ""}) is None
+
+
+class TestKnownIssues:
+    def test_versions_link_to_one_entity_per_product(self, db):
+        """
+        Status updates of an issue share its entity; the same issue on another product gets its own.
+        """
+        versions = [
+            make_scrape(1, 1, "Taskbar might not load", "Confirmed"),
+            make_scrape(2, 1, "Taskbar might not load.", "Mitigated", days=2),
+            make_scrape(3, 2, "Taskbar might not load", "Confirmed"),
+        ]
+        db.add_all(versions)
+        db.flush()
+        link_known_issues(db, versions)
+        db.commit()
+
+        entity = db.get(KnownIssue, versions[0].known_issue_id)
+        assert versions[1].known_issue_id == entity.id
+        assert versions[2].known_issue_id != entity.id
+        assert (entity.status, entity.first_seen, entity.last_seen, entity.latest_scrape_id) == (
+            "Mitigated",
+            T0,
+            T0 + timedelta(days=2),
+            2,
+        )
+        assert [scrape.id for scrape in issue_timeline(db, entity.id)] == [1, 2]
+
+    def test_backfill_links_existing_scrapes(self, db):
+        """
+        Scrapes stored before entities existed are linked once; rows without a summary are skipped.
+        """
+        db.add_all(
+            [
+                make_scrape(1, 1, "Taskbar might not load", "Confirmed"),
+                make_scrape(2, 1, "Taskbar might not load", "Resolved", days=1),
+                make_scrape(3, 1, "", "Confirmed"),
+            ]
+        )
+        db.commit()
+
+        assert backfill_known_issues(db, batch_size=2) == 3
+        assert backfill_known_issues(db) == 1
+        assert db.query(KnownIssue).count() == 1
+        assert [scrape.known_issue_id for scrape in db.query(ScrapeModel).order_by(ScrapeModel.id)] == [1, 1, None]
+
+
+class TestRecordChanges:
+    def test_diffs_against_previous_version_of_the_issue(self, db):
+        """
+        A new version of an issue records one change per differing field; a first version records none.
+        """
+        first = make_scrape(1, 1, "Taskbar might not load", "Confirmed")
+        other_product = make_scrape(2, 2, "Taskbar might not load", "Resolved")
+        db.add_all([first, other_product])
+        db.flush()
+        link_known_issues(db, [first, other_product])
+        assert record_changes(db, [first, other_product]) == []
+
+        second = make_scrape(3, 1, "Taskbar might not load", "Resolved", days=3)
+        db.add(second)
+        db.flush()
+        link_known_issues(db, [second])
+        record_changes(db, [second])
+        db.commit()
+
+        changes = db.query(Change).order_by(Change.change_type).all()
+        assert [(c.change_type, c.old_value, c.new_value) for c in changes] == [
+            ("last_updated", "2024-06-01 10:00 PT", "2024-06-04 10:00 PT"),
+            ("status", "Confirmed", "Resolved"),
+        ]
+        assert {(c.scrape_id, c.previous_scrape_id, c.known_issue_id) for c in changes} == {
+            (3, 1, first.known_issue_id)
+        }
+
+    def test_cosmetic_summary_edits_record_no_change(self, db):
+        """
+        A version whose summary only differs in case or punctuation belongs to the same issue and
+        records no change of its own.
+        """
+        first = make_scrape(1, 1, "Taskbar might not load", "Confirmed")
+        db.add(first)
+        db.flush()
+        link_known_issues(db, [first])
+        restyled = make_scrape(2, 1, "Taskbar Might Not Load.", "Confirmed", days=1)
+        restyled.content = restyled.content.replace("2024-06-02", "2024-06-01")
+        db.add(restyled)
+        db.flush()
+        link_known_issues(db, [restyled])
+        assert restyled.known_issue_id == first.known_issue_id
+        assert record_changes(db, [restyled]) == []
+
+
+class TestIssueDetails:
+    def test_rows_carry_their_details_section(self):
+        """
+        Each summary row is linked through its anchor to its section under "Issue details".
+        """
+        rows = parse_scraped_content(STATUS_PAGE, enable_deep_scrape=True)["known_issues"]["row"]
+        bitlocker, taskbar = (row[ISSUE_DETAILS_KEY] for row in rows)
+        assert bitlocker["anchor"] == "3204msgdesc"
+        assert bitlocker["affected_platforms"]["Server"] == ["Windows Server 2022", "Windows Server 2019"]
+        assert bitlocker["resolution_kb"] == "KB5041585"
+        assert bitlocker["workaround"] is None
+        assert taskbar["description"].startswith("After installing KB5039212")
+        assert taskbar["affected_platforms"] == {
+            "Client": ["Windows 11, version 23H2", "Windows 11, version 22H2"],
+            "Server": [],
+        }
+        assert taskbar["workaround"].startswith("Restart the device.")
+        assert (taskbar["resolution"], taskbar["resolution_kb"]) == (None, None)
+
+    def test_saved_learn_page(self):
+        """
+        The published layout: the anchor is the section's cell, text sits in <div>s, and affected
+        platforms are either a list or <br>-separated lines. The status and history table and
+        "Next steps" text end up in no field.
+        """
+        rows = parse_scraped_content(LEARN_PAGE, enable_deep_scrape=True)["known_issues"]["row"]
+        bitlocker, directx, sign_in = (row[ISSUE_DETAILS_KEY] for row in rows)
+
+        assert bitlocker["anchor"] == "3204msgdesc"
+        assert bitlocker["description"] == (
+            "After installing the July 2024 Windows security update, released July 9, 2024 (KB5040442), "
+            "you might see a BitLocker recovery screen upon booting your device. This issue is more likely "
+            "to occur if you have the Device Encryption option enabled in Settings > Privacy & Security > "
+            "Device encryption."
+        )
+        assert bitlocker["affected_platforms"] == {
+            "Client": ["Windows 11, version 23H2", "Windows 11, version 22H2", "Windows 10, version 22H2"],
+            "Server": ["Windows Server 2022", "Windows Server 2019"],
+        }
+        assert bitlocker["workaround"] is None
+        assert bitlocker["resolution"].startswith("This issue was resolved by Windows updates released August 13")
+        assert bitlocker["resolution_kb"] == "KB5041585"
+
+        assert directx["description"].endswith("more likely to be affected.")
+        assert directx["affected_platforms"] == {
+            "Client": ["Windows 11, version 23H2", "Windows 11, version 22H2"],
+            "Server": [],
+        }
+        assert directx["workaround"].endswith("Right-click your display adapter and select Update driver.")
+        assert (directx["resolution"], directx["resolution_kb"]) == (None, None)
+
+        assert sign_in == {
+            "anchor": "3301msgdesc",
+            "description": None,
+            "affected_platforms": {},
+            "workaround": None,
+            "resolution": None,
+            "resolution_kb": None,
+        }
+
+    def test_sections_that_cannot_be_told_apart_are_left_out(self):
+        """
+        A row whose anchor leads nowhere, or into an element holding another issue's section too,
+        carries no details rather than another issue's text.
+        """
+        page = (
+            "<h2 id='known-issues'>Known issues</h2><table><tbody>"
+            + "".join(f"<tr><td><a href='#{n}msgdesc'>Issue {n}</a></td></tr>" for n in (1, 2, 3, 4, 5))
+            + "</tbody></table>"
+            "<table><tbody><tr><td><div id='1msgdesc'></div><div id='2msgdesc'></div><p>Shared cell</p></td></tr>"
+            "<tr><td id='3msgdesc'><p>Only issue 3</p></td></tr></tbody></table>"
+            "<div><span id='4msgdesc'></span><span id='9msgdesc'></span><p>Shared block</p></div>"
+        )
+        rows = parse_scraped_content(page, enable_deep_scrape=True)["known_issues"]["row"]
+        assert [ISSUE_DETAILS_KEY in row for row in rows] == [False, False, True, False, False]
+        assert rows[2][ISSUE_DETAILS_KEY]["description"] == "Only issue 3"
+
+    def test_details_are_stored_on_the_issue_without_new_versions(self, db):
+        """
+        Details are kept out of the scrape's content, so editing them updates the known issue but
+        creates no new scrape.
+        """
+        scraped_data = parse_scraped_content(STATUS_PAGE, enable_deep_scrape=True)
+        assert len(ingest_scraped_data(db, db.get(URLModel, 1), scraped_data)) == 2
+        db.commit()
+        assert all(ISSUE_DETAILS_KEY not in scrape.content for scrape in db.query(ScrapeModel))
+
+        edited = STATUS_PAGE.replace("sign out and back in", "restart Explorer")
+        assert ingest_scraped_data(db, db.get(URLModel, 1), parse_scraped_content(edited, True)) == []
+        db.commit()
+        issue = db.query(KnownIssue).filter(KnownIssue.title.startswith("Taskbar")).one()
+        assert KnownIssueSchema.model_validate(issue).details["workaround"].endswith("restart Explorer.")
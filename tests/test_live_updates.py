@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.events import DASHBOARD_CHANNEL, EventBus, bus, notify_dashboard
+from app.live_updates import DashboardEvents, PanelCache, parse_sse
+
+
+class TestParseSSE:
+    def test_named_events_comments_and_multiline_data(self):
+        lines = [
+            "retry: 3000",
+            "",
+            ": keep-alive",
+            "",
+            "event: scrape.new",
+            'data: {"url_id": 1}',
+            "",
+            "data: first",
+            "data: second",
+            "",
+        ]
+        assert list(parse_sse(lines)) == [
+            ("scrape.new", '{"url_id": 1}'),
+            ("message", "first\nsecond"),
+        ]
+
+
+class TestDashboardEvents:
+    def test_events_bump_only_their_url_and_resync_bumps_all(self):
+        events = DashboardEvents("http://api.invalid")
+        before = {url_id: events.version(url_id) for url_id in (1, 2)}
+
+        events.apply("scrape.triage", json.dumps({"url_id": 1, "scrape_ids": [5]}))
+        assert events.version(1) != before[1]
+        assert events.version(2) == before[2]
+
+        events.apply("resync", "{}")
+        assert events.version(2) != before[2]
+
+
+class TestPanelCache:
+    def test_refetches_only_when_version_moves(self):
+        state, calls = {}, []
+
+        def fetch():
+            calls.append(1)
+            return len(calls)
+
+        cache = PanelCache(state)
+        assert cache.get(("scrapes", 1), (0, 0), fetch) == 1
+        assert PanelCache(state).get(("scrapes", 1), (0, 0), fetch) == 1
+        assert cache.get(("scrapes", 1), (0, 1), fetch) == 2
+        cache.invalidate(("scrapes", 1))
+        assert cache.get(("scrapes", 1), (0, 1), fetch) == 3
+
+
+class TestDashboardChannel:
+    @pytest.mark.asyncio
+    async def test_committed_updates_reach_every_subscriber(self):
+        """
+        Dashboard events are delivered to each subscriber once the transaction commits, not on rollback.
+        """
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        first, second = bus.subscribe(DASHBOARD_CHANNEL), bus.subscribe(DASHBOARD_CHANNEL)
+        try:
+            with factory() as db:
+                notify_dashboard(db, "scrape.triage", 7, [70])
+                db.rollback()
+                notify_dashboard(db, "scrape.new", 3, [30, 31])
+                db.commit()
+
+            for queue in (first, second):
+                payload = json.loads(await asyncio.wait_for(queue.get(), 1))
+                assert payload == {"type": "scrape.new", "url_id": 3, "scrape_ids": [30, 31]}
+                assert queue.empty()
+        finally:
+            bus.unsubscribe(DASHBOARD_CHANNEL, first)
+            bus.unsubscribe(DASHBOARD_CHANNEL, second)
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_is_told_to_resync(self):
+        local = EventBus(queue_size=3)
+        queue = local.subscribe("ch")
+        for n in range(5):
+            local.publish("ch", str(n))
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert None in items
+        assert items[-1] == "4"
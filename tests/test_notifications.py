@@ -0,0 +1,154 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import URL as URLModel, Scrape as ScrapeModel, OutboxMessage
+from app.notifications import EmailTransport, MemoryTransport, OutboxDispatcher, enqueue_new_scrapes
+
+
+class FailingTransport(EmailTransport):
+    async def send(self, message):
+        raise ConnectionError("smtp down")
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file database, so the dispatcher's concurrent worker threads each get their own connection.
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'outbox.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    now = datetime.now(timezone.utc)
+    content = {"known_issues": {"header": "Known issues", "row": {"Summary": "Taskbar might not load"}}}
+    with factory() as db:
+        db.add_all(
+            [
+                URLModel(id=1, url="https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-23H2"),
+                URLModel(id=2, url="https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-22H2"),
+                ScrapeModel(id=10, url_id=1, timestamp=now, content=json.dumps(content)),
+                ScrapeModel(id=20, url_id=2, timestamp=now, content=json.dumps(content)),
+            ]
+        )
+        for url_id, url, scrape_id in [
+            (1, "https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-23H2", 10),
+            (2, "https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-22H2", 20),
+        ]:
+            for recipient in ["ops@example.com", "desk@example.com"]:
+                db.add(
+                    OutboxMessage(
+                        idempotency_key=f"run:1:url:{url_id}:email:{recipient}",
+                        channel="email",
+                        recipient=recipient,
+                        batch_key="run:1",
+                        payload=json.dumps({"url": url, "scrape_ids": [scrape_id]}),
+                        status="pending",
+                        attempts=0,
+                        next_attempt_at=now,
+                        created_at=now,
+                    )
+                )
+        db.commit()
+    return factory
+
+
+class TestOutboxDispatcher:
+    @pytest.mark.asyncio
+    async def test_sends_one_digest_per_recipient_and_batch(self, session_factory):
+        """
+        Rows for several URLs in one batch are folded into a single email per recipient and marked sent.
+        """
+        transport = MemoryTransport()
+        dispatcher = OutboxDispatcher(session_factory, {"email": transport})
+
+        assert await dispatcher.drain() == 4
+        assert sorted(message.recipients[0] for message in transport.sent) == [
+            "desk@example.com",
+            "ops@example.com",
+        ]
+        assert all(message.html.count("Product:") == 2 for message in transport.sent)
+        assert {message.idempotency_key for message in transport.sent} == {
+            "run:1:email:ops@example.com",
+            "run:1:email:desk@example.com",
+        }
+        with session_factory() as db:
+            assert {row.status for row in db.query(OutboxMessage)} == {"sent"}
+
+        # Sent rows are never delivered again.
+        assert await dispatcher.drain() == 0
+        assert len(transport.sent) == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_send_is_rescheduled_then_dead(self, session_factory):
+        """
+        A failed digest goes back to pending with a later attempt time, and is dead after max attempts.
+        """
+        dispatcher = OutboxDispatcher(
+            session_factory, {"email": FailingTransport()}, max_attempts=2
+        )
+
+        assert await dispatcher.drain() == 4
+        with session_factory() as db:
+            rows = db.query(OutboxMessage).all()
+            assert {row.status for row in rows} == {"pending"}
+            assert {row.attempts for row in rows} == {1}
+            assert all("smtp down" in row.last_error for row in rows)
+            for row in rows:
+                row.next_attempt_at = datetime(2000, 1, 1)
+            db.commit()
+
+        assert await dispatcher.drain() == 4
+        with session_factory() as db:
+            assert {row.status for row in db.query(OutboxMessage)} == {"dead"}
+
+    @pytest.mark.asyncio
+    async def test_digests_are_not_split_across_claims(self, session_factory):
+        """
+        With more rows than one claim holds, each recipient still gets a single digest per batch.
+        """
+        now = datetime.now(timezone.utc)
+        with session_factory() as db:
+            for recipient in ["ops@example.com", "desk@example.com"]:
+                db.add(
+                    OutboxMessage(
+                        idempotency_key=f"run:1:url:3:email:{recipient}",
+                        channel="email",
+                        recipient=recipient,
+                        batch_key="run:1",
+                        payload=json.dumps({"url": "https://example.com/status-windows-10-22H2", "scrape_ids": [10]}),
+                        status="pending",
+                        attempts=0,
+                        next_attempt_at=now,
+                        created_at=now,
+                    )
+                )
+            db.commit()
+        transport = MemoryTransport()
+        dispatcher = OutboxDispatcher(session_factory, {"email": transport}, batch_size=4)
+
+        assert await dispatcher.drain() == 6
+        assert sorted(message.recipients[0] for message in transport.sent) == [
+            "desk@example.com",
+            "ops@example.com",
+        ]
+        assert all(message.html.count("<a href=") == 3 for message in transport.sent)
+
+
+class TestEnqueue:
+    def test_without_recipients_nothing_is_enqueued(self, session_factory, monkeypatch):
+        """
+        With no subscribers and no NOTIFY_DEFAULT_RECIPIENTS, new scrapes are not addressed to anyone.
+        """
+        monkeypatch.setattr("app.notifications.DEFAULT_RECIPIENTS", [])
+        with session_factory() as db:
+            enqueue_new_scrapes(db, "run:2", db.get(URLModel, 1), [db.get(ScrapeModel, 10)])
+            enqueue_new_scrapes(db, "run:2", db.get(URLModel, 1), [db.get(ScrapeModel, 10)], ["ops@example.com"])
+            enqueue_new_scrapes(db, "run:2", db.get(URLModel, 1), [db.get(ScrapeModel, 10)], ["ops@example.com"])
+            db.commit()
+            assert [row.recipient for row in db.query(OutboxMessage).filter_by(batch_key="run:2")] == [
+                "ops@example.com"
+            ]
@@ -0,0 +1,168 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.events import DASHBOARD_CHANNEL, add_listener, remove_listener
+from app.models import URL as URLModel, KnownIssue, Scrape as ScrapeModel
+from app.partitioning import (
+    DEFAULT_PARTITION,
+    add_months,
+    archive_old_scrapes,
+    archive_path,
+    is_partitioned,
+    partition_month,
+    partition_name,
+    partition_scrapes_table,
+)
+
+# A scratch PostgreSQL database to run the partitioning DDL against; its tables are dropped
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def add_history(engine):
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([URLModel(id=1, url="https://example.com/a"), URLModel(id=2, url="https://example.com/b")])
+        rows = [
+            # URL 1 keeps being scraped; its 2023 scrapes are history
+            (1, 1, datetime(2023, 1, 5), False),
+            (2, 1, datetime(2023, 1, 20), True),
+            (3, 1, datetime(2023, 2, 3), False),
+            (4, 1, datetime(2025, 5, 1), False),
+            # URL 2 has not changed since 2023; its latest scrape stays
+            (5, 2, datetime(2023, 1, 7), False),
+            (6, 2, datetime(2023, 2, 9), False),
+        ]
+        db.add_all(
+            ScrapeModel(id=id, url_id=url_id, timestamp=timestamp, content="{}", create_alert=flagged)
+            for id, url_id, timestamp, flagged in rows
+        )
+        db.add(KnownIssue(id=1, url_id=1, fingerprint="f", latest_scrape_id=3))
+        db.commit()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scrapes.db'}")
+    Base.metadata.create_all(bind=engine)
+    add_history(engine)
+    return engine
+
+
+@pytest.fixture
+def postgres():
+    if not POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(POSTGRES_URL)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    add_history(engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+class TestMonths:
+    def test_month_arithmetic_and_names(self):
+        assert add_months(datetime(2024, 11, 1), 2) == datetime(2025, 1, 1)
+        assert add_months(datetime(2024, 1, 1), -1) == datetime(2023, 12, 1)
+        assert partition_name(datetime(2024, 3, 1)) == "scrapes_p2024_03"
+        assert partition_month("scrapes_p2024_03") == datetime(2024, 3, 1)
+        assert partition_month("scrapes_default") is None
+
+
+class TestArchival:
+    def test_old_months_move_to_parquet(self, engine, tmp_path):
+        """
+        Every scrape of an archived month is in its Parquet file; only the latest scrape of each URL
+        and known issue and flagged scrapes stay in the database.
+        """
+        archive_dir = tmp_path / "archive"
+        written = archive_old_scrapes(engine, str(archive_dir), retention_months=12, now=datetime(2025, 6, 15))
+        assert written == [
+            archive_path(str(archive_dir), datetime(2023, 1, 1)),
+            archive_path(str(archive_dir), datetime(2023, 2, 1)),
+        ]
+        january = pd.read_parquet(written[0])
+        assert sorted(january["id"]) == [1, 2, 5]
+        assert set(january.columns) >= {"id", "url_id", "timestamp", "content", "hash"}
+        assert sorted(pd.read_parquet(written[1])["id"]) == [3, 6]
+
+        with engine.connect() as connection:
+            remaining = connection.execute(select(ScrapeModel.id).order_by(ScrapeModel.id)).scalars().all()
+        assert remaining == [2, 3, 4, 6]
+
+    def test_runs_are_idempotent(self, engine, tmp_path):
+        archive_dir = str(tmp_path / "archive")
+        archive_old_scrapes(engine, archive_dir, retention_months=12, now=datetime(2025, 6, 15))
+        assert archive_old_scrapes(engine, archive_dir, retention_months=12, now=datetime(2025, 6, 15)) == []
+        assert archive_old_scrapes(engine, archive_dir, retention_months=0) == []
+        assert sorted(pd.read_parquet(archive_path(archive_dir, datetime(2023, 1, 1)))["id"]) == [1, 2, 5]
+
+    def test_archived_urls_are_published(self, engine, tmp_path):
+        """
+        Every replica's response cache hears about the URLs whose scrapes were archived.
+        """
+        events = []
+        add_listener(DASHBOARD_CHANNEL, events.append)
+        try:
+            archive_old_scrapes(engine, str(tmp_path / "archive"), retention_months=12, now=datetime(2025, 6, 15))
+        finally:
+            remove_listener(DASHBOARD_CHANNEL, events.append)
+        published = [json.loads(payload) for payload in events]
+        assert {(event["type"], event["url_id"]) for event in published} == {
+            ("scrape.archived", 1),
+            ("scrape.archived", 2),
+        }
+
+
+class TestPostgres:
+    def test_partitions_keep_foreign_keys_and_rows_without_timestamp(self, postgres, tmp_path):
+        """
+        Converting to a partitioned table keeps every row, including one without a timestamp, and
+        the foreign keys of scrapes; old months are then archived by dropping their partitions.
+        """
+        with sessionmaker(bind=postgres)() as db:
+            db.add(ScrapeModel(id=7, url_id=2, timestamp=None, content="{}"))
+            db.commit()
+
+        partition_scrapes_table(postgres, now=datetime(2025, 6, 15))
+        with postgres.connect() as connection:
+            assert is_partitioned(connection)
+            foreign_keys = connection.execute(
+                text(
+                    "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+                    "WHERE contype = 'f' AND conrelid = 'scrapes'::regclass"
+                )
+            ).scalars().all()
+            assert sorted(foreign_keys) == [
+                "FOREIGN KEY (known_issue_id) REFERENCES known_issues(id)",
+                "FOREIGN KEY (url_id) REFERENCES urls(id)",
+            ]
+            assert connection.execute(
+                text(f"SELECT id FROM {DEFAULT_PARTITION}")
+            ).scalars().all() == [7]
+            assert connection.execute(select(ScrapeModel.id).order_by(ScrapeModel.id)).scalars().all() == [1, 2, 3, 4, 5, 6, 7]
+
+        with pytest.raises(IntegrityError):
+            with sessionmaker(bind=postgres)() as db:
+                db.add(ScrapeModel(url_id=99, timestamp=datetime(2025, 6, 1), content="{}"))
+                db.commit()
+
+        written = archive_old_scrapes(postgres, str(tmp_path / "archive"), retention_months=12, now=datetime(2025, 6, 15))
+        assert written == [
+            archive_path(str(tmp_path / "archive"), datetime(2023, 1, 1)),
+            archive_path(str(tmp_path / "archive"), datetime(2023, 2, 1)),
+        ]
+        assert sorted(pd.read_parquet(written[0])["id"]) == [1, 2, 5]
+        with postgres.connect() as connection:
+            assert partition_name(datetime(2023, 1, 1)) not in connection.execute(
+                text("SELECT tablename FROM pg_tables")
+            ).scalars().all()
+            assert connection.execute(select(ScrapeModel.id).order_by(ScrapeModel.id)).scalars().all() == [2, 3, 4, 6, 7]
@@ -0,0 +1,123 @@
+import os
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, event, insert, select, text
+
+from app import database
+from app.database import Base, ReadRouter, insert_for
+from app.events import notify
+from app.main import READ_YOUR_WRITES_COOKIE, app, response_cache, url_repo
+from app.models import Scrape as ScrapeModel
+
+# Set both to run against PostgreSQL, e.g. two instances or one instance under two URLs
+PRIMARY_URL = os.getenv("TEST_PRIMARY_URL")
+REPLICA_URL = os.getenv("TEST_REPLICA_URL")
+
+
+@pytest.fixture
+def engines(tmp_path):
+    if PRIMARY_URL and REPLICA_URL:
+        primary, replica = create_engine(PRIMARY_URL), create_engine(REPLICA_URL)
+    else:
+        primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}", connect_args={"check_same_thread": False})
+        replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=replica)
+    Base.metadata.create_all(bind=primary)
+    for engine in (primary, replica):
+        engine.queries = []
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args, engine=engine: engine.queries.append(statement),
+        )
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def now():
+    return [datetime(2024, 6, 1).timestamp()]
+
+
+@pytest.fixture
+def client(engines, now, monkeypatch):
+    primary, replica = engines
+    router = ReadRouter(primary, replica, window=5, clock=lambda: now[0])
+    for name in ("sessions", "replica", "window", "clock"):
+        monkeypatch.setattr(database.read_router, name, getattr(router, name))
+    response_cache.invalidate()
+    url_repo.cache.clear()
+    yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    response_cache.invalidate()
+    url_repo.cache.clear()
+
+
+def selects(engine):
+    return [query for query in engine.queries if query.lstrip().upper().startswith("SELECT")]
+
+
+class TestRoutingSession:
+    def test_writes_pin_the_session_to_the_primary(self, engines):
+        primary, replica = engines
+        router = ReadRouter(primary, replica)
+        with router.sessions(replica=replica) as db:
+            db.execute(select(ScrapeModel.id)).all()
+            assert selects(replica) and not primary.queries
+            db.execute(insert(ScrapeModel).values(url_id=1, content="{}", timestamp=datetime(2024, 6, 1)))
+            replica.queries.clear()
+            db.execute(select(ScrapeModel.id)).all()
+            assert db.wrote
+            assert not replica.queries
+
+    def test_only_writes_pin_the_session_to_the_primary(self, engines):
+        """
+        Textual SELECTs and bind lookups, e.g. to pick a dialect, are reads; a NOTIFY is a write.
+        """
+        primary, replica = engines
+        with ReadRouter(primary, replica).sessions(replica=replica) as db:
+            insert_for(db)
+            db.execute(text("SELECT 1"))
+            assert not db.wrote and replica.queries and not primary.queries
+
+            notify(db, "ch")
+            db.execute(text("SELECT 1"))
+            assert db.wrote and primary.queries
+
+
+class TestReadYourWrites:
+    @pytest.mark.asyncio
+    async def test_reads_follow_the_clients_writes(self, client, engines, now):
+        """
+        GETs read from the replica, except for a client within the window after its own write.
+        """
+        primary, replica = engines
+        await client.get("/scrapes/")
+        assert selects(replica) and not selects(primary)
+
+        response = await client.post("/urls/", json={"url": "https://example.com/replicated"})
+        assert response.status_code == 200
+        assert READ_YOUR_WRITES_COOKIE in response.cookies
+
+        primary.queries.clear()
+        replica.queries.clear()
+        await client.get("/scrapes/")
+        assert selects(primary) and not selects(replica)
+
+        now[0] += 6
+        primary.queries.clear()
+        await client.get("/scrapes/")
+        assert not selects(primary)
+
+    @pytest.mark.asyncio
+    async def test_reads_do_not_start_a_window(self, client):
+        response = await client.get("/scrapes/")
+        assert READ_YOUR_WRITES_COOKIE not in response.cookies
+
+    @pytest.mark.asyncio
+    async def test_cached_responses_are_built_from_the_primary(self, client, engines):
+        primary, replica = engines
+        await client.get("/flagged_scrapes/")
+        assert selects(primary) and not selects(replica)
@@ -0,0 +1,146 @@
+import pytest
+
+from app.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HostRateLimiter,
+    RetryPolicy,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRetryPolicy:
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors_until_success(self):
+        """
+        Retryable failures are retried with jittered delays bounded by the backoff ceiling.
+        """
+        clock = FakeClock()
+        policy = RetryPolicy(max_attempts=4, base_delay=1, max_delay=3, sleep=clock.sleep)
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 4:
+                raise OSError("connection reset")
+            return "ok"
+
+        assert await policy.run(flaky, lambda e: isinstance(e, OSError)) == "ok"
+        assert attempts == 4
+        assert len(clock.sleeps) == 3
+        assert all(0 <= delay <= ceiling for delay, ceiling in zip(clock.sleeps, [1, 2, 3]))
+
+    @pytest.mark.asyncio
+    async def test_does_not_retry_permanent_errors(self):
+        """
+        A non-retryable error is raised on the first attempt.
+        """
+        clock = FakeClock()
+        policy = RetryPolicy(max_attempts=5, sleep=clock.sleep)
+
+        async def broken():
+            raise ValueError("bad page")
+
+        with pytest.raises(ValueError):
+            await policy.run(broken, lambda e: isinstance(e, OSError))
+        assert clock.sleeps == []
+
+    @pytest.mark.asyncio
+    async def test_honours_retry_after(self):
+        """
+        A server-requested Retry-After is a lower bound on the backoff.
+        """
+        clock = FakeClock()
+        policy = RetryPolicy(max_attempts=2, base_delay=0.1, sleep=clock.sleep)
+        attempts = 0
+
+        async def throttled():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise OSError("429")
+            return "ok"
+
+        await policy.run(throttled, lambda e: True, lambda e: 10)
+        assert clock.sleeps == [10]
+
+    @pytest.mark.asyncio
+    async def test_gives_up_on_retry_after_beyond_max_delay(self):
+        """
+        A Retry-After longer than the backoff ceiling is raised at once rather than waited out.
+        """
+        clock = FakeClock()
+        policy = RetryPolicy(max_attempts=3, max_delay=30, sleep=clock.sleep)
+
+        async def throttled():
+            raise OSError("429")
+
+        with pytest.raises(OSError):
+            await policy.run(throttled, lambda e: True, lambda e: 3600)
+        assert clock.sleeps == []
+
+
+class TestHostRateLimiter:
+    @pytest.mark.asyncio
+    async def test_spaces_requests_per_host(self):
+        """
+        Back-to-back requests to one host are spaced by the interval; other hosts are unaffected.
+        """
+        clock = FakeClock()
+        limiter = HostRateLimiter(min_interval=2, clock=clock, sleep=clock.sleep)
+
+        await limiter.acquire("learn.microsoft.com")
+        await limiter.acquire("learn.microsoft.com")
+        await limiter.acquire("support.microsoft.com")
+        assert clock.sleeps == [2]
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold_and_fails_fast(self):
+        """
+        Consecutive failures open the breaker; calls then fail fast until the reset timeout.
+        """
+        clock = FakeClock()
+        breaker = CircuitBreaker("learn.microsoft.com", failure_threshold=2, reset_timeout=60, clock=clock)
+
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_half_open_trial_closes_or_reopens(self):
+        """
+        After the reset timeout one trial call is allowed; success closes, failure reopens.
+        """
+        clock = FakeClock()
+        breaker = CircuitBreaker("learn.microsoft.com", failure_threshold=1, reset_timeout=60, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 61
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        clock.now = 122
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.before_call()
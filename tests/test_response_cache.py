@@ -0,0 +1,138 @@
+import json
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.database import Base, get_db
+from app.main import app, response_cache, url_repo
+from app.models import URL as URLModel, Scrape as ScrapeModel
+from app.response_cache import ResponseCache, etag_matches, url_tag
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'cache.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(URLModel(id=1, url="https://example.com/a"))
+        db.add(
+            ScrapeModel(
+                id=1,
+                url_id=1,
+                timestamp=datetime(2024, 6, 1),
+                content=json.dumps(
+                    {"known_issues": {"row": {"Summary": "Issue", "Last updated": "2024-06-01 10:00 PT"}}}
+                ),
+            )
+        )
+        db.commit()
+    engine.queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: engine.queries.append(args[2]))
+    return engine
+
+
+@pytest.fixture
+def client(engine):
+    factory = sessionmaker(bind=engine)
+
+    def override_get_db():
+        with factory() as db:
+            yield db
+
+    response_cache.invalidate()
+    url_repo.cache.clear()
+    app.dependency_overrides[get_db] = override_get_db
+    yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    app.dependency_overrides.pop(get_db, None)
+    response_cache.invalidate()
+    url_repo.cache.clear()
+
+
+def make_request(path, query=b""):
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query, "headers": []})
+
+
+class TestConditionalRequests:
+    @pytest.mark.asyncio
+    async def test_unchanged_data_costs_a_304_without_queries(self, client, engine):
+        """
+        A repeated read is served from the cache, and a matching If-None-Match gets an empty 304.
+        """
+        first = await client.get("/scrapes/urlid/1")
+        etag = first.headers["etag"]
+        assert first.status_code == 200
+        assert [scrape["id"] for scrape in first.json()] == [1]
+
+        engine.queries.clear()
+        again = await client.get("/scrapes/urlid/1")
+        revalidated = await client.get("/scrapes/urlid/1", headers={"If-None-Match": etag})
+        assert again.content == first.content
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+        assert engine.queries == []
+
+    @pytest.mark.asyncio
+    async def test_writes_invalidate(self, client):
+        """
+        Triage changes the scrapes and flagged lists; a new URL changes the URL list.
+        """
+        scrapes = await client.get("/scrapes/urlid/1")
+        flagged = await client.get("/flagged_scrapes/")
+        urls = await client.get("/urls/")
+        latest = await client.get("/latest", params={"url": "https://example.com/a"})
+        assert flagged.json() == []
+        assert latest.json()["known_issues"]["row"]["Summary"] == "Issue"
+
+        await client.put("/scrapes/1", json={"create_alert": True})
+        for response, path in ((scrapes, "/scrapes/urlid/1"), (flagged, "/flagged_scrapes/")):
+            fresh = await client.get(path, headers={"If-None-Match": response.headers["etag"]})
+            assert fresh.status_code == 200
+            assert fresh.headers["etag"] != response.headers["etag"]
+        unchanged = await client.get("/urls/", headers={"If-None-Match": urls.headers["etag"]})
+        assert unchanged.status_code == 304
+
+        await client.post("/urls/", json={"url": "https://example.com/b"})
+        fresh = await client.get("/urls/", headers={"If-None-Match": urls.headers["etag"]})
+        assert [url["url"] for url in fresh.json()] == ["https://example.com/a", "https://example.com/b"]
+        unchanged = await client.get(
+            "/latest",
+            params={"url": "https://example.com/a"},
+            headers={"If-None-Match": latest.headers["etag"]},
+        )
+        assert unchanged.status_code == 304
+
+
+class TestResponseCache:
+    def test_read_racing_a_write_is_not_stored(self):
+        cache = ResponseCache()
+        request = make_request("/scrapes/urlid/1")
+
+        def stale_build():
+            cache.invalidate(url_tag(1))
+            return b"[]"
+
+        cache.respond(request, [url_tag(1)], stale_build)
+        calls = []
+        cache.respond(request, [url_tag(1)], lambda: calls.append(1) or b"[1]")
+        assert calls == [1]
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(max_entries=1)
+        cache.respond(make_request("/urls/", b"limit=1"), ["urls"], lambda: b"[]")
+        cache.respond(make_request("/urls/", b"limit=2"), ["urls"], lambda: b"[]")
+        cache.respond(make_request("/urls/", b"limit=1"), ["urls"], lambda: b"[]")
+        assert (cache.hits, cache.misses) == (0, 3)
+
+    def test_if_none_match_parsing(self):
+        assert etag_matches('W/"abc", "def"', '"abc"')
+        assert etag_matches("*", '"abc"')
+        assert not etag_matches('"abd"', '"abc"')
+        assert not etag_matches(None, '"abc"')
@@ -0,0 +1,177 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import main
+from app.clustering import IssueClusterer
+from app.database import Base
+from app.events import SUBSCRIPTION_CHANNEL, add_listener, notify, remove_listener
+from app.models import URL as URLModel, Scrape as ScrapeModel, Subscription
+from app.notifications import MemoryTransport, OutboxDispatcher
+from app.routing import SubscriptionIndex, SubscriptionRouter, issue_kbs
+
+
+def make_scrape(scrape_id, status, originating_update="N/A"):
+    row = {
+        "Summary": "Taskbar might not load",
+        "Originating update": originating_update,
+        "Status": status,
+        "Last updated": "2024-06-28 13:33 PT",
+    }
+    return ScrapeModel(
+        id=scrape_id,
+        content=json.dumps({"known_issues": {"header": "Known issues", "row": row}}),
+    )
+
+
+class TestSubscriptionIndex:
+    def test_matches_on_every_filtered_dimension(self):
+        """
+        A subscription matches only when its product, keyword and KB filters all match.
+        """
+        index = SubscriptionIndex()
+        index.add(1, "win11@example.com", products=["Windows 11 23H2"])
+        index.add(2, "resolved@example.com", status_keywords=["Resolved"])
+        index.add(3, "kb@example.com", kb_numbers=["5039302"])
+        index.add(4, "server@example.com", products=["windows-server-2022"], status_keywords=["confirmed"])
+        index.add(5, "everything@example.com")
+
+        kbs = issue_kbs({"Originating update": "OS Build 22621.3810 | KB5039302 | 2024-06-25"})
+        assert index.match("Windows 11 23h2", "Confirmed", kbs) == {
+            "win11@example.com",
+            "kb@example.com",
+            "everything@example.com",
+        }
+        assert index.match("Windows Server 2022", "Resolved KB5041054", set()) == {
+            "resolved@example.com",
+            "everything@example.com",
+        }
+        assert index.match("Windows Server 2022", "Confirmed", set()) == {
+            "server@example.com",
+            "everything@example.com",
+        }
+
+    def test_multi_word_keywords_need_every_word(self):
+        """
+        A keyword of several words matches a status containing all of them, in any case.
+        """
+        index = SubscriptionIndex()
+        index.add(1, "external@example.com", status_keywords=["Mitigated External"])
+        index.add(2, "either@example.com", status_keywords=["resolved", "mitigated  external"])
+
+        assert index.match("Windows 11 23H2", "Mitigated External", set()) == {
+            "external@example.com",
+            "either@example.com",
+        }
+        assert index.match("Windows 11 23H2", "Mitigated", set()) == set()
+        assert index.match("Windows 11 23H2", "Resolved KB5041054", set()) == {"either@example.com"}
+
+    def test_issue_kbs_reads_originating_update_and_status(self):
+        """
+        KB numbers are picked up from both the originating update and a resolution in the status.
+        """
+        row = {"Originating update": "OS Build 20348.2527 | KB5039227 | 2024-06-11", "Status": "Resolved KB5041054"}
+        assert issue_kbs(row) == {"KB5039227", "KB5041054"}
+
+
+class TestSubscriptionRouter:
+    def test_groups_scrapes_by_recipient(self):
+        """
+        Each recipient gets exactly the new scrapes that match its subscriptions.
+        """
+        router = SubscriptionRouter()
+        router.index.add(1, "resolved@example.com", status_keywords=["resolved"])
+        router.index.add(2, "win10@example.com", products=["Windows 10 22H2"])
+        db_url = URLModel(id=4, url="https://learn.microsoft.com/en-us/windows/release-health/status-windows-10-22H2")
+        resolved, confirmed = make_scrape(1, "Resolved"), make_scrape(2, "Confirmed")
+
+        routed = router.route(db_url, [resolved, confirmed])
+        assert routed == {
+            "resolved@example.com": [resolved],
+            "win10@example.com": [resolved, confirmed],
+        }
+
+    def test_falls_back_to_default_recipients_without_subscriptions(self, monkeypatch):
+        """
+        With no subscriptions configured, every new scrape goes to the default recipients.
+        """
+        monkeypatch.setattr("app.routing.DEFAULT_RECIPIENTS", ["ops@example.com"])
+        scrape = make_scrape(1, "Confirmed")
+        db_url = URLModel(id=1, url="https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-23H2")
+
+        assert SubscriptionRouter().route(db_url, [scrape]) == {"ops@example.com": [scrape]}
+
+    def test_every_router_rebuilds_on_subscription_events(self, tmp_path):
+        """
+        A committed subscription change reaches every router listening for it, not just the one in
+        the process that wrote it.
+        """
+        engine = create_engine(f"sqlite:///{tmp_path / 'subscriptions.db'}")
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        routers = [SubscriptionRouter(factory), SubscriptionRouter(factory)]
+        for router in routers:
+            add_listener(SUBSCRIPTION_CHANNEL, router.on_subscription_event)
+        try:
+            with factory() as db:
+                db.add(Subscription(email="ops@example.com", status_keywords='["resolved"]', active=True))
+                notify(db, SUBSCRIPTION_CHANNEL)
+                db.rollback()
+            assert [len(router.index) for router in routers] == [0, 0]
+
+            with factory() as db:
+                db.add(Subscription(email="ops@example.com", status_keywords='["resolved"]', active=True))
+                notify(db, SUBSCRIPTION_CHANNEL)
+                db.commit()
+            assert [len(router.index) for router in routers] == [1, 1]
+        finally:
+            for router in routers:
+                remove_listener(SUBSCRIPTION_CHANNEL, router.on_subscription_event)
+
+
+class TestRunDigests:
+    @pytest.mark.asyncio
+    async def test_one_digest_per_recipient_per_run(self, tmp_path, monkeypatch):
+        """
+        A run whose subscribers and new scrapes add up to more outbox rows than one claim still sends
+        each recipient exactly one digest.
+        """
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'run.db'}", connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        with factory() as db:
+            db.add_all(
+                URLModel(id=n, url=f"https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-2{n}H2")
+                for n in (1, 2, 3)
+            )
+            db.commit()
+
+        router = SubscriptionRouter()
+        router.index.add(1, "ops@example.com")
+        router.index.add(2, "desk@example.com")
+
+        async def run_scrape(url_data, enable_deep_scrape=False):
+            row = {"Summary": f"Issue on {url_data.url}", "Status": "Confirmed", "Last updated": "2024-06-28"}
+            return {"known_issues": {"header": "Known issues", "row": [row]}}
+
+        monkeypatch.setattr(main, "SessionLocal", factory)
+        monkeypatch.setattr(main, "run_scrape", run_scrape)
+        monkeypatch.setattr(main, "subscription_router", router)
+        monkeypatch.setattr(main, "kick_outbox_dispatcher", lambda: None)
+        monkeypatch.setattr(main, "issue_clusterer", IssueClusterer())
+
+        report = await main.scrape_all_urls_task(False)
+        assert len(report.succeeded) == 3
+
+        transport = MemoryTransport()
+        dispatcher = OutboxDispatcher(factory, {"email": transport}, batch_size=4)
+        assert await dispatcher.drain() == 6
+        assert sorted(message.recipients[0] for message in transport.sent) == [
+            "desk@example.com",
+            "ops@example.com",
+        ]
+        assert all(message.html.count("<a href=") == 3 for message in transport.sent)
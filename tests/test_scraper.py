@@ -0,0 +1,200 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import main, scraper
+from app.admission import AdmissionRejected
+from app.clustering import IssueClusterer
+from app.database import Base
+from app.models import URL as URLModel, ScrapeRunItem
+from app.schemas import URLBase as URLSchema
+from app.scraper import (
+    ScrapeHTTPError,
+    ScrapeRunReport,
+    ScrapeTimeoutError,
+    fetch_page,
+    is_transient_scrape_error,
+    scrape_url,
+)
+
+STATUS_PAGE = (Path(__file__).parent / "data" / "release_health" / "status-windows-11-23h2.html").read_text()
+
+
+class SlowPage:
+    """
+    Stands in for a browser page whose navigation or content read takes a given time.
+    """
+
+    class Response:
+        def __init__(self, status):
+            self.status = status
+            self.headers = {"retry-after": "7"}
+
+    def __init__(self, goto_delay=0, content_delay=0, status=200):
+        self.goto_delay = goto_delay
+        self.content_delay = content_delay
+        self.status = status
+
+    async def goto(self, url, timeout=None):
+        await asyncio.sleep(self.goto_delay)
+        return self.Response(self.status)
+
+    async def content(self):
+        await asyncio.sleep(self.content_delay)
+        return STATUS_PAGE
+
+
+@pytest.fixture
+def short_timeouts(monkeypatch):
+    monkeypatch.setattr(scraper, "NAVIGATION_TIMEOUT", 0.05)
+    monkeypatch.setattr(scraper, "CONTENT_TIMEOUT", 0.05)
+    monkeypatch.setattr(scraper, "PARSE_TIMEOUT", 0.05)
+
+
+class TestPhaseTimeouts:
+    @pytest.mark.asyncio
+    async def test_navigation_timeout(self, short_timeouts):
+        with pytest.raises(ScrapeTimeoutError) as raised:
+            await fetch_page(SlowPage(goto_delay=1), "https://example.com/a")
+        assert (raised.value.url, raised.value.phase) == ("https://example.com/a", "navigation")
+
+    @pytest.mark.asyncio
+    async def test_content_timeout(self, short_timeouts):
+        with pytest.raises(ScrapeTimeoutError) as raised:
+            await fetch_page(SlowPage(content_delay=1), "https://example.com/a")
+        assert raised.value.phase == "content"
+
+    @pytest.mark.asyncio
+    async def test_throttling_is_raised_with_retry_after(self, short_timeouts):
+        assert await fetch_page(SlowPage(), "https://example.com/a") == STATUS_PAGE
+        with pytest.raises(ScrapeHTTPError) as raised:
+            await fetch_page(SlowPage(status=429), "https://example.com/a")
+        assert (raised.value.status, raised.value.retry_after) == (429, 7)
+
+    @pytest.mark.asyncio
+    async def test_parse_timeout(self, short_timeouts, monkeypatch):
+        """
+        A parse running past its budget is abandoned and reported as a parse timeout.
+        """
+
+        async def fetch(url):
+            return STATUS_PAGE
+
+        def slow_parse(content, enable_deep_scrape=False):
+            time.sleep(0.3)
+            return {}
+
+        monkeypatch.setattr(scraper, "scrape_url_async", fetch)
+        monkeypatch.setattr(scraper, "parse_scraped_content", slow_parse)
+        with pytest.raises(ScrapeTimeoutError) as raised:
+            await scrape_url(URLSchema(url="https://example.com/a"))
+        assert raised.value.phase == "parse"
+
+    @pytest.mark.asyncio
+    async def test_run_deadline_and_phase_timeouts_are_reported(self, tmp_path, monkeypatch):
+        """
+        A phase timeout marks its URL timed out; URLs the run deadline cut off stay pending for a resumed run.
+        """
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'run.db'}", connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        urls = [f"https://example.com/status-{n}" for n in (1, 2, 3)]
+        with factory() as db:
+            db.add_all(URLModel(id=n, url=url) for n, url in enumerate(urls, 1))
+            db.commit()
+
+        async def run_scrape(url_data, enable_deep_scrape=False):
+            if url_data.url == urls[0]:
+                raise ScrapeTimeoutError(url_data.url, "content")
+            await asyncio.sleep(1)
+
+        monkeypatch.setattr(main, "SessionLocal", factory)
+        monkeypatch.setattr(main, "run_scrape", run_scrape)
+        monkeypatch.setattr(main, "RUN_DEADLINE", 0.2)
+        monkeypatch.setattr(main, "kick_outbox_dispatcher", lambda: None)
+        monkeypatch.setattr(main, "issue_clusterer", IssueClusterer())
+
+        report = await main.scrape_all_urls_task(False)
+        assert report.timed_out == {urls[0]: "content", urls[1]: "run_deadline", urls[2]: "run_deadline"}
+        assert report.to_dict()["finished_at"] is not None
+        assert "timed out during run_deadline" in report.summary()
+        with factory() as db:
+            states = {item.url_id: item.state for item in db.query(ScrapeRunItem)}
+        assert states == {1: "timed_out", 2: "pending", 3: "pending"}
+
+    @pytest.mark.asyncio
+    async def test_urls_rejected_by_admission_stay_pending(self, tmp_path, monkeypatch):
+        """
+        A URL that found the scrape queue full is left for a resumed run instead of failing it.
+        """
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'run.db'}", connect_args={"check_same_thread": False}
+        )
+        Base.metadata.create_all(bind=engine)
+        factory = sessionmaker(bind=engine)
+        with factory() as db:
+            db.add(URLModel(id=1, url="https://example.com/status-1"))
+            db.commit()
+
+        async def run_scrape(url_data, enable_deep_scrape=False):
+            raise AdmissionRejected(429, "Too many scrape requests queued")
+
+        monkeypatch.setattr(main, "SessionLocal", factory)
+        monkeypatch.setattr(main, "run_scrape", run_scrape)
+        monkeypatch.setattr(main, "kick_outbox_dispatcher", lambda: None)
+
+        report = await main.scrape_all_urls_task(False)
+        assert report.failed == {"https://example.com/status-1": "Too many scrape requests queued"}
+        with factory() as db:
+            assert db.query(ScrapeRunItem).one().state == "pending"
+
+
+class TestRunReport:
+    def test_summary_lists_every_outcome(self):
+        report = ScrapeRunReport()
+        report.record_success("https://example.com/a")
+        report.record_failure("https://example.com/b", ValueError("bad page"))
+        report.record_timeout("https://example.com/c", "navigation")
+        report.finish()
+
+        assert report.to_dict()["failed"] == {"https://example.com/b": "bad page"}
+        assert report.summary().splitlines() == [
+            "Scrape run: 1 succeeded, 1 failed, 1 timed out",
+            "  timed out during navigation: https://example.com/c",
+            "  failed: https://example.com/b: bad page",
+        ]
+
+
+class TestTransientErrors:
+    def test_retries_only_transient_failures(self):
+        """
+        Throttling, server errors, connection problems and fetch timeouts are retried; permanent failures are not.
+        """
+        url = "https://example.com/a"
+        transient = [
+            ScrapeHTTPError(url, 503),
+            ScrapeHTTPError(url, 429),
+            ScrapeTimeoutError(url, "navigation"),
+            ScrapeTimeoutError(url, "content"),
+            ConnectionResetError(),
+            TimeoutError(),
+            PlaywrightTimeoutError("Timeout 30000ms exceeded"),
+            PlaywrightError("net::ERR_CONNECTION_REFUSED at https://example.com/a"),
+        ]
+        permanent = [
+            ScrapeTimeoutError(url, "parse"),
+            PermissionError("archive is read-only"),
+            FileNotFoundError("chromium"),
+            PlaywrightError("Executable doesn't exist at /ms-playwright/chromium"),
+            ValueError("bad page"),
+        ]
+        assert all(is_transient_scrape_error(error) for error in transient)
+        assert not any(is_transient_scrape_error(error) for error in permanent)
@@ -0,0 +1,142 @@
+import json
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.main import app, response_cache
+from app.models import URL as URLModel, Scrape as ScrapeModel
+from app.schemas import Scrape as ScrapeSchema
+from app.serialization import choose_encoding, columns_for, dump_many, sparse_schema
+
+
+@pytest.fixture
+def factory():
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    content = json.dumps({"known_issues": {"row": {"Summary": "Issue " * 50, "Last updated": "2024-06-01 10:00 PT"}}})
+    with factory() as db:
+        db.add(URLModel(id=1, url="https://example.com/a"))
+        db.add_all(
+            ScrapeModel(url_id=1, timestamp=datetime(2024, 6, 1, n), content=content, hash=f"{n:032x}")
+            for n in range(20)
+        )
+        db.commit()
+    factory.queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: factory.queries.append(args[2]))
+    return factory
+
+
+@pytest.fixture
+def client(factory):
+    def override_get_db():
+        with factory() as db:
+            yield db
+
+    response_cache.invalidate()
+    app.dependency_overrides[get_db] = override_get_db
+    yield AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    app.dependency_overrides.pop(get_db, None)
+    response_cache.invalidate()
+
+
+class TestDumpMany:
+    def test_matches_response_model_output(self, factory):
+        """
+        Mapping rows of the schema's columns serialize exactly as the ORM objects would.
+        """
+        with factory() as db:
+            objects = db.execute(select(ScrapeModel)).scalars().all()
+            expected = [ScrapeSchema.model_validate(scrape).model_dump(mode="json") for scrape in objects]
+            rows = db.execute(select(*columns_for(ScrapeModel, ScrapeSchema))).mappings().all()
+        assert json.loads(dump_many(ScrapeSchema, rows)) == expected
+        assert json.loads(dump_many(ScrapeSchema, objects)) == expected
+
+
+class TestChooseEncoding:
+    def test_honours_q_values(self):
+        assert choose_encoding("gzip, deflate", 4096) == "gzip"
+        assert choose_encoding("gzip;q=0, identity", 4096) is None
+        assert choose_encoding("*", 4096) is not None
+        assert choose_encoding("gzip", 10) is None
+        assert choose_encoding(None, 4096) is None
+
+
+class TestCompressedResponses:
+    @pytest.mark.asyncio
+    async def test_gzip_body_decodes_to_the_same_list(self, client):
+        plain = await client.get("/scrapes/", headers={"Accept-Encoding": "identity"})
+        compressed = await client.get("/scrapes/", headers={"Accept-Encoding": "gzip"})
+        assert plain.headers.get("content-encoding") is None
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert compressed.headers["vary"] == "Accept-Encoding"
+        assert int(compressed.headers["content-length"]) < len(plain.content)
+        assert compressed.json() == plain.json()
+        assert len(plain.json()) == 20
+
+    @pytest.mark.asyncio
+    async def test_cached_variants_have_their_own_etags(self, client):
+        """
+        The cache compresses once per coding and gives the gzip representation a distinct ETag.
+        """
+        plain = await client.get("/scrapes/urlid/1", headers={"Accept-Encoding": "identity"})
+        compressed = await client.get("/scrapes/urlid/1", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+        assert compressed.json() == plain.json()
+
+        revalidated = await client.get(
+            "/scrapes/urlid/1",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]},
+        )
+        assert revalidated.status_code == 304
+        assert "content-encoding" not in revalidated.headers
+        stale = await client.get(
+            "/scrapes/urlid/1",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]},
+        )
+        assert stale.status_code == 200
+        assert stale.json() == plain.json()
+
+
+class TestSparseFieldsets:
+    def test_sparse_schema(self):
+        schema = sparse_schema(ScrapeSchema, "timestamp, create_alert")
+        assert list(schema.model_fields) == ["timestamp", "create_alert", "id"]
+        assert sparse_schema(ScrapeSchema, "create_alert,timestamp") is schema
+        assert sparse_schema(ScrapeSchema, "") is ScrapeSchema
+        assert sparse_schema(ScrapeSchema, ",".join(ScrapeSchema.model_fields)) is ScrapeSchema
+        with pytest.raises(ValueError, match="minhash"):
+            sparse_schema(ScrapeSchema, "id,minhash")
+
+    @pytest.mark.asyncio
+    async def test_unrequested_columns_are_not_selected(self, client, factory):
+        """
+        `fields` narrows the SELECT itself, not just the serialized output.
+        """
+        factory.queries.clear()
+        flagged = await client.get("/flagged_scrapes/", params={"fields": "url_id,timestamp"})
+        listed = await client.get("/scrapes/", params={"fields": "create_alert", "limit": 2})
+        single = await client.get("/scrapes/1", params={"fields": "hash"})
+        assert flagged.json() == []
+        assert listed.json() == [{"create_alert": False, "id": 1}, {"create_alert": False, "id": 2}]
+        assert single.json() == {"id": 1, "hash": f"{0:032x}"}
+        assert not any("content" in query for query in factory.queries)
+
+    @pytest.mark.asyncio
+    async def test_scrapes_by_url_keep_their_order(self, client):
+        full = await client.get("/scrapes/urlid/1", params={"limit": 5})
+        sparse = await client.get("/scrapes/urlid/1", params={"limit": 5, "fields": "timestamp"})
+        assert sparse.json() == [{"id": s["id"], "timestamp": s["timestamp"]} for s in full.json()]
+
+    @pytest.mark.asyncio
+    async def test_unknown_field_is_rejected(self, client):
+        response = await client.get("/scrapes/", params={"fields": "id,nope"})
+        assert response.status_code == 400
+        assert "nope" in response.json()["detail"]
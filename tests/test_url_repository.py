@@ -0,0 +1,184 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app import events
+from app.events import (
+    URL_CHANNEL,
+    EventBus,
+    PostgresListener,
+    add_listener,
+    remove_listener,
+    run_listeners,
+)
+from app.import_urls import read_urls
+from app.main import app, url_repo
+from app.models import URL as URLModel
+from app.url_repository import NOTIFY_PAYLOAD_LIMIT, URLCache, URLRepository, normalize_url
+
+
+@pytest.fixture
+def factory():
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(URLModel(url="https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-23H2"))
+        db.commit()
+    return factory
+
+
+class TestNormalizeURL:
+    def test_equivalent_spellings_match(self):
+        assert normalize_url("  HTTPS://Learn.Microsoft.com:443/en-us/Page#known-issues ") == (
+            "https://learn.microsoft.com/en-us/Page#known-issues"
+        )
+        assert normalize_url("http://example.com") == "http://example.com/"
+        assert normalize_url("http://example.com:8080/a") == "http://example.com:8080/a"
+
+    def test_rejects_non_http(self):
+        assert normalize_url("ftp://example.com/a") is None
+        assert normalize_url("not a url") is None
+        assert normalize_url("http://example.com:99999/") is None
+
+
+class TestBulkCreate:
+    def test_dedupes_against_cache_and_input(self, factory):
+        """
+        Known URLs, repeats in the input and invalid entries are skipped; the rest are inserted once.
+        """
+        repo = URLRepository()
+        with factory() as db:
+            repo.load_cache(db)
+            result = repo.bulk_create(
+                db,
+                [
+                    "https://LEARN.microsoft.com/en-us/windows/release-health/status-windows-11-23H2",
+                    "https://learn.microsoft.com/en-us/windows/release-health/status-windows-10-22H2",
+                    "https://learn.microsoft.com:443/en-us/windows/release-health/status-windows-10-22H2",
+                    "mailto:someone@example.com",
+                ],
+            )
+            assert result == {"created": 1, "skipped": 3, "invalid": ["mailto:someone@example.com"]}
+            assert db.query(URLModel).count() == 2
+
+            # Rows added behind the cache's back are skipped by the conflict clause
+            db.add(URLModel(url="https://example.com/other"))
+            db.commit()
+            assert repo.bulk_create(db, ["https://example.com/other"])["created"] == 0
+            assert db.query(URLModel).count() == 3
+
+    def test_create_url_is_idempotent(self, factory):
+        repo = URLRepository()
+        with factory() as db:
+            first = repo.create_url(db, "https://example.com/a")
+            second = URLRepository().create_url(db, "HTTPS://example.com/a")
+            assert first.id == second.id
+
+
+class TestImportEndpoint:
+    @pytest.mark.asyncio
+    async def test_reports_counts(self, factory):
+        def override_get_db():
+            with factory() as db:
+                yield db
+
+        url_repo.cache.clear()
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                urls = [f"https://example.com/page-{n}" for n in range(2000)]
+                response = await client.post("/urls/bulk", json={"urls": urls + urls[:10]})
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            url_repo.cache.clear()
+
+        assert response.status_code == 200
+        assert response.json() == {"created": 2000, "skipped": 10, "invalid": []}
+
+
+class TestReadURLs:
+    def test_skips_blanks_and_comments(self):
+        assert list(read_urls(["# release health\n", "\n", " https://example.com/a \n"])) == [
+            "https://example.com/a"
+        ]
+
+
+class TestURLCache:
+    def test_expires_and_evicts_least_recently_used(self):
+        now = [0.0]
+        cache = URLCache(ttl=10, max_size=2, clock=lambda: now[0])
+        cache.put(1, "https://example.com/a")
+        cache.put(2, "https://example.com/b")
+        assert cache.get_url(1) == "https://example.com/a"
+        cache.put(3, "https://example.com/c")
+        assert cache.get_id("https://example.com/b") is None
+        assert cache.get_id("https://example.com/a") == 1
+
+        now[0] = 10
+        assert cache.get_url(1) is None
+        assert len(cache) == 1
+
+    def test_put_replaces_both_directions(self):
+        cache = URLCache()
+        cache.put(1, "https://example.com/old")
+        cache.put(1, "https://example.com/new")
+        assert cache.get_id("https://example.com/old") is None
+        cache.put(2, "https://example.com/new")
+        assert cache.get_url(1) is None
+        assert cache.get_id("https://example.com/new") == 2
+
+
+class TestCrossProcessInvalidation:
+    def test_lookups_hit_the_cache(self, factory):
+        """
+        After the first lookup, URL and ID lookups are served without touching the database.
+        """
+        repo = URLRepository()
+        with factory() as db:
+            url = "https://learn.microsoft.com/en-us/windows/release-health/status-windows-11-23H2"
+            url_id = repo.get_id(db, url)
+            db.query(URLModel).delete()
+            db.commit()
+            assert repo.get_id(db, url) == url_id
+            assert repo.get_url(db, url_id) == url
+            assert repo.get_id(db, "https://example.com/missing") is None
+
+    def test_created_urls_reach_other_replicas(self, factory, monkeypatch):
+        """
+        Inserts queue URL_CHANNEL events, split to fit the NOTIFY payload limit, which the listener
+        of another replica applies to its cache.
+        """
+        published = []
+        monkeypatch.setattr(events.bus, "publish", lambda channel, payload="": published.append((channel, payload)))
+        writer, reader = URLRepository(), URLRepository()
+        listener = PostgresListener(None, [], target=EventBus())
+        add_listener(URL_CHANNEL, reader.cache.apply_notification)
+        try:
+            assert URL_CHANNEL in listener.channels
+
+            urls = [f"https://example.com/{'long-path-' * 8}{n}" for n in range(200)]
+            with factory() as db:
+                created_id = writer.create_url(db, "https://example.com/new").id
+                writer.bulk_create(db, urls)
+            payloads = [payload for channel, payload in published if channel == URL_CHANNEL]
+            assert len(payloads) > 2
+            assert all(len(payload) < NOTIFY_PAYLOAD_LIMIT for payload in payloads)
+
+            # On PostgreSQL, every replica's listener receives these on commit
+            reader.cache.clear()
+            for payload in payloads:
+                listener.dispatch(URL_CHANNEL, payload)
+            assert reader.cache.get_id("https://example.com/new") == created_id
+            assert all(reader.cache.get_id(url) is not None for url in urls)
+
+            # A reconnect may have missed notifications, so the cache starts over
+            run_listeners(URL_CHANNEL, None)
+            assert len(reader.cache) == 0
+        finally:
+            remove_listener(URL_CHANNEL, reader.cache.apply_notification)
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Scrape as ScrapeModel, OutboxMessage, Webhook
+from app.schemas import WebhookCreate
+from app.notifications import OutboxDispatcher
+from app.resilience import RetryPolicy
+from app.webhooks import (
+    SIGNATURE_HEADER,
+    UnsafeWebhookURL,
+    WebhookDeliveryError,
+    WebhookTransport,
+    check_receiver_host,
+    verify_signature,
+)
+
+
+class StubReceiver:
+    """
+    Local HTTP receiver that records deliveries, can answer slowly, and can fail the first N requests.
+    """
+
+    def __init__(self, delay: float = 0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with receiver._lock:
+                    receiver.in_flight += 1
+                    receiver.max_in_flight = max(receiver.max_in_flight, receiver.in_flight)
+                    fail = receiver.failures > 0
+                    receiver.failures -= 1
+                time.sleep(receiver.delay)
+                with receiver._lock:
+                    receiver.in_flight -= 1
+                    receiver.requests.append((dict(self.headers), body))
+                self.send_response(500 if fail else 204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'webhooks.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def add_webhook(session_factory, url, max_concurrency=4):
+    with session_factory() as db:
+        webhook = Webhook(
+            url=url,
+            secret="s3cret",
+            max_concurrency=max_concurrency,
+            active=True,
+            created_at=datetime.now(timezone.utc),
+        )
+        db.add(webhook)
+        db.commit()
+        return str(webhook.id)
+
+
+def digest():
+    scrape = ScrapeModel(
+        id=10,
+        url_id=1,
+        timestamp=datetime(2024, 5, 1, tzinfo=timezone.utc),
+        content=json.dumps({"known_issues": {"row": {"Summary": "Taskbar might not load"}}}),
+    )
+    return {"https://example.com/status-windows-11-23H2": [scrape]}
+
+
+def no_sleep_policy(max_attempts=3):
+    async def sleep(_):
+        pass
+
+    return RetryPolicy(max_attempts=max_attempts, sleep=sleep)
+
+
+class TestWebhookTransport:
+    @pytest.mark.asyncio
+    async def test_delivery_is_signed(self, session_factory):
+        """
+        The receiver gets the issues as JSON with a verifiable signature and the idempotency key.
+        """
+        receiver = StubReceiver()
+        transport = WebhookTransport(session_factory)
+        try:
+            webhook_id = add_webhook(session_factory, receiver.url)
+            await transport.deliver(webhook_id, digest(), "run:1:webhook:1")
+        finally:
+            await transport.aclose()
+            receiver.close()
+
+        [(headers, body)] = receiver.requests
+        assert verify_signature("s3cret", headers[SIGNATURE_HEADER], body)
+        assert not verify_signature("wrong", headers[SIGNATURE_HEADER], body)
+        assert headers["X-Idempotency-Key"] == "run:1:webhook:1"
+        payload = json.loads(body)
+        assert payload["event"] == "known_issues.new"
+        assert payload["issues"][0]["content"]["known_issues"]["row"]["Summary"] == (
+            "Taskbar might not load"
+        )
+
+    @pytest.mark.asyncio
+    async def test_per_endpoint_concurrency_limit(self, session_factory):
+        """
+        A slow receiver never sees more concurrent deliveries than its limit, and does not hold up a fast one.
+        """
+        slow, fast = StubReceiver(delay=0.2), StubReceiver()
+        transport = WebhookTransport(session_factory)
+        try:
+            slow_id = add_webhook(session_factory, slow.url, max_concurrency=2)
+            fast_id = add_webhook(session_factory, fast.url)
+
+            slow_deliveries = asyncio.gather(
+                *(transport.deliver(slow_id, digest(), f"run:{n}:webhook:{slow_id}") for n in range(6))
+            )
+            started = time.monotonic()
+            await transport.deliver(fast_id, digest(), f"run:1:webhook:{fast_id}")
+            fast_elapsed = time.monotonic() - started
+            await slow_deliveries
+        finally:
+            await transport.aclose()
+            slow.close()
+            fast.close()
+
+        assert len(slow.requests) == 6
+        assert slow.max_in_flight == 2
+        assert fast_elapsed < 0.2
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors_then_raises(self, session_factory):
+        """
+        5xx responses are retried; once attempts run out the error is raised for the outbox to reschedule.
+        """
+        flaky = StubReceiver(failures=1)
+        down = StubReceiver(failures=10)
+        transport = WebhookTransport(session_factory, retry_policy=no_sleep_policy())
+        try:
+            await transport.deliver(
+                add_webhook(session_factory, flaky.url), digest(), "run:1:webhook:1"
+            )
+            with pytest.raises(WebhookDeliveryError):
+                await transport.deliver(
+                    add_webhook(session_factory, down.url), digest(), "run:1:webhook:2"
+                )
+        finally:
+            await transport.aclose()
+            flaky.close()
+            down.close()
+
+        assert len(flaky.requests) == 2
+        assert len(down.requests) == 3
+
+
+class TestWebhookDispatch:
+    @pytest.mark.asyncio
+    async def test_stalled_receiver_does_not_hold_up_others(self, session_factory):
+        """
+        While one receiver stalls on its first digest, the dispatcher keeps claiming and delivering
+        the other receiver's later digests.
+        """
+        stalled, fast = StubReceiver(delay=0.6), StubReceiver()
+        transport = WebhookTransport(session_factory)
+        try:
+            stalled_id = add_webhook(session_factory, stalled.url)
+            fast_id = add_webhook(session_factory, fast.url)
+            now = datetime.now(timezone.utc)
+            with session_factory() as db:
+                db.add(ScrapeModel(id=10, url_id=1, timestamp=now, content="{}"))
+                for run in (1, 2, 3):
+                    for webhook_id in (stalled_id, fast_id):
+                        db.add(
+                            OutboxMessage(
+                                idempotency_key=f"run:{run}:url:1:webhook:{webhook_id}",
+                                channel="webhook",
+                                recipient=webhook_id,
+                                batch_key=f"run:{run}",
+                                payload=json.dumps({"url": "https://example.com/a", "scrape_ids": [10]}),
+                                status="pending",
+                                attempts=0,
+                                next_attempt_at=now,
+                                created_at=now,
+                            )
+                        )
+                db.commit()
+            # One claim holds a single run's digests for both receivers.
+            dispatcher = OutboxDispatcher(session_factory, {"webhook": transport}, batch_size=2)
+
+            draining = asyncio.create_task(dispatcher.drain())
+            started = time.monotonic()
+            while len(fast.requests) < 3 and time.monotonic() - started < 0.5:
+                await asyncio.sleep(0.02)
+            assert len(fast.requests) == 3
+            assert stalled.requests == []
+            assert await draining == 6
+        finally:
+            await transport.aclose()
+            stalled.close()
+            fast.close()
+
+        assert len(stalled.requests) == 3
+
+
+class TestWebhookRegistration:
+    def test_only_https_urls_are_accepted(self):
+        assert WebhookCreate(url="https://hooks.example.com/ms").url.host == "hooks.example.com"
+        for url in ["http://hooks.example.com/ms", "file:///etc/passwd", "gopher://hooks.example.com", "hooks"]:
+            with pytest.raises(ValidationError):
+                WebhookCreate(url=url)
+
+    def test_local_and_private_hosts_are_refused(self):
+        """
+        Loopback, private, link-local and internal-only hosts are refused, including names that
+        resolve to such addresses; public hosts are accepted.
+        """
+        dns = {
+            "hooks.example.com": ["93.184.215.14", "2606:2800:21f:cb07:6820:80da:af6b:8b2c"],
+            "rebind.example.com": ["93.184.215.14", "10.0.0.5"],
+        }
+
+        def resolve(host, port):
+            if host not in dns:
+                raise OSError("Name or service not known")
+            return [(None, None, None, "", (address, 0)) for address in dns[host]]
+
+        check_receiver_host("hooks.example.com", resolve)
+        check_receiver_host("93.184.215.14", resolve)
+        for host in [
+            "localhost",
+            "127.0.0.1",
+            "[::1]",
+            "169.254.169.254",
+            "192.168.1.10",
+            "0.0.0.0",
+            "metadata",
+            "metadata.google.internal",
+            "rebind.example.com",
+            "missing.example.com",
+        ]:
+            with pytest.raises(UnsafeWebhookURL):
+                check_receiver_host(host, resolve)